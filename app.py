@@ -7,19 +7,39 @@ This is a focused implementation that handles:
 3. Answer verification
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS, cross_origin
 import random
 import logging
 import sys
 import os
 import socket
+import threading
 import time
 import spacy
 import json
 import re
 from typing import Optional
-from conversation.chatbot import get_bot_response as conv_get_bot_response, get_summary as conv_get_summary, get_bot_response_parts as conv_get_bot_response_parts, reset_conversation as conv_reset
+from backend.admin import require_admin
+from backend.analytics import AnswerEvents
+from backend.logs import configure_logging, lazy, sampled_logger, stats as logging_stats
+from backend.reload import ContentReloader
+from backend.cascade import Cascade, missing_annotations
+from backend.model import models
+from backend.memory_zone import ZoneGate
+from backend.parse_cache import ParseCache
+from backend.memory import AllocationSampler, MemoryWatchdog, smaps_rollup
+from backend.profiler import ProfilerBusy, StackProfiler
+from backend.corpus_file import CorpusFile, DEFAULT_CORPUS_PATH
+from backend.grammar import DEFAULT_RULES_PATH as GRAMMAR_RULES_PATH, GrammarChecker
+from backend.grading import grade_doc, precheck
+from backend.corpus_index import CorpusIndex, DEFAULT_INDEX_PATH, DIFFICULTY_BUCKETS, iter_mcq_sentences
+from backend.text_limits import TextLimits, TextTooLong
+from backend.features import DocFeatures
+from backend.pos import DISTRACTOR_SETS, POS_OPTIONS, explain_token
+from backend.tracing import queue_time_ms, tracer
+from conversation.chatbot import get_bot_response as conv_get_bot_response, get_summary as conv_get_summary, get_bot_response_parts as conv_get_bot_response_parts, reset_conversation as conv_reset, get_router_stats as conv_get_router_stats, iter_bot_response_parts as conv_iter_bot_response_parts
+from conversation.token_override_component import override_components, pipeline_rules_fingerprint
 
 # Optional memory measurement tools
 try:
@@ -34,15 +54,18 @@ try:
 except Exception:
     _HAVE_RESOURCE = False
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Optional WebSocket transport for the conversation challenge
+try:
+    from flask_sock import Sock  # type: ignore
+    _HAVE_SOCK = True
+except Exception:
+    _HAVE_SOCK = False
+
+# Configure logging: records go through a queue to a background writer thread
+# (backend/logs.py); per-token detail goes to a sampled debug logger.
+configure_logging()
 logger = logging.getLogger(__name__)
+token_log = sampled_logger(f"{__name__}.tokens")
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -51,44 +74,72 @@ CORS(app, resources={r"/*": {
     "methods": ["GET", "POST", "OPTIONS"],
     "allow_headers": ["Content-Type", "Authorization", "Accept"]
 }})
+sock = Sock(app) if _HAVE_SOCK else None
 
-# Predefined POS options and their Filipino translations
-POS_OPTIONS = {
-    # Core POS tags
-    "PRON": "Panghalip (Pronoun)",
-    "VERB": "Pandiwa (Verb)",
-    "ADV": "Pang-Abay (Adverb)",
-    "ADJ": "Pang-Uri (Adjective)",
-    "NOUN": "Pangngalan (Noun)",
-    "ADP": "Pang-ukol (Preposition)",
-    "DET": "Pantukoy (Determiner)",
-    "PART": "Panghikayat (Particle)",
-    # Extended POS tags from ToCylog model
-    "PROPN": "Pangngalang Pantangi (Proper Noun)",
-    "NUM": "Numero (Number)",
-    "CCONJ": "Pangatnig na Nagtutugma (Coordinating Conjunction)",
-    "SCONJ": "Pangatnig na Nagpapailalim (Subordinating Conjunction)",
-    "INTJ": "Pandamdam (Interjection)",
-    "PUNCT": "Bantas (Punctuation)",
-    "SYM": "Simbolo (Symbol)",
-}
+# Each open chat socket holds a worker thread for as long as it stays open, so
+# idle sockets are closed and each worker serves at most NLP_WS_MAX_SOCKETS at
+# once (default: half of NLP_THREADS, leaving the rest for plain HTTP). A
+# refused client falls back to the HTTP chat endpoint.
+WS_IDLE_TIMEOUT = float(os.environ.get('NLP_WS_IDLE_TIMEOUT', '300'))
+WS_MAX_SOCKETS = int(os.environ.get('NLP_WS_MAX_SOCKETS', str(max(1, int(os.environ.get('NLP_THREADS', '4')) // 2))))
+_ws_slots = threading.BoundedSemaphore(WS_MAX_SOCKETS)
 
-# Prefer model tag over coarse POS when available
-def resolve_pos(token):
-    """Return a stable POS key for a spaCy token based on model outputs.
-    Uses fine-grained tag (token.tag_) if it exists in POS_OPTIONS; otherwise
-    falls back to coarse tag (token.pos_)."""
-    try:
-        if hasattr(token, 'tag_') and token.tag_ in POS_OPTIONS:
-            return token.tag_
-        if token.pos_ in POS_OPTIONS:
-            return token.pos_
-        # Some models store POS in token.tag_ only
-        if hasattr(token, 'tag_') and token.tag_:
-            return token.tag_
-    except Exception:
-        pass
-    return token.pos_ or "X"
+# Sampled allocation tracing and the RSS watchdog (both off unless configured);
+# gunicorn.conf.py starts the watchdog in each worker after fork.
+alloc_sampler = AllocationSampler.from_env()
+memory_watchdog = MemoryWatchdog.from_env()
+# On-demand stack sampling for /debug/profile (idle until called)
+stack_profiler = StackProfiler.from_env()
+
+@app.before_request
+def begin_alloc_sample():
+    g.alloc_sample = alloc_sampler.begin()
+
+@app.teardown_request
+def end_alloc_sample(exc):
+    alloc_sampler.end(g.pop('alloc_sample', None), request.endpoint or request.path)
+
+# Request tracing (backend/tracing.py; enabled by NLP_TRACE_PATH)
+@app.before_request
+def begin_trace():
+    route = request.url_rule.rule if request.url_rule else request.path
+    g.trace = tracer.begin_request(f"{request.method} {route}", **{
+        "http.method": request.method,
+        "http.route": route,
+    })
+    if g.trace is not None:
+        # Proxies that stamp X-Request-Start let us see time spent queued for a thread
+        queued_ms = queue_time_ms(request.headers.get('X-Request-Start'))
+        if queued_ms is not None:
+            g.trace[0].set_attribute("http.queue_ms", queued_ms)
+        if request.is_json:
+            with tracer.span("request.parse_json", **{"http.request_bytes": request.content_length or 0}):
+                request.get_json(silent=True)
+
+@app.after_request
+def tag_trace_status(response):
+    if g.get('trace') is not None:
+        g.trace[0].set_attribute("http.status_code", response.status_code)
+    return response
+
+@app.teardown_request
+def end_trace(exc):
+    tracer.end_request(g.pop('trace', None), exc)
+
+# API requests parse inside a shared spaCy memory zone (backend/memory_zone.py),
+# so words from user text leave the vocab once the requests using them finish.
+# Teardown runs after a streamed response ends. The WebSocket stays outside;
+# each chat turn joins the zone on its own.
+@app.before_request
+def enter_memory_zone():
+    if (models.zones is not None and request.method != 'OPTIONS'
+            and request.path.startswith('/api/') and request.path != '/api/conversation/ws'):
+        g.memory_zone = models.zones.enter()
+
+@app.teardown_request
+def leave_memory_zone(exc):
+    if g.pop('memory_zone', False):
+        models.zones.leave()
 
 # Sample sentences for different difficulty levels
 SAMPLE_SENTENCES = {
@@ -339,12 +390,44 @@ def load_words_from_json(file_path):
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
 
-        logger.info(f"Loaded {len(data)} words from {file_path}")
+        logger.debug("Loaded %d words from %s", len(data), file_path)
         return data
     except Exception as e:
         logger.warning(f"Failed to load words from JSON file {file_path}: {str(e)}")
         return None
 
+# Compiled, memory-mapped pools (python -m backend.corpus_file compile); pools
+# missing from it or older than their JSON source are parsed from JSON instead.
+CORPUS_BIN_PATH = os.environ.get('CORPUS_BIN_PATH', DEFAULT_CORPUS_PATH)
+CORPUS_FILE = CorpusFile.open(CORPUS_BIN_PATH)
+
+# Word pools are parsed once per process (in the gunicorn master when preloading)
+# and shared read-only afterwards; callers copy before mutating.
+WORD_POOLS = {}
+
+def get_word_pool(file_path):
+    """Return the cached pool for file_path, loading it on first use."""
+    with tracer.span("word_pool.lookup", **{"pool.path": os.path.basename(file_path)}) as span:
+        pool = WORD_POOLS.get(file_path)
+        span.set_attribute("cache.hit", pool is not None)
+        if pool is None:
+            pool = CORPUS_FILE.pool(file_path) if CORPUS_FILE is not None else None
+            span.set_attribute("pool.source", "mmap" if pool is not None else "json")
+            if pool is None:
+                with tracer.span("word_pool.load_json"):
+                    pool = load_words_from_json(file_path)
+            if pool is not None:
+                WORD_POOLS[file_path] = pool
+    return pool
+
+WORD_POOL_PATHS = (G1_MAKE_A_SENTENCE_JSON_PATH, G2_MAKE_A_SENTENCE_JSON_PATH, G3_MAKE_A_SENTENCE_JSON_PATH,
+                   G1_MCQ_JSON_PATH, G2_MCQ_JSON_PATH, G3_MCQ_JSON_PATH)
+
+def preload_word_pools():
+    """Load every configured grade pool up front."""
+    for path in WORD_POOL_PATHS:
+        get_word_pool(path)
+
 # Normalize word entries to a consistent schema used by the frontend
 # Ensures every item has (in order): id, word, description, imageUrl, sentences
 def normalize_word_item(raw, grade_key):
@@ -368,21 +451,252 @@ def normalize_word_item(raw, grade_key):
         "sentences": sentences,
     }
 
-# Load the ToCylog NLP model
-try:
-    logger.info("Loading toCylog model...")
-    # Try to load local model if folder exists; otherwise skip
-    if os.path.isdir("./tl_tocylog_trf"):
-        nlp = spacy.load("./tl_tocylog_trf")
-        logger.info("✅ ToCylog model loaded successfully!")
-        MODEL_STATUS = "loaded"
-    else:
-        raise FileNotFoundError("tl_tocylog_trf model folder not found")
-except Exception as e:
-    logger.error(f"Error loading model with specified version: {str(e)}")
+# Load the ToCylog NLP model (backend/model.py; shared with the chatbot, which
+# may already have loaded it on import)
+logger.info("Loading toCylog model...")
+nlp = models.load()
+MODEL_STATUS = models.status
+# Parses persist across restarts and are shared by workers on this host
+models.cache = ParseCache.from_env() if nlp is not None else None
+# Confident short sentences are answered by a small pipeline (NLP_SMALL_MODEL_PATH)
+models.cascade = Cascade.from_env(nlp) if nlp is not None else None
+# Words from user text are freed after the requests that parsed them
+models.zones = ZoneGate.from_env(models.zoned_pipelines) if nlp is not None else None
+# Graded answers for learning analytics, flushed to SQLite in the background
+answer_events = AnswerEvents.from_env()
+if nlp is not None:
+    logger.info("✅ ToCylog model loaded successfully!")
+else:
     logger.error("❌ Failed to load ToCylog model. Using fallback POS tagging logic.")
-    nlp = None
-    MODEL_STATUS = "unavailable"
+
+def parse(text):
+    """Run the ToCylog pipeline on text; every model call goes through here."""
+    with tracer.span("nlp", **{"nlp.chars": len(text)}) as span:
+        doc = models.parse(text)
+        span.set_attribute("nlp.tokens", len(doc))
+    return doc
+
+# Size limits for user text (backend/text_limits.py); oversized single
+# sentences get a 413, passages go to /api/analyze/paragraph
+TEXT_LIMITS = TextLimits.from_env()
+
+def sentence_too_long(sentence):
+    """Return a 413 response if one sentence is over the limits, else None."""
+    try:
+        TEXT_LIMITS.check_sentence(sentence, nlp.tokenizer if nlp else None)
+    except TextTooLong as e:
+        logger.info("Rejected oversized input", extra={"size": e.size, "unit": e.what, "limit": e.limit})
+        return jsonify({
+            **e.to_dict(),
+            "hint": "Split the text into sentences or use /api/analyze/paragraph."
+        }), 413
+    return None
+
+def parse_many(texts, batch_size=16):
+    """Parse several texts in one batched nlp.pipe pass."""
+    with tracer.span("nlp.pipe", **{"nlp.docs": len(texts), "nlp.chars": sum(len(t) for t in texts)}):
+        return models.parse_many(texts, batch_size=batch_size)
+
+preload_word_pools()
+
+# Precomputed MCQ corpus index (python -m backend.corpus_index build)
+MCQ_INDEX_PATH = os.environ.get('MCQ_INDEX_PATH', DEFAULT_INDEX_PATH)
+MCQ_SOURCES = {'G1': G1_MCQ_JSON_PATH, 'G2': G2_MCQ_JSON_PATH, 'G3': G3_MCQ_JSON_PATH}
+
+def load_corpus_index():
+    """Load the index if it matches the MCQ pools. One built under other
+    override rules is still served (marked stale): a few POS counts being off
+    beats falling back to parsing random sentences on every /api/pos-game."""
+    return CorpusIndex.load(MCQ_INDEX_PATH, sources=MCQ_SOURCES,
+                            rules=pipeline_rules_fingerprint(nlp) if nlp else None, keep_stale_rules=True)
+
+def corpus_index_status():
+    if CORPUS_INDEX is None:
+        return None
+    return {"sentences": len(CORPUS_INDEX), "stale": CORPUS_INDEX.stale}
+
+CORPUS_INDEX = load_corpus_index()
+
+# --- Hot reload of content (backend/reload.py) ---
+# Rule and pool edits are picked up by a polling thread (NLP_RELOAD_INTERVAL)
+# or POST /admin/reload; the model itself is never reloaded.
+content_reloader = ContentReloader.from_env()
+
+def override_pipelines():
+    """Every loaded pipeline that applies token override rules (active and shadow)."""
+    return models.pipelines()
+
+def override_rule_paths():
+    return {str(path) for pipeline in override_pipelines()
+            for component in override_components(pipeline) for path in component.watched_paths()}
+
+def reload_override_rules(changed):
+    """Recompile the override tables in every pipeline and drop anything parsed
+    under the old rules."""
+    global CORPUS_INDEX
+    swapped = sum(component.reload() for pipeline in override_pipelines()
+                  for component in override_components(pipeline))
+    if swapped and CORPUS_INDEX is not None:
+        # The index stores POS counts from parses made with the old rules;
+        # reloading it checks them against the new fingerprint
+        CORPUS_INDEX = load_corpus_index()
+    return {
+        "changed": [os.path.basename(p) for p in changed],
+        "components_swapped": swapped,
+        "fingerprint": pipeline_rules_fingerprint(nlp) if nlp else None,
+        "corpus_index": corpus_index_status(),
+    }
+
+def reload_word_pools(changed):
+    """Reload the changed pools and swap each one into the cache."""
+    global CORPUS_INDEX
+    reloaded = []
+    for path in changed:
+        # A compiled pool older than its JSON is skipped, so this reads the new JSON
+        pool = CORPUS_FILE.pool(path) if CORPUS_FILE is not None else None
+        if pool is None:
+            pool = load_words_from_json(path)
+        if pool is None:
+            continue
+        WORD_POOLS[path] = pool
+        reloaded.append(os.path.basename(path))
+    if any(path in MCQ_SOURCES.values() for path in changed):
+        CORPUS_INDEX = load_corpus_index()
+    return {"reloaded": reloaded, "corpus_index": corpus_index_status()}
+
+content_reloader.watch("override_rules", override_rule_paths, reload_override_rules)
+content_reloader.watch("word_pools", lambda: WORD_POOL_PATHS, reload_word_pools)
+
+# Sentence-construction grammar rules (backend/grammar_rules.json), compiled once
+GRAMMAR = GrammarChecker.load(GRAMMAR_RULES_PATH)
+
+def reload_grammar_rules(changed):
+    """Compile the edited rules and swap them in; a broken file keeps the old set."""
+    global GRAMMAR
+    GRAMMAR = GrammarChecker.load(GRAMMAR_RULES_PATH)
+    return {"rules": len(GRAMMAR.rules)}
+
+content_reloader.watch("grammar_rules", lambda: [GRAMMAR_RULES_PATH], reload_grammar_rules)
+
+def on_model_promoted(new_nlp):
+    """Point the module-level model and the corpus index at a promoted model."""
+    global nlp, MODEL_STATUS, CORPUS_INDEX
+    nlp = new_nlp
+    MODEL_STATUS = models.status
+    CORPUS_INDEX = load_corpus_index()
+    missing = missing_annotations(models.cascade.small, new_nlp) if models.cascade is not None else []
+    if missing:
+        logger.error(f"Cascade disabled; the small model has no {' or '.join(missing)} and the promoted model does")
+        models.cascade = None
+
+models.on_promote(on_model_promoted)
+
+# Minimum questionable tokens for an indexed pick (the game asks up to 10)
+MIN_QUESTIONS_DEFAULT = int(os.environ.get('MCQ_MIN_QUESTIONS', '5'))
+
+# /api/pos-game/level: rounds per level when not given, and the upper bound
+LEVEL_ROUNDS_DEFAULT = int(os.environ.get('POS_LEVEL_ROUNDS', '5'))
+LEVEL_MAX_ROUNDS = int(os.environ.get('POS_LEVEL_MAX_ROUNDS', '20'))
+# /api/verify/batch: answers graded per request (one parse for all of them)
+BATCH_VERIFY_MAX_ANSWERS = int(os.environ.get('POS_BATCH_VERIFY_MAX', '50'))
+
+def corpus_constraints(args, grade, difficulty):
+    """Translate /api/pos-game query parameters into CorpusIndex.pick arguments.
+
+    complexity_min / complexity_max (0..1) select on the continuous complexity
+    score instead of the short/medium/long bucket."""
+    constraints = {
+        "grade": grade if grade in ('G1', 'G2', 'G3') else 'G1',
+        "bucket": DIFFICULTY_BUCKETS.get(difficulty, 'short'),
+        "min_questions": args.get('min_questions', MIN_QUESTIONS_DEFAULT, type=int),
+        "require_pos": [p.strip().upper() for p in args.get('require_pos', '').split(',') if p.strip()],
+    }
+    lo = args.get('complexity_min', type=float)
+    hi = args.get('complexity_max', type=float)
+    if lo is not None or hi is not None:
+        constraints["bucket"] = None
+        constraints["complexity"] = (lo if lo is not None else 0.0, hi if hi is not None else 1.0)
+    return constraints
+
+def select_pos_sentences(args, grade, difficulty, k):
+    """Pick up to k distinct sentences for the POS game as (sentence, selection).
+
+    Uses the corpus index when it is loaded (selection describes the row),
+    otherwise samples the grade's MCQ pool for the difficulty bucket."""
+    if CORPUS_INDEX is not None:
+        # Indexed selection: only sentences known to yield enough questions
+        constraints = corpus_constraints(args, grade, difficulty)
+        with tracer.span("corpus_index.pick", k=k) as span:
+            rows = CORPUS_INDEX.pick(k, **constraints)
+            if len(rows) < k and constraints["min_questions"] > 1:
+                rows += CORPUS_INDEX.pick(k - len(rows), **{**constraints, "min_questions": 1, "exclude": rows})
+            span.set_attribute("cache.hit", bool(rows))
+        if rows:
+            return [(str(CORPUS_INDEX.sentences[row]), CORPUS_INDEX.describe(row)) for row in rows]
+
+    sentences = []
+    if grade == 'G1':
+        mcq_data = get_word_pool(G1_MCQ_JSON_PATH)
+    elif grade == 'G2':
+        mcq_data = get_word_pool(G2_MCQ_JSON_PATH)
+    elif grade == 'G3':
+        mcq_data = get_word_pool(G3_MCQ_JSON_PATH)
+    else:
+        mcq_data = get_word_pool(G1_MCQ_JSON_PATH) # Default to Grade 1
+
+    if mcq_data:
+        # Default to short sentences for unknown difficulties
+        bucket = DIFFICULTY_BUCKETS.get(difficulty, 'short')
+        sentences = list(dict.fromkeys(s for b, s in iter_mcq_sentences(mcq_data) if b == bucket))
+
+    if not sentences:
+        # Fallback to old sample sentences if JSON loading fails or key is missing
+        logger.warning(f"Could not find sentences for grade {grade} and difficulty {difficulty}, using fallback.")
+        sentences = SAMPLE_SENTENCES.get(difficulty, SAMPLE_SENTENCES['medium'])
+
+    return [(sentence, None) for sentence in random.sample(sentences, min(k, len(sentences)))]
+
+def build_pos_questions(doc, sentence, num_questions=5):
+    """Build multiple choice POS questions from an already parsed sentence."""
+    questions = []
+
+    # Get tokens with relevant POS tags
+    features = DocFeatures(doc)
+    tokens = [i for i, key in enumerate(features.pos) if key in POS_OPTIONS]
+    
+    # If we don't have enough tokens, return what we have
+    if not tokens:
+        logger.warning("No tokens with known POS tags found", extra={"chars": len(sentence)})
+        return []
+        
+    # Select random tokens for questions (ensure uniqueness)
+    if len(tokens) < num_questions:
+        selected_tokens = tokens
+    else:
+        selected_tokens = random.sample(tokens, min(num_questions, len(tokens)))
+    
+    for i, index in enumerate(selected_tokens, 1):
+        text = features.text[index]
+        correct_answer = POS_OPTIONS[features.pos[index]]
+        
+        # Explanation enriched with morphological features and syntactic role
+        explanation = explain_token(text, correct_answer, features.morph[index], features.dep[index])
+        
+        # Distractors: one precomputed set of 3 other POS options
+        options = [correct_answer, *random.choice(DISTRACTOR_SETS[correct_answer])]
+        random.shuffle(options)
+        
+        questions.append({
+            "id": i,
+            # Position in the parsed sentence, for /api/verify/batch
+            "tokenIndex": index,
+            "question": f"Anong parte ng pangungusap ang '{text}' sa '{sentence}'?",
+            "options": options,
+            "correctAnswer": correct_answer,
+            "explanation": explanation
+        })
+        
+    return questions
 
 def generate_pos_questions(sentence, num_questions=5):
     """Generate multiple choice questions about parts of speech in the given sentence."""
@@ -391,99 +705,30 @@ def generate_pos_questions(sentence, num_questions=5):
         return []
         
     questions = []
+    span = tracer.current_span()
+    span.set_attribute("sentence.chars", len(sentence))
+    span.set_attribute("fallback", not nlp)
     
     if nlp:  # If ToCylog model is loaded, use it
         try:
             # Process the sentence with ToCylog
-            doc = nlp(sentence)
-            logger.info(f"ToCylog tokens for '{sentence}': {[(token.text, resolve_pos(token)) for token in doc]}")
-            
-            # Get tokens with relevant POS tags
-            tokens = [token for token in doc if resolve_pos(token) in POS_OPTIONS]
+            doc = parse(sentence)
+            token_log.debug("ToCylog tokens for %r: %s", sentence,
+                            lazy(lambda: [(t["text"], t["pos"]) for t in DocFeatures(doc).tokens()]))
             
-            # If we don't have enough tokens, return what we have
-            if not tokens:
-                logger.warning(f"No tokens with known POS tags found in: '{sentence}'")
-                return []
-                
-            # Select random tokens for questions (ensure uniqueness)
-            if len(tokens) < num_questions:
-                selected_tokens = tokens
-            else:
-                selected_tokens = random.sample(tokens, min(num_questions, len(tokens)))
-            
-            for i, token in enumerate(selected_tokens, 1):
-                correct_pos = resolve_pos(token)
-                correct_answer = POS_OPTIONS[correct_pos]
-                
-                # Enhanced explanation using morphological features if available
-                explanation = f"Ang '{token.text}' ay isang {correct_answer.lower()}."
-                
-                # Add morphological information if available
-                if hasattr(token, 'morph') and len(token.morph) > 0:
-                    morph_features = []
-                    for feature, value in token.morph.to_dict().items():
-                        if feature == 'Case':
-                            if value == 'Nom':
-                                morph_features.append("nasa pangunahing anyo")
-                            elif value == 'Gen':
-                                morph_features.append("nagpapakita ng pagmamay-ari")
-                            elif value == 'Loc':
-                                morph_features.append("nagpapakita ng lokasyon")
-                            elif value == 'Dat':
-                                morph_features.append("nagpapakita ng tagatanggap ng kilos")
-                        elif feature == 'Aspect':
-                            if value == 'Imp':
-                                morph_features.append("di-ganap na aspekto")
-                            elif value == 'Perf':
-                                morph_features.append("ganap na aspekto")
-                        elif feature == 'Voice':
-                            if value == 'Act':
-                                morph_features.append("aktibong tinig")
-                            elif value == 'Pass':
-                                morph_features.append("pasibong tinig")
-                    
-                    if morph_features:
-                        explanation += f" Ito ay {', '.join(morph_features)}."
-                
-                # Add syntactic role information if available
-                if token.dep_ and token.dep_ != '':
-                    if token.dep_ == 'ROOT':
-                        explanation += " Ito ang pangunahing salita sa pangungusap."
-                    elif token.dep_ == 'nsubj':
-                        explanation += " Ito ang paksa ng pangungusap."
-                    elif token.dep_ == 'obj':
-                        explanation += " Ito ang layon ng pangungusap."
-                    elif token.dep_ == 'iobj':
-                        explanation += " Ito ang di-tuwirang layon."
-                    elif token.dep_ == 'obl':
-                        explanation += " Ito ay nagbibigay ng karagdagang impormasyon."
-                
-                # Generate distractors: randomly select 3 other POS options
-                available_distractors = [opt for opt in POS_OPTIONS.values() if opt != correct_answer]
-                distractors = random.sample(available_distractors, min(3, len(available_distractors)))
-                
-                # Create options and shuffle
-                options = [correct_answer] + distractors
-                random.shuffle(options)
-                
-                questions.append({
-                    "id": i,
-                    "question": f"Anong parte ng pangungusap ang '{token.text}' sa '{sentence}'?",
-                    "options": options,
-                    "correctAnswer": correct_answer,
-                    "explanation": explanation
-                })
-                
-            logger.info(f"Generated {len(questions)} questions using ToCylog")
+            questions = build_pos_questions(doc, sentence, num_questions)
+            if questions:
+                logger.info("Generated questions", extra={"questions": len(questions), "source": "tocylog"})
             return questions
             
         except Exception as e:
             logger.error(f"Error using ToCylog for POS tagging: {str(e)}")
             # Fall back to dictionary-based approach
+            span.set_attribute("fallback", True)
             
     # Dictionary-based fallback approach
-    logger.info(f"Using fallback POS tagging for '{sentence}'")
+    logger.info("Using fallback POS tagging", extra={"chars": len(sentence)})
+    token_log.debug("Fallback POS tagging for %r", sentence)
     
     # Dictionary mapping common Tagalog words to their POS
     TAGALOG_POS_MAP = {
@@ -555,12 +800,8 @@ def generate_pos_questions(sentence, num_questions=5):
         correct_pos = word_data["pos"]
         correct_answer = POS_OPTIONS[correct_pos]
         
-        # Generate distractors: randomly select 3 other POS options
-        available_distractors = [opt for opt in POS_OPTIONS.values() if opt != correct_answer]
-        distractors = random.sample(available_distractors, min(3, len(available_distractors)))
-        
-        # Create options and shuffle
-        options = [correct_answer] + distractors
+        # Distractors: one precomputed set of 3 other POS options
+        options = [correct_answer, *random.choice(DISTRACTOR_SETS[correct_answer])]
         random.shuffle(options)
         
         questions.append({
@@ -571,7 +812,7 @@ def generate_pos_questions(sentence, num_questions=5):
             "explanation": f"Ang '{word_data['text']}' ay isang {correct_answer.lower()}."
         })
     
-    logger.info(f"Generated {len(questions)} questions using fallback dictionary")
+    logger.info("Generated questions", extra={"questions": len(questions), "source": "dictionary"})
     return questions
 
 def verify_sentence_usage(target_word, sentence):
@@ -595,91 +836,23 @@ def verify_sentence_usage(target_word, sentence):
         }
     
     try:
-        # 1. Clean and perform initial hygiene checks
-        target_word_cleaned = target_word.strip().lower()
+        # 1. Hygiene checks that need no parse (capital letter, final punctuation)
         sentence = sentence.strip()
-        
-        if not sentence:
-            return {"isCorrect": False, "feedback": "Pakisulat ang iyong pangungusap."}
-        
-        if not sentence[0].isupper():
-            return {"isCorrect": False, "feedback": "Dapat magsimula sa malaking titik ang iyong pangungusap."}
-
-        if sentence[-1] not in ['.', '!', '?']:
-            return {"isCorrect": False, "feedback": "Dapat magtapos sa bantas (., ?, !) ang iyong pangungusap."}
+        failed = precheck(sentence)
+        if failed is not None:
+            return failed
         
         # 2. Process sentence with NLP model
-        doc = nlp(sentence)
+        doc = parse(sentence)
         
-        # 3. Token length check (more robust than character length)
-        # Exclude punctuation from token count for this check
-        num_tokens = len([token for token in doc if not token.is_punct])
-        if not (4 <= num_tokens <= 25):
-            return {
-                "isCorrect": False, 
-                "feedback": f"Ang iyong pangungusap ay dapat may 4 hanggang 25 na salita. Ang sa iyo ay may {num_tokens}."
-            }
-
-        # 4. Target word check (using cleaned version)
-        target_tokens = [t for t in doc if t.text.lower() == target_word_cleaned or t.lemma_.lower() == target_word_cleaned]
-        if not target_tokens:
-            return {"isCorrect": False, "feedback": f"Hindi mo ginamit ang salitang '{target_word}' sa iyong pangungusap."}
-            
-        # 5. Core syntactic structure checks
-        has_subject = any(t.dep_ == 'nsubj' for t in doc)
-        root_tokens = [t for t in doc if t.dep_ == 'ROOT']
-        has_single_root = len(root_tokens) == 1
-
-        if not has_subject:
-            return {"isCorrect": False, "feedback": "Mukhang kulang ng paksa (subject) ang iyong pangungusap."}
-        
-        if not has_single_root:
-            feedback = "Hindi malinaw ang pangunahing ideya o pandiwa (verb) sa iyong pangungusap."
-            if len(root_tokens) > 1:
-                feedback = "Mukhang mayroong higit sa isang pangunahing ideya ang iyong pangungusap. Subukang gawing mas simple."
-            return {"isCorrect": False, "feedback": feedback}
-        
-        # 6. Tagalog-specific grammar heuristics
-        for i, token in enumerate(doc):
-            # 'mga' must be followed by a noun
-            if token.text.lower() == 'mga':
-                if i + 1 < len(doc) and doc[i+1].pos_ not in ['NOUN', 'PROPN']:
-                    return {"isCorrect": False, "feedback": f"Ang salitang 'mga' ay karaniwang sinusundan ng pangngalan (noun). Mali ang paggamit mo nito bago ang '{doc[i+1].text}'."}
-            
-            # 'ay' should not be at the start or end
-            if token.text.lower() == 'ay':
-                # -2 to account for final punctuation
-                if i == 0 or (i + 2 >= len(doc) and doc[-1].is_punct):
-                    return {"isCorrect": False, "feedback": "Ang 'ay' ay ginagamit sa gitna ng pangungusap para paghiwalayin ang paksa at panaguri."}
-
-        # 7. Target word significance check
-        target_token = target_tokens[0]
-        is_significant = (target_token.dep_ and target_token.dep_ != '') or len(list(target_token.children)) > 0
-        if not is_significant:
-            return {"isCorrect": False, "feedback": f"Ang salitang '{target_word}' ay hindi maayos na naiugnay sa pangungusap."}
-            
-        # 8. All checks passed: The sentence is grammatically correct
-        isCorrect = True
-        feedback = f"Mahusay! Tama ang pagkakabuo at paggamit mo ng salitang '{target_word}' sa pangungusap."
-        
-        # Create analysis object for debugging or future use
-        pos_counts = {}
-        for token in doc:
-            key = resolve_pos(token)
-            pos_counts[key] = pos_counts.get(key, 0) + 1
-
-        analysis = {
-            "hasSubject": has_subject,
-            "hasPredicate": has_single_root,
-            "pos_counts": pos_counts,
-            "targetWordRole": target_token.dep_
-        }
-        
-        return {
-            "isCorrect": isCorrect,
-            "feedback": feedback,
-            "analysis": analysis
-        }
+        # 3. Grammar rules (backend/grammar_rules.json): word count, target
+        # word use, subject/predicate structure and Tagalog-specific heuristics,
+        # all evaluated over the token arrays in one pass
+        with tracer.span("verify.grammar", **{"sentence.tokens": len(doc)}):
+            result = grade_doc(doc, target_word, GRAMMAR)
+        if result["violations"]:
+            token_log.debug("Grammar violations %r", lazy(lambda: [v["rule"] for v in result["violations"]]))
+        return result
         
     except Exception as e:
         logger.error(f"Error verifying sentence: {str(e)}")
@@ -689,6 +862,28 @@ def verify_sentence_usage(target_word, sentence):
             "feedback": "May naganap na error sa pagsuri ng pangungusap."
         }
 
+def check_pos_answer(features, index, word, selected_answer):
+    """Grade one answer against token `index` of an already parsed sentence."""
+    correct_pos = features.pos[index]
+    correct_answer = POS_OPTIONS.get(correct_pos)
+    if not correct_answer:
+        logger.warning(f"POS '{correct_pos}' for word '{word}' not found in POS_OPTIONS")
+        return None
+    return {
+        "word": word,
+        "selected": selected_answer,
+        "correct": correct_answer,
+        "is_correct": selected_answer == correct_answer,
+        # Explanation enriched with morphological features and syntactic role
+        "explanation": explain_token(word, correct_answer, features.morph[index], features.dep[index]),
+        "pos": correct_pos
+    }
+
+def request_grade(data):
+    """The optional "grade" a game client echoes back from /api/pos-game."""
+    grade = data.get('grade')
+    return grade if isinstance(grade, str) and grade else None
+
 def verify_pos_answer(word, sentence, selected_answer):
     """Verify if the selected answer is correct for the word in the sentence."""
     if not nlp:
@@ -697,84 +892,60 @@ def verify_pos_answer(word, sentence, selected_answer):
         
     try:
         # Process the sentence with ToCylog
-        doc = nlp(sentence)
+        doc = parse(sentence)
         
-        # Find the target word in the processed tokens
-        matching_tokens = []
-        for token in doc:
-            if token.text.lower() == word.lower():
-                matching_tokens.append(token)
-        
-        if not matching_tokens:
+        # Find the target word in the processed tokens (first match)
+        features = DocFeatures(doc)
+        index = features.find(word)
+        if index is None:
             logger.warning(f"Word '{word}' not found in sentence during verification")
             return None
         
-        # Use the first matching token
-        token = matching_tokens[0]
-        correct_pos = resolve_pos(token)
-        correct_answer = POS_OPTIONS.get(correct_pos)
-                
-        if correct_answer:
-            is_correct = (selected_answer == correct_answer)
-            
-            # Create enhanced explanation with morphological features
-            explanation = f"Ang '{word}' ay isang {correct_answer.lower()}."
-            
-            # Add morphological information if available
-            if hasattr(token, 'morph') and len(token.morph) > 0:
-                morph_features = []
-                for feature, value in token.morph.to_dict().items():
-                    if feature == 'Case':
-                        if value == 'Nom':
-                            morph_features.append("nasa pangunahing anyo")
-                        elif value == 'Gen':
-                            morph_features.append("nagpapakita ng pagmamay-ari")
-                        elif value == 'Loc':
-                            morph_features.append("nagpapakita ng lokasyon")
-                        elif value == 'Dat':
-                            morph_features.append("nagpapakita ng tagatanggap ng kilos")
-                    elif feature == 'Aspect':
-                        if value == 'Imp':
-                            morph_features.append("di-ganap na aspekto")
-                        elif value == 'Perf':
-                            morph_features.append("ganap na aspekto")
-                    elif feature == 'Voice':
-                        if value == 'Act':
-                            morph_features.append("aktibong tinig")
-                        elif value == 'Pass':
-                            morph_features.append("pasibong tinig")
-                
-                if morph_features:
-                    explanation += f" Ito ay {', '.join(morph_features)}."
-            
-            # Add syntactic role information if available
-            if token.dep_ and token.dep_ != '':
-                if token.dep_ == 'ROOT':
-                    explanation += " Ito ang pangunahing salita sa pangungusap."
-                elif token.dep_ == 'nsubj':
-                    explanation += " Ito ang paksa ng pangungusap."
-                elif token.dep_ == 'obj':
-                    explanation += " Ito ang layon ng pangungusap."
-                elif token.dep_ == 'iobj':
-                    explanation += " Ito ang di-tuwirang layon."
-                elif token.dep_ == 'obl':
-                    explanation += " Ito ay nagbibigay ng karagdagang impormasyon."
-            
-            return {
-                "word": word,
-                "selected": selected_answer,
-                "correct": correct_answer,
-                "is_correct": is_correct,
-                "explanation": explanation,
-                "pos": correct_pos
-            }
-        
-        logger.warning(f"POS '{correct_pos}' for word '{word}' not found in POS_OPTIONS")
-        return None
+        return check_pos_answer(features, index, word, selected_answer)
     except Exception as e:
         logger.error(f"Error verifying answer: {str(e)}")
         return None
 
+def verify_pos_answers(sentence, answers):
+    """Grade several answers about one sentence with a single parse.
+
+    Each answer has "selected" and a "tokenIndex" and/or "word"; the index
+    tells repeated words (two "ang"s) apart, the word alone means its first
+    occurrence. Returns one result per answer, or {"index", "error"}."""
+    features = DocFeatures(parse(sentence))
+    results = []
+    for position, answer in enumerate(answers):
+        selected = answer.get('selected')
+        index = answer.get('tokenIndex')
+        word = answer.get('word')
+        if isinstance(index, bool) or (index is not None and not isinstance(index, int)):
+            results.append({"index": position, "error": "tokenIndex must be an integer"})
+            continue
+        if index is not None:
+            if not 0 <= index < len(features):
+                results.append({"index": position, "error": f"tokenIndex {index} is out of range"})
+                continue
+            if word and features.text[index].lower() != str(word).lower():
+                results.append({"index": position, "error": f"Token {index} is '{features.text[index]}', not '{word}'"})
+                continue
+        elif word:
+            index = features.find(str(word))
+            if index is None:
+                results.append({"index": position, "error": f"Word '{word}' not found in sentence"})
+                continue
+        else:
+            results.append({"index": position, "error": "Provide word or tokenIndex"})
+            continue
+        if selected is None:
+            results.append({"index": position, "error": "Provide the selected answer"})
+            continue
+        result = check_pos_answer(features, index, word or features.text[index], selected)
+        if result is None:
+            results.append({"index": position, "error": "Unable to verify answer"})
+            continue
+        results.append({"index": position, "tokenIndex": index, **result})
+    return results
+
 @app.route('/', methods=['GET'])
 def home():
     """Simple home endpoint to check if server is running"""
@@ -796,39 +967,20 @@ def get_pos_game():
         grade = request.args.get('grade')
         difficulty = request.args.get('difficulty', 'medium')  # easy, medium, hard
         custom_sentence = request.args.get('sentence')
+        selection = None
         
         # Use custom sentence if provided, otherwise select from samples
         if custom_sentence:
             sentence = custom_sentence
-            logger.info(f"Using custom sentence: '{sentence}'")
+            too_long = sentence_too_long(sentence)
+            if too_long:
+                return too_long
+            logger.info("Using custom sentence", extra={"chars": len(sentence)})
+            token_log.debug("Custom sentence: %r", sentence)
         else:
-            sentences = []
-            if grade == 'G1':
-                mcq_data = load_words_from_json(G1_MCQ_JSON_PATH)
-            elif grade == 'G2':
-                mcq_data = load_words_from_json(G2_MCQ_JSON_PATH)
-            elif grade == 'G3':
-                mcq_data = load_words_from_json(G3_MCQ_JSON_PATH)
-            else:
-                mcq_data = load_words_from_json(G1_MCQ_JSON_PATH) # Default to Grade 1
-
-            if mcq_data:
-                if difficulty == 'easy':
-                    sentences = mcq_data.get('short', [])
-                elif difficulty == 'medium':
-                    sentences = mcq_data.get('medium', [])
-                elif difficulty == 'hard':
-                    sentences = mcq_data.get('long', [])
-                else:
-                    sentences = mcq_data.get('short', []) # Default to short sentences
-            
-            if not sentences:
-                # Fallback to old sample sentences if JSON loading fails or key is missing
-                logger.warning(f"Could not find sentences for grade {grade} and difficulty {difficulty}, using fallback.")
-                sentences = SAMPLE_SENTENCES.get(difficulty, SAMPLE_SENTENCES['medium'])
-
-            sentence = random.choice(sentences)
-            logger.info(f"Selected random sentence (grade={grade or 'n/a'}, diff={difficulty}): '{sentence}'")
+            sentence, selection = select_pos_sentences(request.args, grade, difficulty, 1)[0]
+            logger.info("Selected random sentence", extra={"grade": grade or "n/a", "difficulty": difficulty})
+            token_log.debug("Selected sentence: %r", sentence)
         
         # Generate questions for the sentence
         questions = generate_pos_questions(sentence, num_questions=10)
@@ -852,6 +1004,8 @@ def get_pos_game():
             "grade": grade,
             "timestamp": int(time.time())
         }
+        if selection:
+            response_data["selection"] = selection
         
         return create_cors_response(response_data)
     
@@ -861,6 +1015,85 @@ def get_pos_game():
             "error": "Error generating game data. Please try again."
         }), 500
 
+@app.route('/api/pos-game/level', methods=['GET', 'OPTIONS'])
+@cross_origin()
+def get_pos_game_level():
+    """API endpoint to get a whole POS game level (several rounds) in one call.
+
+    Picks `rounds` distinct sentences, parses them in one batched pass and
+    returns one /api/pos-game style round per sentence."""
+    if request.method == 'OPTIONS':
+        return handle_preflight_request()
+
+    try:
+        grade = request.args.get('grade')
+        difficulty = request.args.get('difficulty', 'medium')  # easy, medium, hard
+        rounds = request.args.get('rounds', LEVEL_ROUNDS_DEFAULT, type=int)
+        if not rounds or rounds < 1 or rounds > LEVEL_MAX_ROUNDS:
+            return jsonify({"error": f"rounds must be between 1 and {LEVEL_MAX_ROUNDS}"}), 400
+
+        picked = select_pos_sentences(request.args, grade, difficulty, rounds)
+        level = []
+        if nlp:
+            try:
+                docs = parse_many([sentence for sentence, _ in picked])
+                for (sentence, selection), doc in zip(picked, docs):
+                    level.append((sentence, selection, build_pos_questions(doc, sentence, num_questions=10)))
+            except Exception as e:
+                logger.error(f"Error batch parsing level sentences: {str(e)}")
+                level = []
+        if not level:
+            level = [(sentence, selection, generate_pos_questions(sentence, num_questions=10))
+                     for sentence, selection in picked]
+
+        rounds_data = []
+        for sentence, selection, questions in level:
+            if not questions:
+                continue
+            round_data = {"sentence": sentence, "questions": questions}
+            if selection:
+                round_data["selection"] = selection
+            rounds_data.append(round_data)
+
+        if not rounds_data:
+            return jsonify({
+                "error": "Unable to generate questions for this level. Please try again."
+            }), 400
+        logger.info("Generated level", extra={"rounds": len(rounds_data), "requested": rounds,
+                                               "grade": grade or "n/a", "difficulty": difficulty})
+
+        return create_cors_response({
+            "rounds": rounds_data,
+            "source": "ToCylog" if nlp else "fallback",
+            "difficulty": difficulty,
+            "grade": grade,
+            "timestamp": int(time.time())
+        })
+
+    except Exception as e:
+        logger.error(f"Error generating level data: {str(e)}", exc_info=True)
+        return jsonify({
+            "error": "Error generating level data. Please try again."
+        }), 500
+
+def analyze_doc(doc, columnar=False):
+    """Token details and sentence-level analysis for a parsed sentence.
+
+    With columnar=True the tokens are parallel arrays over an interned string
+    table (DocFeatures.columnar) instead of one dict per token."""
+    features = DocFeatures(doc)
+    tokens = features.columnar() if columnar else features.tokens()
+    sentence_analysis = {
+        "has_subject": features.has_dep('nsubj'),
+        "has_predicate": features.has_dep('ROOT'),
+        "pos_counts": features.pos_counts()
+    }
+    return tokens, sentence_analysis
+
+def wants_columnar():
+    """?format=columnar asks for the compact token layout."""
+    return request.args.get('format', '').lower() == 'columnar'
+
 @app.route('/api/analyze', methods=['POST', 'OPTIONS'])
 @cross_origin()
 def analyze_text():
@@ -876,7 +1109,11 @@ def analyze_text():
             return jsonify({"error": "Please provide a sentence"}), 400
         
         sentence = data['sentence']
-        logger.info(f"Analyzing sentence: '{sentence}'")
+        too_long = sentence_too_long(sentence)
+        if too_long:
+            return too_long
+        logger.info("Analyzing sentence", extra={"chars": len(sentence)})
+        token_log.debug("Analyzing %r", sentence)
         
         if not nlp:
             return jsonify({
@@ -905,48 +1142,9 @@ def analyze_text():
         start_ts = time.perf_counter()
 
         # Process the sentence
-        doc = nlp(sentence)
-        tokens = []
-        
-        # Extract tokens with POS and enhanced information
-        for token in doc:
-            pos = resolve_pos(token)
-            description = POS_OPTIONS.get(pos, pos)
-            
-            token_info = {
-                "text": token.text,
-                "pos": pos,
-                "description": description
-            }
-            
-            # Add morphological features if available
-            if hasattr(token, 'morph') and len(token.morph) > 0:
-                token_info["morph"] = token.morph.to_dict()
-            
-            # Add dependency parsing information if available
-            if token.dep_ and token.dep_ != '':
-                token_info["dep"] = token.dep_
-                if token.head.text != token.text:  # If not the root
-                    token_info["head"] = token.head.text
-            
-            # Add lemma if available
-            if hasattr(token, 'lemma_') and token.lemma_ != '':
-                token_info["lemma"] = token.lemma_
-                
-            tokens.append(token_info)
-        
-        # Add sentence-level analysis
-        # Build POS counts using resolved POS
-        pos_counts = {}
-        for token in doc:
-            key = resolve_pos(token)
-            pos_counts[key] = pos_counts.get(key, 0) + 1
-
-        sentence_analysis = {
-            "has_subject": any(token.dep_ == 'nsubj' for token in doc),
-            "has_predicate": any(token.dep_ == 'ROOT' for token in doc),
-            "pos_counts": pos_counts
-        }
+        doc = parse(sentence)
+        columnar = wants_columnar()
+        tokens, sentence_analysis = analyze_doc(doc, columnar=columnar)
         
         end_ts = time.perf_counter()
         rss_after_mb = _get_rss_mb()
@@ -965,6 +1163,7 @@ def analyze_text():
         response_payload = {
             "sentence": sentence,
             "tokens": tokens,
+            "format": "columnar" if columnar else "tokens",
             "analysis": sentence_analysis,
             "method": "ToCylog",
             "metrics": {
@@ -981,6 +1180,72 @@ def analyze_text():
             "error": f"Error analyzing text: {str(e)}"
         }), 500
 
+@app.route('/api/analyze/paragraph', methods=['POST', 'OPTIONS'])
+@cross_origin()
+def analyze_paragraph():
+    """API endpoint to analyze a multi-sentence passage, streamed as NDJSON.
+
+    The text is split into sentences before the model runs; one line
+    {"index", "sentence", "tokens", "analysis", "processing_ms"} is written as
+    each sentence finishes ({"index", "sentence", "error"} if it fails), then
+    a final {"done": true, ...} line."""
+    if request.method == 'OPTIONS':
+        return handle_preflight_request()
+
+    data = request.get_json(silent=True) or {}
+    text = data.get('text') or data.get('sentence')
+    if not text or not isinstance(text, str):
+        return jsonify({"error": "Please provide text"}), 400
+    if not nlp:
+        return jsonify({
+            "error": "ToCylog model is not loaded. Using fallback POS tagging."
+        }), 500
+
+    try:
+        sentences = TEXT_LIMITS.split_paragraph(text)
+    except TextTooLong as e:
+        logger.info("Rejected oversized paragraph", extra={"size": e.size, "unit": e.what, "limit": e.limit})
+        return jsonify(e.to_dict()), 413
+    if not sentences:
+        return jsonify({"error": "Please provide text"}), 400
+    logger.info("Analyzing paragraph", extra={"chars": len(text), "sentences": len(sentences)})
+    columnar = wants_columnar()
+
+    def generate():
+        started = time.perf_counter()
+        analyzed = 0
+        for index, sentence in enumerate(sentences):
+            line = {"index": index, "sentence": sentence}
+            try:
+                TEXT_LIMITS.check_sentence(sentence, nlp.tokenizer)
+                sentence_start = time.perf_counter()
+                tokens, analysis = analyze_doc(parse(sentence), columnar=columnar)
+                line.update({
+                    "tokens": tokens,
+                    "analysis": analysis,
+                    "processing_ms": int((time.perf_counter() - sentence_start) * 1000)
+                })
+                analyzed += 1
+            except TextTooLong as e:
+                line["error"] = str(e)
+            except Exception as e:
+                logger.error(f"Error analyzing paragraph sentence {index}: {str(e)}")
+                line["error"] = "Error analyzing sentence"
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        yield json.dumps({
+            "done": True,
+            "sentences": len(sentences),
+            "analyzed": analyzed,
+            "method": "ToCylog",
+            "processing_ms": int((time.perf_counter() - started) * 1000)
+        }) + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    # Flush each line through proxies as soon as it is written
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/verify', methods=['POST', 'OPTIONS'])
 @cross_origin()
 def verify_answer():
@@ -988,6 +1253,7 @@ def verify_answer():
     if request.method == 'OPTIONS':
         return handle_preflight_request()
     
+    started = time.perf_counter()
     try:
         # Get data from request
         data = request.json
@@ -999,8 +1265,12 @@ def verify_answer():
         word = data['word']
         sentence = data['sentence']
         selected = data['selected']
+        too_long = sentence_too_long(sentence)
+        if too_long:
+            return too_long
         
-        logger.info(f"Verifying answer for word '{word}' in sentence '{sentence}'")
+        logger.info("Verifying answer", extra={"word": word, "chars": len(sentence)})
+        token_log.debug("Verifying answer for %r in %r", word, sentence)
         
         # Verify the answer
         result = verify_pos_answer(word, sentence, selected)
@@ -1010,6 +1280,9 @@ def verify_answer():
                 "error": "Unable to verify answer. Please try again."
             }), 400
         
+        if answer_events is not None:
+            answer_events.record_pos(request_grade(data), sentence, word, None, result["pos"], selected,
+                                     result["is_correct"], (time.perf_counter() - started) * 1000.0)
         return create_cors_response(result)
     
     except Exception as e:
@@ -1018,6 +1291,81 @@ def verify_answer():
             "error": f"Error verifying answer: {str(e)}"
         }), 500
 
+@app.route('/api/verify/batch', methods=['POST', 'OPTIONS'])
+@cross_origin()
+def verify_answers_batch():
+    """API endpoint to verify every answer of a round about one sentence.
+
+    Body: {"sentence": ..., "answers": [{"tokenIndex": 1, "word": "ang",
+    "selected": "..."}, ...]}; the sentence is parsed once."""
+    if request.method == 'OPTIONS':
+        return handle_preflight_request()
+    
+    started = time.perf_counter()
+    data = request.get_json(silent=True) or {}
+    sentence = data.get('sentence')
+    answers = data.get('answers')
+    if not isinstance(sentence, str) or not sentence.strip() or not isinstance(answers, list) or not answers:
+        return jsonify({
+            "error": "Please provide a sentence and a list of answers"
+        }), 400
+    if len(answers) > BATCH_VERIFY_MAX_ANSWERS:
+        return jsonify({
+            "error": f"At most {BATCH_VERIFY_MAX_ANSWERS} answers per request"
+        }), 400
+    if not all(isinstance(answer, dict) for answer in answers):
+        return jsonify({"error": "Each answer must be an object"}), 400
+    too_long = sentence_too_long(sentence)
+    if too_long:
+        return too_long
+    if not nlp:
+        return jsonify({
+            "error": "Unable to verify answers. Please try again."
+        }), 503
+    
+    try:
+        logger.info("Verifying answers", extra={"answers": len(answers), "chars": len(sentence)})
+        token_log.debug("Verifying %d answers in %r", len(answers), sentence)
+        results = verify_pos_answers(sentence, answers)
+        if answer_events is not None:
+            grade = request_grade(data)
+            latency_ms = (time.perf_counter() - started) * 1000.0
+            for r in results:
+                if "error" not in r:
+                    answer_events.record_pos(grade, sentence, r["word"], r["tokenIndex"], r["pos"], r["selected"],
+                                             r["is_correct"], latency_ms)
+        return create_cors_response({
+            "sentence": sentence,
+            "results": results,
+            "correct": sum(1 for r in results if r.get("is_correct")),
+            "total": len(results)
+        })
+    
+    except Exception as e:
+        logger.error(f"Error verifying answers: {str(e)}", exc_info=True)
+        return jsonify({
+            "error": f"Error verifying answers: {str(e)}"
+        }), 500
+
+@app.route('/api/analytics/confusion', methods=['GET'])
+@require_admin
+def analytics_confusion():
+    """Admin-only: per-grade POS confusion matrices from recorded answers.
+
+    ?grade=G1 limits to one grade and ?days=N (default 30) to recent answers;
+    rows of each matrix are the correct POS and columns the POS the students chose."""
+    if answer_events is None:
+        return jsonify({"error": "Answer analytics are disabled (NLP_ANALYTICS_PATH=off)"}), 503
+    try:
+        days = request.args.get('days', 30.0, type=float)
+        if days <= 0:
+            return jsonify({"error": "days must be positive"}), 400
+        since = time.time() - days * 86400.0
+        return create_cors_response(answer_events.confusion(grade=request.args.get('grade'), since=since))
+    except Exception as e:
+        logger.error(f"Error building confusion matrices: {str(e)}", exc_info=True)
+        return jsonify({"error": "Error building confusion matrices"}), 500
+
 @app.route('/health', methods=['GET'])
 @cross_origin()
 def health_check():
@@ -1033,8 +1381,20 @@ def health_check():
             "python_version": sys.version,
             "spacy_version": spacy.__version__,
             "memory_info": {
-                "nlp_model_loaded": nlp is not None
-            }
+                "nlp_model_loaded": nlp is not None,
+                "process": smaps_rollup(os.getpid()),
+                "vocab_strings": len(nlp.vocab.strings) if nlp else None,
+                "memory_zone": models.zones.stats() if models.zones is not None else None
+            },
+            "active_model": models.name,
+            "conversation_router": conv_get_router_stats(),
+            "parse_cache": models.cache.stats() if models.cache is not None else None,
+            "parse_single_flight": models.flights.stats(),
+            "model_cascade": models.cascade.stats() if models.cascade is not None else None,
+            "answer_analytics": answer_events.stats() if answer_events is not None else None,
+            "corpus_index": corpus_index_status(),
+            "tracing": tracer.stats(),
+            "logging": logging_stats()
         })
     except Exception as e:
         logger.error(f"Error in health check: {str(e)}")
@@ -1043,6 +1403,100 @@ def health_check():
             "error": str(e)
         }), 500
 
+@app.route('/debug/memory', methods=['GET'])
+@require_admin
+def debug_memory():
+    """Admin-only: process memory, watchdog state and sampled allocation reports."""
+    return create_cors_response({
+        "process": smaps_rollup(os.getpid()),
+        "watchdog": memory_watchdog.status(),
+        "allocations": alloc_sampler.report()
+    })
+
+@app.route('/debug/profile', methods=['GET'])
+@require_admin
+def debug_profile():
+    """Admin-only: sample every thread's stack for ?seconds=N (default 10) and
+    return collapsed stacks for flamegraph.pl/speedscope.
+
+    ?hz= overrides the sampling rate, ?threads=requests keeps only threads
+    serving a request, and ?format=json wraps the stacks with the summary."""
+    try:
+        seconds = float(request.args.get('seconds', '10'))
+        hz = float(request.args['hz']) if 'hz' in request.args else None
+    except ValueError:
+        return jsonify({"error": "seconds and hz must be numbers"}), 400
+    if not 0 < seconds <= stack_profiler.max_seconds:
+        return jsonify({"error": f"seconds must be in (0, {stack_profiler.max_seconds:g}]"}), 400
+    if hz is not None and not 1 <= hz <= 1000:
+        return jsonify({"error": "hz must be between 1 and 1000"}), 400
+    try:
+        profile = stack_profiler.profile(seconds, hz=hz, requests_only=request.args.get('threads') == 'requests')
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    summary = profile.summary()
+    logger.info("Profile taken", extra=summary)
+    if request.args.get('format') == 'json':
+        return create_cors_response({**summary, "collapsed": profile.collapsed()})
+    response = Response(profile.collapsed(), mimetype='text/plain')
+    response.headers['X-Profile-Samples'] = str(summary["thread_samples"])
+    response.headers['X-Profile-Overhead-Pct'] = str(summary["overhead_pct"])
+    return response
+
+@app.route('/admin/reload', methods=['GET', 'POST'])
+@require_admin
+def admin_reload():
+    """Admin-only: reload changed override rules and word pools in this worker
+    (POST; ?force=1 reloads everything). GET returns the reloader status.
+    Other workers pick changes up through their own polling thread."""
+    if request.method == 'POST':
+        results = content_reloader.check(force=request.args.get('force') in ('1', 'true'))
+        return create_cors_response({"pid": os.getpid(), "reloaded": results, **content_reloader.status()})
+    return create_cors_response({"pid": os.getpid(), **content_reloader.status()})
+
+@app.route('/admin/model', methods=['GET'])
+@require_admin
+def admin_model_status():
+    """Admin-only: active model, shadow comparison and retired models (this worker)."""
+    return create_cors_response({"pid": os.getpid(), **models.status_report()})
+
+@app.route('/admin/model/shadow', methods=['POST', 'DELETE'])
+@require_admin
+def admin_model_shadow():
+    """Admin-only: POST {"path", "sample_rate"} loads a candidate model in the
+    background and shadows a share of live inputs to it; DELETE stops it."""
+    if request.method == 'DELETE':
+        return create_cors_response({"pid": os.getpid(), "stopped": models.stop_shadow()})
+
+    data = request.get_json(silent=True) or {}
+    path = data.get('path')
+    if not path or not os.path.isdir(path):
+        return jsonify({"error": "Please provide the path of a model directory"}), 400
+    try:
+        sample_rate = float(data.get('sample_rate', 0.1))
+    except (TypeError, ValueError):
+        return jsonify({"error": "sample_rate must be a number between 0 and 1"}), 400
+    if not 0.0 < sample_rate <= 1.0:
+        return jsonify({"error": "sample_rate must be a number between 0 and 1"}), 400
+    if models.active is None:
+        return jsonify({"error": "No active model to compare against"}), 409
+
+    models.start_shadow(path, sample_rate)
+    logger.info("Started shadow model", extra={"path": path, "sample_rate": sample_rate})
+    response = create_cors_response({"pid": os.getpid(), **models.status_report()})
+    response.status_code = 202
+    return response
+
+@app.route('/admin/model/promote', methods=['POST'])
+@require_admin
+def admin_model_promote():
+    """Admin-only: make the shadow candidate the active model (reference swap)."""
+    try:
+        result = models.promote()
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return create_cors_response({"pid": os.getpid(), **result})
+
 @app.route('/api/custom-game', methods=['POST', 'OPTIONS'])
 @cross_origin()
 def custom_game():
@@ -1057,7 +1511,11 @@ def custom_game():
             return jsonify({"error": "Please provide a sentence"}), 400
         
         sentence = data['sentence']
-        logger.info(f"Creating custom game with sentence: '{sentence}'")
+        too_long = sentence_too_long(sentence)
+        if too_long:
+            return too_long
+        logger.info("Creating custom game", extra={"chars": len(sentence)})
+        token_log.debug("Custom game sentence: %r", sentence)
         
         # Generate questions for the custom sentence
         questions = generate_pos_questions(sentence, num_questions=10)
@@ -1102,17 +1560,19 @@ def get_sentence_words():
 
         # Select pool based on grade or default to full list
         if grade == 'G1':
-            words = load_words_from_json(G1_MAKE_A_SENTENCE_JSON_PATH)
+            words = get_word_pool(G1_MAKE_A_SENTENCE_JSON_PATH)
         elif grade == 'G2':
-            words = load_words_from_json(G2_MAKE_A_SENTENCE_JSON_PATH)
+            words = get_word_pool(G2_MAKE_A_SENTENCE_JSON_PATH)
         elif grade == 'G3':
-            words = load_words_from_json(G3_MAKE_A_SENTENCE_JSON_PATH)
+            words = get_word_pool(G3_MAKE_A_SENTENCE_JSON_PATH)
         else:
-            words = load_words_from_json(G1_MAKE_A_SENTENCE_JSON_PATH) # Default to grade 1
+            words = get_word_pool(G1_MAKE_A_SENTENCE_JSON_PATH) # Default to grade 1
 
         if not words:
             return jsonify({"error": f"Could not load words for grade {grade}"}), 500
 
+        # Shuffle a copy; the cached pool is shared across requests (and workers)
+        words = [dict(w) for w in words]
         random.shuffle(words)
         
         # Return the words
@@ -1134,6 +1594,7 @@ def verify_make_sentence():
     if request.method == 'OPTIONS':
         return handle_preflight_request()
     
+    started = time.perf_counter()
     try:
         # Get data from request
         data = request.json
@@ -1144,11 +1605,20 @@ def verify_make_sentence():
         
         word = data['word']
         sentence = data['sentence']
+        too_long = sentence_too_long(sentence)
+        if too_long:
+            return too_long
         
-        logger.info(f"Verifying sentence for word '{word}': '{sentence}'")
+        logger.info("Verifying sentence", extra={"word": word, "chars": len(sentence)})
+        token_log.debug("Verifying sentence for %r: %r", word, sentence)
         
         # Verify the sentence
         result = verify_sentence_usage(word, sentence)
+        if answer_events is not None and "isCorrect" in result:
+            violations = result.get("violations") or []
+            answer_events.record_sentence(request_grade(data), sentence, word, result["isCorrect"],
+                                          violations[0]["rule"] if violations else None,
+                                          (time.perf_counter() - started) * 1000.0)
         
         # Add request info to result
         result["word"] = word
@@ -1201,16 +1671,13 @@ def conversation_chat():
         except Exception:
             pass
 
-        # Determine points delta by counting recognized entity mentions in the reply
-        # Patterns like: "'John' (PER)", "'DLSU' (ORG)", "'Manila' (GPE)"
-        try:
-            entity_hits = re.findall(r"'[^']+'\s*\([A-Z]{2,}\)", reply_text)
-            delta = max(0, len(entity_hits))
-        except Exception:
-            delta = 0
+        # One point per recognized entity, taken from the structured entity list
+        entities = parts_payload.get('entities') if isinstance(parts_payload, dict) else None
+        delta = len(entities or [])
         return create_cors_response({
             "reply": cleaned_reply,
             "replyParts": reply_parts,
+            "entities": entities or [],
             "scoreDelta": delta
         })
     except Exception as e:
@@ -1218,6 +1685,73 @@ def conversation_chat():
         return jsonify({"error": "Error handling conversation chat"}), 500
 
 
+def _conversation_ws_turn(ws, message):
+    """Send each reply part as soon as it is built, then a closing 'done' frame."""
+    parts = []
+    entities = []
+    for part, entity in conv_iter_bot_response_parts(message):
+        parts.append(part)
+        if entity:
+            entities.append(entity)
+        ws.send(json.dumps({"type": "part", "index": len(parts) - 1, "text": part}))
+    ws.send(json.dumps({
+        "type": "done",
+        "reply": " ".join(parts),
+        "replyParts": parts,
+        "entities": entities,
+        "scoreDelta": len(entities)
+    }))
+
+
+def _conversation_ws_loop(ws):
+    """Serve chat turns on one socket until it closes or goes idle."""
+    while True:
+        raw = ws.receive(timeout=WS_IDLE_TIMEOUT or None)
+        if raw is None:
+            # Closed by the client, or idle past the timeout
+            break
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            ws.send(json.dumps({"type": "error", "error": "invalid JSON"}))
+            continue
+        if not isinstance(data, dict):
+            ws.send(json.dumps({"type": "error", "error": "invalid frame"}))
+            continue
+        if data.get('type') == 'reset':
+            conv_reset()
+            ws.send(json.dumps({"type": "reset", "status": "reset"}))
+            continue
+        message = data.get('message')
+        if not message or not isinstance(message, str):
+            ws.send(json.dumps({"type": "error", "error": "message is required"}))
+            continue
+        try:
+            with models.zone():
+                _conversation_ws_turn(ws, message)
+        except Exception as e:
+            logger.error(f"Error in conversation websocket: {str(e)}", exc_info=True)
+            ws.send(json.dumps({"type": "error", "error": "Error handling conversation chat"}))
+
+
+if sock is not None:
+    @sock.route('/api/conversation/ws')
+    def conversation_ws(ws):
+        """Long-lived chat channel: one JSON frame in per turn, reply parts streamed out.
+
+        Client frames: {"message": "..."} or {"type": "reset"}. The socket is closed
+        after NLP_WS_IDLE_TIMEOUT seconds without a frame; past NLP_WS_MAX_SOCKETS
+        open sockets it is refused with 1013 (try again later)."""
+        if not _ws_slots.acquire(blocking=False):
+            logger.warning("Refusing conversation websocket: all slots in use", extra={"max_sockets": WS_MAX_SOCKETS})
+            ws.close(reason=1013, message="Too many open chat sockets")
+            return
+        try:
+            _conversation_ws_loop(ws)
+        finally:
+            _ws_slots.release()
+
+
 @app.route('/api/conversation/summary', methods=['GET', 'OPTIONS'])
 @cross_origin()
 def conversation_summary():
@@ -1256,7 +1790,9 @@ def handle_preflight_request():
 
 def create_cors_response(data):
     """Create a JSON response with CORS headers"""
-    response = jsonify(data)
+    with tracer.span("response.build") as span:
+        response = jsonify(data)
+        span.set_attribute("http.response_bytes", response.content_length or 0)
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization, Accept')
@@ -1272,5 +1808,9 @@ if __name__ == '__main__':
     logger.info(f"Starting NLP API server on port {port}")
     print(f"NLP API server running at: http://0.0.0.0:{port}")
 
+    # No supervisor to respawn us here, so the watchdog only logs
+    memory_watchdog.start(restart=False)
+    content_reloader.start()
+
     # Run the Flask app (no reloader in containers)
     app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
\ No newline at end of file
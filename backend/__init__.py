@@ -0,0 +1 @@
+"""Runtime support for the NLP API server (app.py): process, model and data helpers."""
@@ -0,0 +1,30 @@
+"""Guard for operator-only endpoints (/debug/*, /admin/*).
+
+Set ADMIN_TOKEN and send it as "Authorization: Bearer <token>" or
+"X-Admin-Token: <token>". Without ADMIN_TOKEN the endpoints answer 404.
+"""
+
+import hmac
+import os
+from functools import wraps
+
+from flask import jsonify, request
+
+
+def _presented_token() -> str:
+    header = request.headers.get("Authorization", "")
+    if header.lower().startswith("bearer "):
+        return header[7:].strip()
+    return request.headers.get("X-Admin-Token", "")
+
+
+def require_admin(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        expected = os.environ.get("ADMIN_TOKEN")
+        if not expected:
+            return jsonify({"error": "Not found"}), 404
+        if not hmac.compare_digest(_presented_token(), expected):
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
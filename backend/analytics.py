@@ -0,0 +1,252 @@
+"""Learning-analytics log of answer outcomes.
+
+Each graded answer (POS game, batch verify, Make a Sentence) is recorded as
+one tuple appended to an in-memory ring buffer: no lock, no I/O and no
+formatting on the request thread, a few microseconds per event. A background
+thread drains the buffer every NLP_ANALYTICS_FLUSH_INTERVAL seconds and
+writes it to SQLite in one transaction. WAL mode lets every gunicorn worker
+on a host share the file. When the writer falls behind, the oldest unflushed
+events are overwritten and counted as dropped.
+
+Sentence ids are a hash of the normalized sentence, so the same corpus
+sentence has the same id in every worker and across restarts. The chosen
+answer is stored as the POS key it names (the option text is mapped back
+through POS_OPTIONS), which makes per-grade confusion matrices one GROUP BY.
+
+    NLP_ANALYTICS_PATH             SQLite file ("off" disables; default in the temp dir)
+    NLP_ANALYTICS_BUFFER           events held in memory between flushes (default 10000)
+    NLP_ANALYTICS_FLUSH_INTERVAL   seconds between flushes (default 5)
+"""
+
+import collections
+import contextlib
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+from backend.parse_cache import normalize_text
+from backend.pos import POS_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYTICS_PATH = os.path.join(tempfile.gettempdir(), "tagalog-nlp-analytics.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answer_events (
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    grade TEXT,
+    sentence_id TEXT NOT NULL,
+    token TEXT,
+    token_index INTEGER,
+    correct_pos TEXT,
+    chosen_pos TEXT,
+    is_correct INTEGER NOT NULL,
+    rule TEXT,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS answer_events_grade ON answer_events (kind, grade, ts);
+"""
+_COLUMNS = "ts, kind, grade, sentence_id, token, token_index, correct_pos, chosen_pos, is_correct, rule, latency_ms"
+
+# Option text -> POS key, for answers sent as the text shown to the student
+_POS_BY_DESCRIPTION = {description: key for key, description in POS_OPTIONS.items()}
+UNKNOWN_GRADE = "unknown"
+
+
+def sentence_id(sentence: str) -> str:
+    return hashlib.sha1(normalize_text(sentence).encode("utf-8")).hexdigest()[:12]
+
+
+class AnswerEvents:
+    def __init__(self, path: str, capacity: int = 10000, interval: float = 5.0):
+        self.path = path
+        self.capacity = capacity
+        self.interval = interval
+        # Raw tuples as recorded; deque.append is atomic, so recording needs no lock
+        self._events: collections.deque = collections.deque(maxlen=capacity)
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        # Unlocked counters: close enough for /health, never worth a lock per event
+        self.recorded = 0
+        self.written = 0
+        self.lost = 0
+        self.errors = 0
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> Optional["AnswerEvents"]:
+        path = os.environ.get("NLP_ANALYTICS_PATH", DEFAULT_ANALYTICS_PATH)
+        if not path or path.lower() == "off":
+            return None
+        try:
+            return cls(
+                path,
+                capacity=int(os.environ.get("NLP_ANALYTICS_BUFFER", "10000")),
+                interval=float(os.environ.get("NLP_ANALYTICS_FLUSH_INTERVAL", "5")),
+            )
+        except Exception as e:
+            logger.warning(f"Answer analytics disabled; cannot open {path}: {e}")
+            return None
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """A short-lived connection; commits on success and always closes."""
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- Recording (request path) ---
+
+    def record_pos(self, grade: Optional[str], sentence: str, token: str, index: Optional[int],
+                   correct_pos: str, chosen: str, is_correct: bool, latency_ms: float) -> None:
+        """One POS answer; chosen is the option text or POS key the student picked."""
+        self._ensure_writer()
+        self.recorded += 1
+        self._events.append((time.time(), "pos", grade, sentence, token, index, correct_pos, chosen,
+                             is_correct, None, latency_ms))
+
+    def record_sentence(self, grade: Optional[str], sentence: str, word: str, is_correct: bool,
+                        rule: Optional[str], latency_ms: float) -> None:
+        """One Make a Sentence verdict; rule is the first violated grammar rule."""
+        self._ensure_writer()
+        self.recorded += 1
+        self._events.append((time.time(), "sentence", grade, sentence, word, None, None, None,
+                             is_correct, rule, latency_ms))
+
+    # --- Writing (background) ---
+
+    def _ensure_writer(self) -> None:
+        if self._writer_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._writer_pid == os.getpid():
+                return
+            if self._writer_pid is not None:
+                # Forked child: the parent's unflushed events are the parent's
+                self._events = collections.deque(maxlen=self.capacity)
+                self.recorded = self.written = self.lost = 0
+                self._flush_lock = threading.Lock()
+            self._writer_pid = os.getpid()
+            self._writer = threading.Thread(target=self._write_loop, name="analytics-writer", daemon=True)
+            self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Answer analytics flush failed: {e}", exc_info=True)
+
+    def flush(self) -> int:
+        """Write every buffered event now; returns how many were written."""
+        with self._flush_lock:
+            batch = []
+            events = self._events
+            while True:
+                try:
+                    batch.append(events.popleft())
+                except IndexError:
+                    break
+            if not batch:
+                return 0
+            rows = [self._row(event) for event in batch]
+            try:
+                with self._connect() as conn:
+                    conn.executemany(f"INSERT INTO answer_events ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            except sqlite3.Error as e:
+                self.errors += 1
+                self.lost += len(rows)
+                logger.warning(f"Answer analytics write failed, {len(rows)} events lost: {e}")
+                return 0
+            self.written += len(rows)
+            return len(rows)
+
+    @staticmethod
+    def _row(event: tuple) -> tuple:
+        ts, kind, grade, sentence, token, index, correct_pos, chosen, is_correct, rule, latency_ms = event
+        chosen_pos = _POS_BY_DESCRIPTION.get(chosen, chosen) if chosen is not None else None
+        return (ts, kind, grade or UNKNOWN_GRADE, sentence_id(sentence), token, index, correct_pos,
+                chosen_pos, int(bool(is_correct)), rule,
+                round(latency_ms, 2) if latency_ms is not None else None)
+
+    # --- Aggregation ---
+
+    def confusion(self, grade: Optional[str] = None, since: Optional[float] = None,
+                  top_words: int = 10) -> Dict[str, object]:
+        """Per-grade POS confusion matrices (rows: correct POS, columns: chosen)
+        and the most missed words, over events since `since` (epoch seconds)."""
+        self.flush()
+        where = ["kind = 'pos'"]
+        params: List[object] = []
+        if grade:
+            where.append("grade = ?")
+            params.append(grade)
+        if since:
+            where.append("ts >= ?")
+            params.append(since)
+        clause = " AND ".join(where)
+        with self._connect() as conn:
+            cells = conn.execute(
+                f"SELECT grade, correct_pos, chosen_pos, COUNT(*) FROM answer_events WHERE {clause} "
+                "GROUP BY grade, correct_pos, chosen_pos", params).fetchall()
+            missed = conn.execute(
+                f"SELECT grade, LOWER(token), correct_pos, COUNT(*) AS n FROM answer_events "
+                f"WHERE {clause} AND is_correct = 0 GROUP BY grade, LOWER(token), correct_pos ORDER BY n DESC",
+                params).fetchall()
+
+        grades: Dict[str, Dict[str, object]] = {}
+        for row_grade, correct_pos, chosen_pos, n in cells:
+            entry = grades.setdefault(row_grade, {"counts": collections.Counter(), "missed": []})
+            entry["counts"][(correct_pos, chosen_pos)] += n
+        for row_grade, token, correct_pos, n in missed:
+            entry = grades.get(row_grade)
+            if entry is not None and len(entry["missed"]) < top_words:
+                entry["missed"].append({"word": token, "correct": correct_pos, "wrong": n})
+
+        report: Dict[str, object] = {}
+        for row_grade, entry in sorted(grades.items()):
+            counts = entry["counts"]
+            labels = sorted({label for pair in counts for label in pair if label})
+            index = {label: i for i, label in enumerate(labels)}
+            matrix = [[0] * len(labels) for _ in labels]
+            for (correct_pos, chosen_pos), n in counts.items():
+                if correct_pos in index and chosen_pos in index:
+                    matrix[index[correct_pos]][index[chosen_pos]] += n
+            total = sum(counts.values())
+            right = sum(n for (correct_pos, chosen_pos), n in counts.items() if correct_pos == chosen_pos)
+            report[row_grade] = {
+                "labels": labels,
+                "matrix": matrix,
+                "answers": total,
+                "accuracy": round(right / total, 4) if total else None,
+                "most_missed": entry["missed"],
+            }
+        return {"grades": report, "since": since}
+
+    def stats(self) -> Dict[str, object]:
+        pending = len(self._events)
+        return {
+            "path": self.path,
+            "recorded": self.recorded,
+            "written": self.written,
+            "pending": pending,
+            # Overwritten in the ring before a flush reached them
+            "dropped": max(0, self.recorded - self.written - self.lost - pending),
+            "lost": self.lost,
+            "errors": self.errors,
+        }
@@ -0,0 +1,285 @@
+"""Small/large pipeline cascade with per-token confidence.
+
+Most game sentences are short and unambiguous, so they do not need the
+transformer. With a small CPU pipeline configured, every sentence is parsed
+by it first; the sentence is escalated to the active (large) pipeline only
+when it is longer than NLP_CASCADE_MAX_TOKENS or any token's confidence is
+below NLP_CASCADE_MIN_CONFIDENCE.
+
+A token's confidence is the tagger's (or morphologizer's) top softmax score;
+tokens whose POS/TAG a token_override rule decides count as certain. A small
+pipeline with neither (a blank stand-in) therefore only answers sentences the
+rules fully cover. Its Docs are served as final answers, so it must set every
+annotation the server reads that the active pipeline sets: dependencies
+(grammar checks, explanations) and entities (chatbot). A small pipeline
+without a parser or NER the active one has is refused at load and when a
+model without them is promoted. Small-model answers are offered to a shadow
+run like any other.
+
+    NLP_SMALL_MODEL_PATH         small pipeline directory (unset: no cascade)
+    NLP_CASCADE_MIN_CONFIDENCE   lowest token confidence kept on the small model (default 0.9)
+    NLP_CASCADE_MAX_TOKENS       longer sentences always escalate (default 12)
+
+Measure agreement with the transformer-only baseline on the MCQ corpus before
+turning it on:
+
+    python -m backend.cascade eval --small ./tl_small [--large ./tl_tocylog_trf] [--thresholds 0.8,0.9,0.95]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+from spacy.attrs import DEP, HEAD, ORTH, POS, TAG
+from spacy.pipeline import Tagger
+
+from backend.logs import configure_cli_logging
+from backend.model import DEFAULT_MODEL_PATH, _percentiles, load_pipeline
+from backend.parse_cache import model_version
+from conversation.token_override_component import override_components
+
+logger = logging.getLogger(__name__)
+
+_LATENCY_SAMPLES = 1000
+
+# Annotations the server reads from a Doc, and the component that sets each
+_REQUIRED_ANNOTATIONS = {"token.dep": "parser", "doc.ents": "entity recognizer"}
+
+
+def _assigns(nlp) -> set:
+    return {attr for name in nlp.pipe_names for attr in nlp.get_pipe_meta(name).assigns}
+
+
+def missing_annotations(small, active) -> List[str]:
+    """Components the active pipeline has whose annotations small would not set."""
+    have, need = _assigns(small), _assigns(active)
+    return [label for attr, label in _REQUIRED_ANNOTATIONS.items() if attr in need and attr not in have]
+
+
+def _probabilities(scores: numpy.ndarray) -> numpy.ndarray:
+    """Row-wise probabilities; taggers built with normalize_outputs=False
+    (the spaCy 3 default) return logits at inference time."""
+    if scores.size and scores.min() >= 0.0 and numpy.allclose(scores.sum(axis=1), 1.0, atol=1e-3):
+        return scores
+    shifted = numpy.exp(scores - scores.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+def parse_with_confidence(nlp, text: str) -> Tuple[object, numpy.ndarray]:
+    """Run nlp on text and return (doc, per-token confidence in [0, 1]).
+
+    Tagger-type components are run as model.predict + set_annotations so
+    their scores are read without a second forward pass."""
+    doc = nlp.make_doc(text)
+    confidence: Optional[numpy.ndarray] = None
+    for _, component in nlp.pipeline:
+        if isinstance(component, Tagger) and len(doc):
+            scores = component.model.ops.to_numpy(component.model.predict([doc])[0])
+            component.set_annotations([doc], [scores.argmax(axis=1)])
+            top = _probabilities(scores).max(axis=1)
+            confidence = top if confidence is None else numpy.minimum(confidence, top)
+        else:
+            doc = component(doc)
+    if confidence is None:
+        confidence = numpy.zeros(len(doc), dtype=numpy.float32)
+    for component in override_components(nlp):
+        confidence[component.covers(doc)] = 1.0
+    return doc, confidence
+
+
+class Cascade:
+    def __init__(self, small, path: str, min_confidence: float = 0.9, max_tokens: int = 12):
+        self.small = small
+        self.path = path
+        self.min_confidence = min_confidence
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self.small_ms: deque = deque(maxlen=_LATENCY_SAMPLES)
+        self.counts = {"sentences": 0, "served_small": 0, "escalated_long": 0, "escalated_low_confidence": 0}
+
+    @classmethod
+    def from_env(cls, active=None) -> Optional["Cascade"]:
+        path = os.environ.get("NLP_SMALL_MODEL_PATH")
+        if not path:
+            return None
+        try:
+            small = load_pipeline(path)
+        except Exception as e:
+            logger.error(f"Cascade disabled; cannot load small model {path}: {e}")
+            return None
+        missing = missing_annotations(small, active) if active is not None else []
+        if missing:
+            logger.error(f"Cascade disabled; small model {path} has no {' or '.join(missing)} "
+                         "and the active model does")
+            return None
+        cascade = cls(
+            small, path,
+            min_confidence=float(os.environ.get("NLP_CASCADE_MIN_CONFIDENCE", "0.9")),
+            max_tokens=int(os.environ.get("NLP_CASCADE_MAX_TOKENS", "12")),
+        )
+        logger.info("Model cascade enabled", extra={"small": path, "min_confidence": cascade.min_confidence,
+                                                    "max_tokens": cascade.max_tokens})
+        return cascade
+
+    @property
+    def version(self) -> str:
+        """Part of the parse cache namespace: which answers this cascade gives."""
+        return f"cascade:{model_version(self.small)}:{self.min_confidence}:{self.max_tokens}"
+
+    def try_small(self, text: str):
+        """The small pipeline's Doc if it is confident enough, else None."""
+        if len(self.small.tokenizer(text)) > self.max_tokens:
+            self._count("escalated_long")
+            return None
+        start = time.perf_counter()
+        doc, confidence = parse_with_confidence(self.small, text)
+        elapsed = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            self.small_ms.append(elapsed)
+        if len(confidence) and confidence.min() < self.min_confidence:
+            self._count("escalated_low_confidence")
+            return None
+        self._count("served_small")
+        return doc
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.counts["sentences"] += 1
+            self.counts[outcome] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counts = dict(self.counts)
+            small_ms = _percentiles(self.small_ms)
+        sentences = counts["sentences"]
+        escalated = counts["escalated_long"] + counts["escalated_low_confidence"]
+        return {
+            "small": self.path,
+            "min_confidence": self.min_confidence,
+            "max_tokens": self.max_tokens,
+            **counts,
+            "escalated": escalated,
+            "escalation_rate": round(escalated / sentences, 4) if sentences else 0.0,
+            "small_latency_ms": small_ms,
+        }
+
+
+# --- Offline evaluation against the transformer-only baseline ---
+
+_EVAL_ATTRS = [ORTH, POS, TAG, DEP, HEAD]
+
+
+def evaluate(small, large, sentences: List[str], thresholds: List[float], max_tokens: int) -> Dict[str, object]:
+    """Agreement of cascade output with the large pipeline alone, per threshold.
+
+    Every sentence is parsed by both pipelines once; each threshold then
+    replays the escalation decision over the recorded results."""
+    rows = []
+    for text in sentences:
+        start = time.perf_counter()
+        baseline = large(text).to_array(_EVAL_ATTRS)
+        large_ms = (time.perf_counter() - start) * 1000.0
+        start = time.perf_counter()
+        doc, confidence = parse_with_confidence(small, text)
+        small_ms = (time.perf_counter() - start) * 1000.0
+        attrs = doc.to_array(_EVAL_ATTRS)
+        # None: the two tokenizations differ, so nothing lines up
+        diff = attrs != baseline if attrs.shape == baseline.shape and (attrs[:, 0] == baseline[:, 0]).all() else None
+        rows.append({
+            "long": len(doc) > max_tokens,
+            "min_confidence": float(confidence.min()) if len(confidence) else 1.0,
+            "tokens": len(baseline),
+            "diff": diff,
+            "small_ms": small_ms,
+            "large_ms": large_ms,
+        })
+
+    n = len(rows) or 1
+    total_tokens = sum(r["tokens"] for r in rows) or 1
+    report = {
+        "sentences": len(rows),
+        "tokens": sum(r["tokens"] for r in rows),
+        "max_tokens": max_tokens,
+        "ms_per_sentence": {
+            "small": round(sum(r["small_ms"] for r in rows) / n, 2),
+            "large": round(sum(r["large_ms"] for r in rows) / n, 2),
+        },
+        "thresholds": [],
+    }
+    for threshold in thresholds:
+        escalated = tokenization = identical = 0
+        cost_ms = 0.0
+        disagree = {"pos": 0, "tag": 0, "dep": 0}
+        for row in rows:
+            if row["long"]:
+                # Escalated on length alone, before the small model runs
+                escalated += 1
+                identical += 1
+                cost_ms += row["large_ms"]
+                continue
+            cost_ms += row["small_ms"]
+            if row["min_confidence"] < threshold:
+                escalated += 1
+                identical += 1
+                cost_ms += row["large_ms"]
+                continue
+            diff = row["diff"]
+            if diff is None:
+                tokenization += 1
+                for key in disagree:
+                    disagree[key] += row["tokens"]
+                continue
+            disagree["pos"] += int(diff[:, 1].sum())
+            disagree["tag"] += int(diff[:, 2].sum())
+            # A dependency differs when either the label or the head does
+            disagree["dep"] += int((diff[:, 3] | diff[:, 4]).sum())
+            identical += not diff[:, 1:].any()
+        report["thresholds"].append({
+            "min_confidence": threshold,
+            "escalation_rate": round(escalated / n, 4),
+            "agreement": {key: round(1 - value / total_tokens, 4) for key, value in disagree.items()},
+            "sentences_identical": round(identical / n, 4),
+            "tokenization_mismatch": tokenization,
+            "ms_per_sentence": round(cost_ms / n, 2),
+        })
+    return report
+
+
+def main(argv: List[str]) -> int:
+    from backend.corpus_index import DEFAULT_SOURCES, iter_mcq_sentences
+
+    parser = argparse.ArgumentParser(prog="python -m backend.cascade")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ev = sub.add_parser("eval", help="compare cascade output with the large model alone on the MCQ corpus")
+    ev.add_argument("--small", default=os.environ.get("NLP_SMALL_MODEL_PATH"), required="NLP_SMALL_MODEL_PATH" not in os.environ)
+    ev.add_argument("--large", default=DEFAULT_MODEL_PATH)
+    ev.add_argument("--thresholds", default="0.5,0.7,0.8,0.9,0.95,0.99")
+    ev.add_argument("--max-tokens", type=int, default=int(os.environ.get("NLP_CASCADE_MAX_TOKENS", "12")))
+    ev.add_argument("--limit", type=int, default=0, help="evaluate only the first N sentences")
+    args = parser.parse_args(argv[1:])
+
+    configure_cli_logging()
+    sentences = []
+    for path in DEFAULT_SOURCES.values():
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            sentences.extend(sentence for _, sentence in iter_mcq_sentences(json.load(f)))
+    if args.limit:
+        sentences = sentences[:args.limit]
+    logger.info("Evaluating cascade on %d sentences", len(sentences))
+    report = evaluate(load_pipeline(args.small), load_pipeline(args.large), sentences,
+                      [float(t) for t in args.thresholds.split(",")], args.max_tokens)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
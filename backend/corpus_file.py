@@ -0,0 +1,259 @@
+"""Compiled, memory-mapped word and sentence pools.
+
+All JSON pools under words/ and old_words/ are compiled into one binary file:
+a small header, fixed-width uint32 tables (strings, pools, items, fields) and
+a UTF-8 string blob. The server maps the file read-only and hands out
+lightweight views that decode strings on access, so startup parses no JSON
+and every worker on a host shares the same page-cache pages.
+
+    python -m backend.corpus_file compile [--out words/corpus.bin]
+
+Layout (little-endian):
+    header   MAGIC, u32 version, u32 counts x4, u64 section offsets x5
+    strings  n_strings x (u32 offset, u32 length) into the blob
+    pools    n_pools   x (u32 name_sid, u32 first_item, u32 item_count)
+    items    n_items   x (u32 first_field, u32 field_count)
+    fields   n_fields  x (u32 key_sid, u32 value_sid, u32 kind)
+    blob     UTF-8 bytes; the first string is the JSON source manifest
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS_PATH = os.path.join(REPO_DIR, "words", "corpus.bin")
+SOURCE_DIRS = ("words", "old_words")
+
+MAGIC = b"TGLCORP1"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIIII5Q")
+
+KIND_STR = 0
+KIND_JSON = 1  # lists and other non-string values, decoded with json.loads
+
+_U32 = numpy.dtype("<u4")
+
+
+def pool_name(path: str) -> str:
+    """Pool key for a JSON file: its repo-relative path without extension."""
+    rel = os.path.relpath(os.path.abspath(path), REPO_DIR)
+    return os.path.splitext(rel)[0].replace(os.sep, "/")
+
+
+def _source_stat(path: str) -> List[int]:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def discover_sources() -> List[str]:
+    paths = []
+    for d in SOURCE_DIRS:
+        full = os.path.join(REPO_DIR, d)
+        if os.path.isdir(full):
+            paths.extend(os.path.join(full, f) for f in sorted(os.listdir(full)) if f.endswith(".json"))
+    return paths
+
+
+# --- Compiler ---
+
+def compile_corpus(sources: List[str], out_path: str) -> Dict[str, int]:
+    strings: List[bytes] = []
+    string_ids: Dict[str, int] = {}
+
+    def sid(text: str) -> int:
+        found = string_ids.get(text)
+        if found is None:
+            found = string_ids[text] = len(strings)
+            strings.append(text.encode("utf-8"))
+        return found
+
+    manifest = {pool_name(p): _source_stat(p) for p in sources}
+    sid(json.dumps(manifest, sort_keys=True))
+
+    pools: List[Tuple[int, int, int]] = []
+    items: List[Tuple[int, int]] = []
+    fields: List[Tuple[int, int, int]] = []
+    for path in sources:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            raise ValueError(f"{path}: expected a JSON list of items")
+        first_item = len(items)
+        for raw in data:
+            record = raw if isinstance(raw, dict) else {"word": str(raw)}
+            first_field = len(fields)
+            for key, value in record.items():
+                if isinstance(value, str):
+                    fields.append((sid(key), sid(value), KIND_STR))
+                else:
+                    fields.append((sid(key), sid(json.dumps(value, ensure_ascii=False)), KIND_JSON))
+            items.append((first_field, len(fields) - first_field))
+        pools.append((sid(pool_name(path)), first_item, len(items) - first_item))
+
+    index = numpy.zeros((len(strings), 2), dtype=_U32)
+    offset = 0
+    for i, encoded in enumerate(strings):
+        index[i] = (offset, len(encoded))
+        offset += len(encoded)
+
+    tables = [
+        index.tobytes(),
+        numpy.asarray(pools, dtype=_U32).reshape(-1, 3).tobytes(),
+        numpy.asarray(items, dtype=_U32).reshape(-1, 2).tobytes(),
+        numpy.asarray(fields, dtype=_U32).reshape(-1, 3).tobytes(),
+        b"".join(strings),
+    ]
+    offsets = []
+    position = _HEADER.size
+    for table in tables:
+        offsets.append(position)
+        position += len(table)
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(strings), len(pools), len(items), len(fields), *offsets))
+        for table in tables:
+            f.write(table)
+    os.replace(tmp_path, out_path)
+    return {"pools": len(pools), "items": len(items), "strings": len(strings), "bytes": position}
+
+
+# --- Reader ---
+
+class CorpusFile:
+    """Read-only mapping of a compiled corpus file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, n_strings, n_pools, n_items, n_fields,
+         strings_off, pools_off, items_off, fields_off, blob_off) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} corpus file")
+        # numpy views straight over the mapping: no copies, pages stay shared
+        self._strings = numpy.frombuffer(self._mm, _U32, n_strings * 2, strings_off).reshape(-1, 2)
+        self._pools = numpy.frombuffer(self._mm, _U32, n_pools * 3, pools_off).reshape(-1, 3)
+        self._items = numpy.frombuffer(self._mm, _U32, n_items * 2, items_off).reshape(-1, 2)
+        self._fields = numpy.frombuffer(self._mm, _U32, n_fields * 3, fields_off).reshape(-1, 3)
+        self._blob_off = blob_off
+        self.manifest: Dict[str, List[int]] = json.loads(self.string(0))
+        self._pool_ids = {self.string(int(p[0])): i for i, p in enumerate(self._pools)}
+        # Field names are few; resolving them once keeps lookups integer-only
+        self._key_ids = {self.string(int(k)): int(k) for k in numpy.unique(self._fields[:, 0])}
+
+    @classmethod
+    def open(cls, path: str) -> Optional["CorpusFile"]:
+        if not os.path.isfile(path):
+            return None
+        try:
+            corpus = cls(path)
+        except Exception as e:
+            logger.warning("Failed to open compiled corpus %s: %s", path, e)
+            return None
+        logger.info("Mapped compiled corpus %s (%d pools)", path, len(corpus._pool_ids))
+        return corpus
+
+    def string(self, sid: int) -> str:
+        offset, length = self._strings[sid]
+        start = self._blob_off + int(offset)
+        return self._mm[start:start + int(length)].decode("utf-8")
+
+    def is_fresh(self, path: str) -> bool:
+        """True when the compiled pool for path matches the JSON file on disk."""
+        recorded = self.manifest.get(pool_name(path))
+        try:
+            return recorded is not None and recorded == _source_stat(path)
+        except OSError:
+            return False
+
+    def pool(self, path: str) -> Optional["PoolView"]:
+        """The compiled pool for a JSON source path, or None if absent or stale."""
+        pool_id = self._pool_ids.get(pool_name(path))
+        if pool_id is None or not self.is_fresh(path):
+            return None
+        _, first, count = self._pools[pool_id]
+        return PoolView(self, int(first), int(count))
+
+
+class PoolView(Sequence):
+    """List-like view of one pool; items are ItemView mappings."""
+
+    def __init__(self, corpus: CorpusFile, first: int, count: int):
+        self._corpus = corpus
+        self._first = first
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        first_field, n_fields = self._corpus._items[self._first + i]
+        return ItemView(self._corpus, int(first_field), int(n_fields))
+
+
+class ItemView(Mapping):
+    """Dict-like view of one pool item; values are decoded on access."""
+
+    __slots__ = ("_corpus", "_first", "_count")
+
+    def __init__(self, corpus: CorpusFile, first: int, count: int):
+        self._corpus = corpus
+        self._first = first
+        self._count = count
+
+    def _rows(self) -> numpy.ndarray:
+        return self._corpus._fields[self._first:self._first + self._count]
+
+    def __getitem__(self, key: str):
+        key_id = self._corpus._key_ids.get(key)
+        if key_id is not None:
+            for k, value_sid, kind in self._rows():
+                if k == key_id:
+                    text = self._corpus.string(int(value_sid))
+                    return json.loads(text) if kind == KIND_JSON else text
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for k, _, _ in self._rows():
+            yield self._corpus.string(int(k))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __repr__(self) -> str:
+        return f"ItemView({dict(self)!r})"
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.corpus_file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("compile", help="compile words/ and old_words/ into one mapped file")
+    build.add_argument("--out", default=DEFAULT_CORPUS_PATH)
+    args = parser.parse_args(argv[1:])
+
+    stats = compile_corpus(discover_sources(), args.out)
+    print(f"Wrote {args.out}: {stats['pools']} pools, {stats['items']} items, "
+          f"{stats['strings']} strings, {stats['bytes']} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,303 @@
+"""Precomputed index over the MCQ corpus for sentence selection.
+
+Every sentence in the grade MCQ pools is parsed once (offline) and summarised
+as fixed-width NumPy columns: POS counts, token count, dependency depth,
+rare-word rate and a continuous complexity score. /api/pos-game then picks a
+sentence with one vectorised mask instead of hoping a random pick has enough
+taggable tokens.
+
+    python -m backend.corpus_index build [--model ./tl_tocylog_trf] [--out words/mcq_index.npz]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+from collections import Counter
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy
+
+from backend.features import DocFeatures
+from backend.logs import configure_cli_logging
+from backend.pos import POS_OPTIONS
+from conversation.token_override_component import pipeline_rules_fingerprint
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX_PATH = os.path.join(REPO_DIR, "words", "mcq_index.npz")
+# Same env overrides as app.py, so the fingerprint matches what the server loads
+DEFAULT_SOURCES = {
+    "G1": os.environ.get("G1_MCQ_JSON_PATH", os.path.join(REPO_DIR, "words", "grade1_mcq.json")),
+    "G2": os.environ.get("G2_MCQ_JSON_PATH", os.path.join(REPO_DIR, "words", "grade2_mcq.json")),
+    "G3": os.environ.get("G3_MCQ_JSON_PATH", os.path.join(REPO_DIR, "words", "grade3_mcq.json")),
+}
+
+POS_KEYS = list(POS_OPTIONS.keys())
+GRADES = ["G1", "G2", "G3"]
+# Row keys in the MCQ JSON, in the order of the /api/pos-game difficulty buckets
+BUCKETS = ["short", "medium", "long"]
+DIFFICULTY_BUCKETS = {"easy": "short", "medium": "medium", "hard": "long"}
+
+# Weights of the normalised features in the complexity score (sums to 1)
+COMPLEXITY_WEIGHTS = {"tokens": 0.5, "depth": 0.3, "rare": 0.2}
+
+
+def iter_mcq_sentences(rows) -> Iterable[Tuple[str, str]]:
+    """Yield (bucket, sentence) from an MCQ pool.
+
+    Accepts the current list-of-rows shape ({"short", "medium", "long"} per
+    row) as well as a single dict of bucket -> list of sentences."""
+    if isinstance(rows, Mapping):
+        rows = [{bucket: s} for bucket, items in rows.items() for s in (items or [])]
+    for row in rows or []:
+        if not isinstance(row, Mapping):
+            continue
+        for bucket in BUCKETS:
+            sentence = row.get(bucket)
+            if isinstance(sentence, str) and sentence.strip():
+                yield bucket, sentence.strip()
+
+
+def sources_fingerprint(sources: Dict[str, str]) -> str:
+    """Hash of the source files, so a stale index can be detected at load."""
+    digest = hashlib.sha1()
+    for grade in sorted(sources):
+        digest.update(grade.encode("utf-8"))
+        try:
+            with open(sources[grade], "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+def _dependency_depth(doc) -> int:
+    depth = 0
+    for token in doc:
+        d = 0
+        node = token
+        # Bounded walk to the root; malformed trees cannot loop forever
+        while node.head.i != node.i and d < len(doc):
+            node = node.head
+            d += 1
+        depth = max(depth, d)
+    return depth
+
+
+class CorpusIndex:
+    """Column store of per-sentence features with mask-based queries."""
+
+    def __init__(self, columns: Dict[str, numpy.ndarray], meta: Dict[str, object]):
+        self.sentences = columns["sentences"]
+        self.grade = columns["grade"]
+        self.bucket = columns["bucket"]
+        self.pos_counts = columns["pos_counts"]
+        self.n_tokens = columns["n_tokens"]
+        self.questionable = columns["questionable"]
+        self.dep_depth = columns["dep_depth"]
+        self.rare_rate = columns["rare_rate"]
+        self.complexity = columns["complexity"]
+        self.meta = meta
+        # Why the POS columns may be out of date, when loaded anyway
+        self.stale: Optional[str] = None
+        self.pos_column = {key: i for i, key in enumerate(meta.get("pos_keys", POS_KEYS))}
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    # --- Build / persist ---
+
+    @classmethod
+    def build(cls, nlp, sources: Dict[str, str], batch_size: int = 32) -> "CorpusIndex":
+        entries: List[Tuple[int, int, str]] = []
+        for grade in GRADES:
+            path = sources.get(grade)
+            if not path or not os.path.isfile(path):
+                logger.warning("MCQ source for %s not found: %s", grade, path)
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+            for bucket, sentence in iter_mcq_sentences(rows):
+                entries.append((GRADES.index(grade), BUCKETS.index(bucket), sentence))
+
+        docs = list(nlp.pipe((e[2] for e in entries), batch_size=batch_size))
+        freq = Counter(t.lower_ for doc in docs for t in doc if t.is_alpha)
+
+        n = len(entries)
+        pos_counts = numpy.zeros((n, len(POS_KEYS)), dtype=numpy.int16)
+        n_tokens = numpy.zeros(n, dtype=numpy.int16)
+        questionable = numpy.zeros(n, dtype=numpy.int16)
+        dep_depth = numpy.zeros(n, dtype=numpy.int16)
+        rare_rate = numpy.zeros(n, dtype=numpy.float32)
+        for row, doc in enumerate(docs):
+            alpha = 0
+            rare = 0
+            for key in DocFeatures(doc).pos:
+                if key in POS_OPTIONS:
+                    pos_counts[row, POS_KEYS.index(key)] += 1
+            for token in doc:
+                if token.is_alpha:
+                    alpha += 1
+                    rare += freq[token.lower_] <= 1
+            n_tokens[row] = len([t for t in doc if not t.is_punct])
+            questionable[row] = pos_counts[row].sum()
+            dep_depth[row] = _dependency_depth(doc)
+            rare_rate[row] = rare / alpha if alpha else 0.0
+
+        def _norm(values: numpy.ndarray) -> numpy.ndarray:
+            values = values.astype(numpy.float32)
+            top = float(values.max()) if len(values) else 0.0
+            return values / top if top > 0 else values
+
+        complexity = (
+            COMPLEXITY_WEIGHTS["tokens"] * _norm(n_tokens)
+            + COMPLEXITY_WEIGHTS["depth"] * _norm(dep_depth)
+            + COMPLEXITY_WEIGHTS["rare"] * rare_rate
+        ).astype(numpy.float32)
+
+        columns = {
+            "sentences": numpy.array([e[2] for e in entries], dtype=str),
+            "grade": numpy.array([e[0] for e in entries], dtype=numpy.int8),
+            "bucket": numpy.array([e[1] for e in entries], dtype=numpy.int8),
+            "pos_counts": pos_counts,
+            "n_tokens": n_tokens,
+            "questionable": questionable,
+            "dep_depth": dep_depth,
+            "rare_rate": rare_rate,
+            "complexity": complexity,
+        }
+        meta = {
+            "pos_keys": POS_KEYS,
+            "model": f"{nlp.meta.get('lang', '')}_{nlp.meta.get('name', '')}-{nlp.meta.get('version', '')}",
+            "sources": sources_fingerprint(sources),
+            "rules": pipeline_rules_fingerprint(nlp),
+        }
+        return cls(columns, meta)
+
+    def save(self, path: str) -> None:
+        numpy.savez_compressed(
+            path,
+            sentences=self.sentences,
+            grade=self.grade,
+            bucket=self.bucket,
+            pos_counts=self.pos_counts,
+            n_tokens=self.n_tokens,
+            questionable=self.questionable,
+            dep_depth=self.dep_depth,
+            rare_rate=self.rare_rate,
+            complexity=self.complexity,
+            meta=numpy.array(json.dumps(self.meta)),
+        )
+
+    @classmethod
+    def load(
+        cls, path: str, sources: Optional[Dict[str, str]] = None, rules: Optional[str] = None,
+        keep_stale_rules: bool = False,
+    ) -> Optional["CorpusIndex"]:
+        """Load an index; returns None if missing or built from other sources.
+
+        rules is the serving pipeline's override fingerprint; an index parsed
+        under different override rules is ignored as well, unless
+        keep_stale_rules is set: then it loads with `stale` set. Its sentences
+        are still the pools' sentences, only some POS counts may be off."""
+        if not os.path.isfile(path):
+            logger.info("No MCQ corpus index at %s (build with: python -m backend.corpus_index build)", path)
+            return None
+        try:
+            with numpy.load(path, allow_pickle=False) as data:
+                columns = {key: data[key] for key in data.files if key != "meta"}
+                meta = json.loads(str(data["meta"]))
+        except Exception as e:
+            logger.warning("Failed to load MCQ corpus index %s: %s", path, e)
+            return None
+        if sources is not None and meta.get("sources") != sources_fingerprint(sources):
+            logger.warning("MCQ corpus index %s is stale (sources changed); ignoring it", path)
+            return None
+        stale = None
+        if rules is not None and meta.get("rules", rules) != rules:
+            if not keep_stale_rules:
+                logger.warning("MCQ corpus index %s was built with other override rules; ignoring it", path)
+                return None
+            logger.warning("MCQ corpus index %s was built with other override rules; serving it until it is "
+                           "rebuilt (python -m backend.corpus_index build)", path)
+            stale = "override rules changed"
+        index = cls(columns, meta)
+        index.stale = stale
+        logger.info("Loaded MCQ corpus index with %d sentences from %s", len(index), path)
+        return index
+
+    # --- Queries ---
+
+    def query(
+        self,
+        grade: Optional[str] = None,
+        bucket: Optional[str] = None,
+        min_questions: int = 1,
+        require_pos: Sequence[str] = (),
+        complexity: Optional[Tuple[float, float]] = None,
+        exclude: Sequence[int] = (),
+    ) -> numpy.ndarray:
+        """Row ids matching every given constraint."""
+        mask = self.questionable >= min_questions
+        if grade in GRADES:
+            mask &= self.grade == GRADES.index(grade)
+        if bucket in BUCKETS:
+            mask &= self.bucket == BUCKETS.index(bucket)
+        for key in require_pos:
+            col = self.pos_column.get(key)
+            if col is None:
+                return numpy.zeros(0, dtype=numpy.int64)
+            mask &= self.pos_counts[:, col] > 0
+        if complexity is not None:
+            lo, hi = complexity
+            mask &= (self.complexity >= lo) & (self.complexity <= hi)
+        if len(exclude):
+            mask[numpy.asarray(exclude, dtype=numpy.int64)] = False
+        return numpy.flatnonzero(mask)
+
+    def pick(self, k: int = 1, **constraints) -> List[int]:
+        """Up to k distinct random row ids satisfying the constraints."""
+        rows = self.query(**constraints)
+        if not len(rows):
+            return []
+        return [int(r) for r in random.sample(list(rows), min(k, len(rows)))]
+
+    def describe(self, row: int) -> Dict[str, object]:
+        return {
+            "grade": GRADES[int(self.grade[row])],
+            "bucket": BUCKETS[int(self.bucket[row])],
+            "tokens": int(self.n_tokens[row]),
+            "questionable": int(self.questionable[row]),
+            "depDepth": int(self.dep_depth[row]),
+            "rareRate": round(float(self.rare_rate[row]), 3),
+            "complexity": round(float(self.complexity[row]), 3),
+        }
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.corpus_index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="parse the MCQ pools and write the index")
+    build.add_argument("--model", default=os.path.join(REPO_DIR, "tl_tocylog_trf"))
+    build.add_argument("--out", default=DEFAULT_INDEX_PATH)
+    build.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args(argv[1:])
+
+    import spacy
+
+    configure_cli_logging()
+    nlp = spacy.load(args.model)
+    index = CorpusIndex.build(nlp, DEFAULT_SOURCES, batch_size=args.batch_size)
+    index.save(args.out)
+    logger.info("Wrote %d sentences to %s", len(index), args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,176 @@
+"""Token features read straight from a parsed Doc's attribute arrays.
+
+One Doc.to_array call gives the ORTH/LOWER/TAG/POS/DEP/HEAD/LEMMA/MORPH
+columns as hash ids (kept in `ids` for checks that compare ids directly). Ids are mapped to strings (and (TAG, POS) pairs to POS_OPTIONS keys)
+through tables filled once per distinct id, so repeated sentences cost a few
+dictionary lookups per token instead of resolve_pos and Token attribute
+access. Every endpoint that needs per-token data reads it from here.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+from spacy.attrs import DEP, HEAD, IS_PUNCT, LEMMA, LOWER, MORPH, ORTH, POS, TAG
+from spacy.parts_of_speech import NAMES as UPOS_NAMES
+
+from backend.pos import POS_OPTIONS
+
+COLUMNS = [ORTH, LOWER, TAG, POS, DEP, HEAD, LEMMA, MORPH, IS_PUNCT]
+
+# Ids are string hashes (stable across models and processes), so these tables
+# are shared by every pipeline. Only labels (tags, deps, morph analyses) are
+# memoized: words and lemmas come from user text, would grow the table without
+# bound, and are freed from the vocab when their memory zone closes.
+_strings: Dict[int, str] = {0: ""}
+_pos_keys: Dict[Tuple[int, int], str] = {}
+_morphs: Dict[int, Dict[str, str]] = {0: {}}
+_lock = threading.Lock()
+
+
+def pos_key(tag: str, upos: str) -> str:
+    """Same mapping as resolve_pos, on strings: a fine tag known to POS_OPTIONS
+    wins, then the coarse POS, then any tag."""
+    if tag in POS_OPTIONS:
+        return tag
+    if upos in POS_OPTIONS:
+        return upos
+    return tag or upos or "X"
+
+
+def _string(strings, key: int) -> str:
+    value = _strings.get(key)
+    if value is None:
+        value = strings[key]
+        with _lock:
+            _strings[key] = value
+    return value
+
+
+def _morph(strings, key: int) -> Dict[str, str]:
+    features = _morphs.get(key)
+    if features is None:
+        analysis = strings[key]
+        features = {}
+        if analysis and analysis != "_":
+            for feature in analysis.split("|"):
+                name, _, value = feature.partition("=")
+                features[name] = value
+        with _lock:
+            _morphs[key] = features
+    return features
+
+
+class DocFeatures:
+    """Per-token columns of a Doc: text, POS key, coarse POS, dep, absolute
+    head index, lemma, morph features and punctuation flag, plus the raw
+    COLUMNS hash ids."""
+
+    __slots__ = ("text", "pos", "upos", "dep", "head", "lemma", "morph", "is_punct", "ids")
+
+    def __init__(self, doc):
+        n = len(doc)
+        if not n:
+            self.text = self.pos = self.upos = self.dep = self.lemma = self.morph = []
+            self.head = numpy.zeros(0, dtype=numpy.int64)
+            self.is_punct = numpy.zeros(0, dtype=bool)
+            self.ids = numpy.zeros((0, len(COLUMNS)), dtype=numpy.uint64)
+            return
+        strings = doc.vocab.strings
+        columns = self.ids = doc.to_array(COLUMNS)
+        orth, _, tag, upos, dep, head, lemma, morph, punct = (columns[:, j].tolist() for j in range(len(COLUMNS)))
+
+        self.text = [strings[k] for k in orth]
+        self.upos = [UPOS_NAMES.get(p, "") for p in upos]
+        self.pos = []
+        for t, p, name in zip(tag, upos, self.upos):
+            key = _pos_keys.get((t, p))
+            if key is None:
+                key = pos_key(_string(strings, t), name)
+                with _lock:
+                    _pos_keys[(t, p)] = key
+            self.pos.append(key)
+        self.dep = [_string(strings, k) for k in dep]
+        # HEAD is stored as a relative offset in an unsigned column
+        self.head = columns[:, COLUMNS.index(HEAD)].astype(numpy.int64) + numpy.arange(n)
+        self.lemma = [strings[k] for k in lemma]
+        self.morph = [_morph(strings, k) for k in morph]
+        self.is_punct = numpy.array(punct, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def column(self, attr: int) -> numpy.ndarray:
+        """The hash ids of one COLUMNS attribute (POS: the UPOS enum)."""
+        return self.ids[:, COLUMNS.index(attr)]
+
+    def find(self, word: str) -> Optional[int]:
+        """Index of the first token whose text matches word (case-insensitive)."""
+        word = word.lower()
+        for i, text in enumerate(self.text):
+            if text.lower() == word:
+                return i
+        return None
+
+    def pos_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for key in self.pos:
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def has_dep(self, label: str) -> bool:
+        return label in self.dep
+
+    def token(self, i: int) -> Dict[str, object]:
+        """The per-token dict /api/analyze has always returned."""
+        pos = self.pos[i]
+        info: Dict[str, object] = {"text": self.text[i], "pos": pos, "description": POS_OPTIONS.get(pos, pos)}
+        if self.morph[i]:
+            info["morph"] = dict(self.morph[i])
+        if self.dep[i]:
+            info["dep"] = self.dep[i]
+            head_text = self.text[int(self.head[i])]
+            if head_text != self.text[i]:
+                info["head"] = head_text
+        if self.lemma[i]:
+            info["lemma"] = self.lemma[i]
+        return info
+
+    def tokens(self) -> List[Dict[str, object]]:
+        return [self.token(i) for i in range(len(self))]
+
+    def columnar(self) -> Dict[str, object]:
+        """Parallel per-token arrays; every string column is an index into one
+        shared "strings" table, and morph is an index into "morphs" (-1: none)."""
+        table: Dict[str, int] = {}
+
+        def intern(values: List[str]) -> List[int]:
+            return [table.setdefault(v, len(table)) for v in values]
+
+        morph_table: Dict[str, int] = {}
+        morph_index = []
+        morph_values = []
+        for features in self.morph:
+            if not features:
+                morph_index.append(-1)
+                continue
+            key = "|".join(f"{k}={v}" for k, v in features.items())
+            if key not in morph_table:
+                morph_table[key] = len(morph_values)
+                morph_values.append(features)
+            morph_index.append(morph_table[key])
+
+        columns = {
+            "text": intern(self.text),
+            "pos": intern(self.pos),
+            "lemma": intern(self.lemma),
+            "dep": intern(self.dep),
+            "head": self.head.tolist(),
+            "morph": morph_index,
+        }
+        return {
+            "strings": list(table),
+            "columns": columns,
+            "morphs": morph_values,
+            "descriptions": {key: POS_OPTIONS[key] for key in dict.fromkeys(self.pos) if key in POS_OPTIONS},
+        }
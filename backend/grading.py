@@ -0,0 +1,291 @@
+"""Sentence grading for the Make a Sentence game, online and in bulk.
+
+precheck() and grade_doc() are the checks behind /api/make-sentence/verify.
+The same logic grades teacher-submitted files offline: rows are streamed from
+CSV or JSONL, parsed with nlp.pipe across several processes, and results are
+appended to a JSONL file in input order, so an interrupted run resumes where
+it stopped and memory stays flat however long the file is: rows are graded
+in chunks, each inside nlp.memory_zone(), so the words of one chunk are
+freed from the vocab before the next one starts.
+
+    python -m backend.grading grade sentences.csv results.jsonl [--processes 8] [--batch-size 64] [--chunk-size 10000]
+
+Input rows need "word" and "sentence" columns/keys (see --word-field and
+--sentence-field); any "id" is copied to the output line.
+"""
+
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend.features import DocFeatures
+from backend.grammar import GrammarChecker, SentenceArrays
+from backend.logs import configure_cli_logging
+from backend.parse_cache import normalize_text
+from backend.text_limits import TextLimits, TextTooLong
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SENTENCE_END = ('.', '!', '?')
+
+
+def precheck(sentence: str) -> Optional[Dict[str, object]]:
+    """Hygiene checks that need no parse; returns a failed result or None."""
+    if not sentence:
+        return {"isCorrect": False, "feedback": "Pakisulat ang iyong pangungusap."}
+    if not sentence[0].isupper():
+        return {"isCorrect": False, "feedback": "Dapat magsimula sa malaking titik ang iyong pangungusap."}
+    if sentence[-1] not in SENTENCE_END:
+        return {"isCorrect": False, "feedback": "Dapat magtapos sa bantas (., ?, !) ang iyong pangungusap."}
+    return None
+
+
+def grade_doc(doc, target_word: str, grammar: GrammarChecker) -> Dict[str, object]:
+    """Grammar rules (backend/grammar_rules.json) over a parsed sentence.
+
+    Failing sentences get the highest-priority violation as feedback and the
+    full list under "violations"."""
+    target = target_word.strip()
+    features = DocFeatures(doc)
+    violations = grammar.check(SentenceArrays.from_features(features), target=target)
+    if violations:
+        return {
+            "isCorrect": False,
+            "feedback": violations[0].message,
+            "violations": [v.to_dict() for v in violations]
+        }
+
+    wanted = target.lower()
+    target_index = next((i for i, (text, lemma) in enumerate(zip(features.text, features.lemma))
+                         if text.lower() == wanted or lemma.lower() == wanted), None)
+    return {
+        "isCorrect": True,
+        "feedback": f"Mahusay! Tama ang pagkakabuo at paggamit mo ng salitang '{target_word}' sa pangungusap.",
+        "analysis": {
+            "hasSubject": features.has_dep('nsubj'),
+            "hasPredicate": features.dep.count('ROOT') == 1,
+            "pos_counts": features.pos_counts(),
+            "targetWordRole": features.dep[target_index] if target_index is not None else None
+        },
+        "violations": []
+    }
+
+
+# --- Bulk grading ---
+
+class _ByteCounter:
+    """Line iterator over a binary file that tracks how far it has read."""
+
+    def __init__(self, f):
+        self.f = f
+        self.read = 0
+
+    def __iter__(self) -> Iterator[str]:
+        for raw in self.f:
+            self.read += len(raw)
+            yield raw.decode("utf-8-sig" if self.read == len(raw) else "utf-8")
+
+
+def read_rows(lines: Iterator[str], fmt: str) -> Iterator[Dict[str, object]]:
+    """Rows as dicts; a malformed JSONL line becomes {"_error": ...} so row
+    numbers stay aligned with the input."""
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {"_error": f"invalid JSON: {e}"}
+        yield row if isinstance(row, dict) else {"_error": "row is not an object"}
+
+
+def completed_rows(path: str) -> int:
+    """Number of finished result lines; a torn last line is cut off."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        data_end = f.seek(0, os.SEEK_END)
+        # Walk back to the last newline
+        pos = data_end
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            cut = chunk.rfind(b"\n")
+            if cut != -1:
+                pos = pos - step + cut + 1
+                break
+            pos -= step
+        if pos != data_end:
+            f.truncate(pos)
+        f.seek(0)
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+
+
+class BulkGrader:
+    def __init__(self, nlp, grammar: GrammarChecker, word_field: str = "word",
+                 sentence_field: str = "sentence", limits: Optional[TextLimits] = None):
+        self.nlp = nlp
+        self.grammar = grammar
+        self.word_field = word_field
+        self.sentence_field = sentence_field
+        self.limits = limits or TextLimits.from_env()
+
+    def _prepare(self, number: int, row: Dict[str, object]) -> Tuple[str, Dict[str, object]]:
+        """(text to parse, output record); text is "" when no parse is needed
+        and the record already holds the result."""
+        record: Dict[str, object] = {"row": number}
+        if "id" in row:
+            record["id"] = row["id"]
+        if "_error" in row:
+            record["error"] = row["_error"]
+            return "", record
+        word = row.get(self.word_field)
+        sentence = row.get(self.sentence_field)
+        if not isinstance(word, str) or not isinstance(sentence, str) or not word.strip():
+            record["error"] = f"row needs '{self.word_field}' and '{self.sentence_field}'"
+            return "", record
+        record["word"] = word
+        record["sentence"] = sentence
+        sentence = sentence.strip()
+        try:
+            self.limits.check_sentence(sentence, self.nlp.tokenizer)
+        except TextTooLong as e:
+            record["error"] = str(e)
+            return "", record
+        failed = precheck(sentence)
+        if failed is not None:
+            record.update(failed)
+            return "", record
+        return normalize_text(sentence), record
+
+    def grade(self, rows: Iterator[Dict[str, object]], out, skip: int = 0, processes: int = 1,
+              batch_size: int = 64, progress=None, chunk_size: int = 10000) -> Counter:
+        """Grade rows in order, writing one JSON line each; the first `skip`
+        rows are assumed done. Returns outcome and rule counts."""
+        totals: Counter = Counter()
+        numbered = itertools.islice(enumerate(rows), skip, None)
+        while True:
+            chunk = list(itertools.islice(numbered, chunk_size))
+            if not chunk:
+                break
+            # Docs (from this process or deserialized from the workers) add
+            # their words to this vocab; the zone frees them after the chunk.
+            # Records are plain data and written before it closes.
+            with self._zone():
+                self._grade_chunk(chunk, out, processes, batch_size, progress, totals)
+        out.flush()
+        return totals
+
+    def _zone(self):
+        if hasattr(self.nlp, "memory_zone"):
+            return self.nlp.memory_zone()
+        return contextlib.nullcontext()
+
+    def _grade_chunk(self, chunk: List[Tuple[int, Dict[str, object]]], out, processes: int,
+                     batch_size: int, progress, totals: Counter) -> None:
+        inputs = [self._prepare(number, row) for number, row in chunk]
+        # Rows that need no parse go through as "" (tokenizes to nothing) so
+        # the pipe keeps input order
+        docs = self.nlp.pipe(inputs, as_tuples=True, batch_size=batch_size, n_process=processes)
+        for doc, record in docs:
+            if "word" in record and "isCorrect" not in record and "error" not in record:
+                try:
+                    record.update(grade_doc(doc, record["word"], self.grammar))
+                except Exception as e:
+                    record["error"] = str(e)
+            if "error" in record and "isCorrect" not in record:
+                totals["errors"] += 1
+            elif record.get("isCorrect"):
+                totals["correct"] += 1
+            else:
+                totals["incorrect"] += 1
+            for violation in record.get("violations", ()):
+                totals[f"rule:{violation['rule']}"] += 1
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            totals["rows"] += 1
+            if totals["rows"] % batch_size == 0:
+                out.flush()
+                if progress:
+                    progress(totals)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.grading")
+    sub = parser.add_subparsers(dest="command", required=True)
+    grade = sub.add_parser("grade", help="grade a CSV/JSONL file of (word, sentence) rows")
+    grade.add_argument("input")
+    grade.add_argument("output", help="JSONL results; an existing file is resumed")
+    grade.add_argument("--format", choices=("csv", "jsonl"), help="input format (default: by extension)")
+    grade.add_argument("--model", default=os.path.join(REPO_DIR, "tl_tocylog_trf"))
+    grade.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    grade.add_argument("--batch-size", type=int, default=64)
+    grade.add_argument("--chunk-size", type=int, default=10000, help="rows graded per memory zone")
+    grade.add_argument("--word-field", default="word")
+    grade.add_argument("--sentence-field", default="sentence")
+    grade.add_argument("--restart", action="store_true", help="ignore existing results and start over")
+    grade.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv[1:])
+
+    from backend.model import load_pipeline
+
+    configure_cli_logging()
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    skip = completed_rows(args.output)
+    if skip:
+        logger.info("Resuming after %d graded rows in %s", skip, args.output)
+
+    nlp = load_pipeline(args.model)
+    grader = BulkGrader(nlp, GrammarChecker.load(), args.word_field, args.sentence_field)
+    size = os.path.getsize(args.input)
+    started = time.monotonic()
+    last = [started]
+
+    with open(args.input, "rb") as f, open(args.output, "a", encoding="utf-8") as out:
+        source = _ByteCounter(f)
+
+        def progress(totals: Counter) -> None:
+            now = time.monotonic()
+            if now - last[0] < args.progress_every:
+                return
+            last[0] = now
+            rate = totals["rows"] / (now - started)
+            logger.info("%d rows graded (%.1f%% of input), %.1f rows/s", skip + totals["rows"],
+                        100.0 * source.read / size if size else 100.0, rate)
+
+        totals = grader.grade(read_rows(iter(source), fmt), out, skip=skip, processes=args.processes,
+                              batch_size=args.batch_size, progress=progress, chunk_size=args.chunk_size)
+
+    elapsed = time.monotonic() - started
+    summary = {
+        "output": args.output,
+        "rows": skip + totals["rows"],
+        "graded_now": totals["rows"],
+        "correct": totals["correct"],
+        "incorrect": totals["incorrect"],
+        "errors": totals["errors"],
+        "seconds": round(elapsed, 1),
+        "rows_per_second": round(totals["rows"] / elapsed, 1) if elapsed else None,
+        "rules": {k[5:]: v for k, v in totals.most_common() if k.startswith("rule:")},
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
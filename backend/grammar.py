@@ -0,0 +1,319 @@
+"""Declarative grammar rules for checking learner sentences.
+
+Rules are data (backend/grammar_rules.json) compiled once: every value a rule
+tests is resolved to its hash id (UPOS enum for pos), and the value lists of
+all rules are merged into one table per attribute. Checking a sentence is one
+searchsorted of its LOWER, POS and DEP id columns against those tables, which
+answers every value test of every rule at once; rules then only combine
+boolean columns. No token is walked in Python, all violations are reported,
+and rules can be exercised on hand-written lists without loading the model:
+
+    checker = GrammarChecker.load()
+    checker.check(SentenceArrays(words=["Ang", "mga", "ay", "."], pos=[...], ...), target="mga")
+
+Rule kinds:
+    count    number of tokens matching "match" must lie in [min, max]
+             (message fields: {count})
+    pattern  consecutive tokens matching each constraint in "pattern" are a
+             violation (message fields: {0}, {1}, ... the matched words)
+    target   the target word must be "present", or "attached" to the parse
+             (has a dependency label or dependents); fields: {target}
+
+Token constraints: lower, pos, dep (a value or a list), pos_not, dep_not,
+is_punct (bool) and position ("first", "last", "last_word").
+"""
+
+import json
+import os
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy
+from spacy.attrs import DEP, LOWER, POS
+from spacy.parts_of_speech import IDS as UPOS_IDS
+from spacy.strings import get_string_id
+
+from backend.features import DocFeatures
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grammar_rules.json")
+
+# Attributes a constraint can test by value, each matched against one table
+_VALUE_ATTRS = ("lower", "pos", "dep")
+
+# mask(sentence, matches): matches[attr] is the sentence's (tokens x value sets) table
+_Mask = Callable[["SentenceArrays", Dict[str, numpy.ndarray]], numpy.ndarray]
+
+
+def _string_id(value: str) -> int:
+    # The id a StringStore gives value: a symbol id for spaCy's built-in
+    # labels ("det", "nsubj"), else its hash; "" (no label) is 0
+    return get_string_id(value)
+
+
+def _pos_id(name: str) -> int:
+    if not name:
+        return 0
+    if name not in UPOS_IDS:
+        raise ValueError(f"Unknown POS '{name}'")
+    return UPOS_IDS[name]
+
+
+def _ids(values) -> numpy.ndarray:
+    return numpy.array(list(values), dtype=numpy.uint64)
+
+
+class SentenceArrays:
+    """Per-token id columns of one sentence; built from a Doc or from plain lists.
+
+    lower and dep are string hash ids, pos the UPOS enum, lemma the hash of
+    the lowercased lemma (only used to find the target word)."""
+
+    def __init__(
+        self,
+        words: Sequence[str],
+        pos: Optional[Sequence[str]] = None,
+        deps: Optional[Sequence[str]] = None,
+        heads: Optional[Sequence[int]] = None,
+        lemmas: Optional[Sequence[str]] = None,
+        is_punct: Optional[Sequence[bool]] = None,
+    ):
+        n = len(words)
+        if is_punct is None:
+            is_punct = [bool(w) and not any(c.isalnum() for c in w) for w in words]
+        self._set(
+            words,
+            lower=_ids(_string_id(w.lower()) for w in words),
+            pos=_ids(_pos_id(p) for p in (pos if pos is not None else [""] * n)),
+            dep=_ids(_string_id(d) for d in (deps if deps is not None else [""] * n)),
+            heads=heads if heads is not None else range(n),
+            lemmas=lemmas,
+            is_punct=is_punct,
+        )
+
+    def _set(self, words, lower, pos, dep, heads, lemmas, is_punct) -> None:
+        n = len(words)
+        self.words = list(words)
+        self.lower = lower
+        self.pos = pos
+        self.dep = dep
+        self.lemma = _ids(_string_id((l or "").lower()) for l in (lemmas or [""] * n))
+        self.head = numpy.array(list(heads), dtype=numpy.int64)
+        self.is_punct = numpy.array(list(is_punct), dtype=bool)
+        self.index = numpy.arange(n)
+
+    @classmethod
+    def from_features(cls, features: DocFeatures) -> "SentenceArrays":
+        # The id columns come straight from the Doc; no string is hashed again
+        sentence = cls.__new__(cls)
+        sentence._set(
+            features.text,
+            lower=features.column(LOWER),
+            pos=features.column(POS),
+            dep=features.column(DEP),
+            heads=features.head,
+            lemmas=features.lemma,
+            is_punct=features.is_punct,
+        )
+        return sentence
+
+    @classmethod
+    def from_doc(cls, doc) -> "SentenceArrays":
+        return cls.from_features(DocFeatures(doc))
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def has_dependents(self) -> numpy.ndarray:
+        attached = self.head[self.head != self.index]
+        return numpy.bincount(attached, minlength=len(self)) > 0
+
+
+class _ValueSets:
+    """The value lists rules test one attribute against, as the columns of a
+    (distinct id x list) table; one searchsorted matches a whole sentence
+    column against every list."""
+
+    def __init__(self):
+        self._sets: List[frozenset] = []
+        self.keys = numpy.zeros(0, dtype=numpy.uint64)
+        self.table = numpy.zeros((0, 0), dtype=bool)
+
+    def add(self, ids: List[int]) -> int:
+        """Column of the list ids (shared with any identical list)."""
+        wanted = frozenset(ids)
+        if wanted not in self._sets:
+            self._sets.append(wanted)
+        return self._sets.index(wanted)
+
+    def freeze(self) -> None:
+        keys = sorted(set().union(*self._sets)) if self._sets else []
+        self.keys = _ids(keys)
+        self.table = numpy.array([[key in wanted for wanted in self._sets] for key in keys],
+                                 dtype=bool).reshape((len(keys), len(self._sets)))
+
+    def match(self, column: numpy.ndarray) -> numpy.ndarray:
+        out = numpy.zeros((len(column), len(self._sets)), dtype=bool)
+        if not len(self.keys) or not len(column):
+            return out
+        idx = numpy.searchsorted(self.keys, column)
+        idx[idx == len(self.keys)] = 0
+        hit = self.keys[idx] == column
+        out[hit] = self.table[idx[hit]]
+        return out
+
+
+def _values(value) -> List[str]:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _value_ids(attr: str, value) -> List[int]:
+    if attr == "pos":
+        return [_pos_id(v) for v in _values(value)]
+    if attr == "lower":
+        return [_string_id(v.lower()) for v in _values(value)]
+    return [_string_id(v) for v in _values(value)]
+
+
+def _position_mask(positions: List[str]) -> _Mask:
+    for position in positions:
+        if position not in ("first", "last", "last_word"):
+            raise ValueError(f"Unknown position '{position}'")
+
+    def mask(s: SentenceArrays, matches: Dict[str, numpy.ndarray]) -> numpy.ndarray:
+        out = numpy.zeros(len(s), dtype=bool)
+        if not len(s):
+            return out
+        words = numpy.flatnonzero(~s.is_punct)
+        for position in positions:
+            if position == "first":
+                out[0] = True
+            elif position == "last":
+                out[-1] = True
+            elif len(words):
+                out[words[-1]:] = True
+        return out
+    return mask
+
+
+def compile_constraint(constraint: Dict[str, object], value_sets: Dict[str, _ValueSets]) -> _Mask:
+    """Turn one token constraint into a function returning a boolean mask.
+
+    Value tests are registered in value_sets (one per attribute); the mask
+    reads their column from the sentence's match tables."""
+    parts: List[_Mask] = []
+    for key, value in constraint.items():
+        if key in _VALUE_ATTRS:
+            column = value_sets[key].add(_value_ids(key, value))
+            parts.append(lambda s, m, key=key, column=column: m[key][:, column])
+        elif key in ("pos_not", "dep_not"):
+            attr = key[:-4]
+            column = value_sets[attr].add(_value_ids(attr, value))
+            parts.append(lambda s, m, attr=attr, column=column: ~m[attr][:, column])
+        elif key == "is_punct":
+            parts.append(lambda s, m, value=bool(value): s.is_punct == value)
+        elif key == "position":
+            parts.append(_position_mask(_values(value)))
+        else:
+            raise ValueError(f"Unknown token constraint '{key}'")
+
+    def mask(s: SentenceArrays, matches: Dict[str, numpy.ndarray]) -> numpy.ndarray:
+        out = numpy.ones(len(s), dtype=bool)
+        for part in parts:
+            out &= part(s, matches)
+        return out
+    return mask
+
+
+class Violation:
+    __slots__ = ("rule", "message", "tokens")
+
+    def __init__(self, rule: str, message: str, tokens: List[int]):
+        self.rule = rule
+        self.message = message
+        self.tokens = tokens
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"rule": self.rule, "message": self.message, "tokens": self.tokens}
+
+
+class _Rule:
+    def __init__(self, spec: Dict[str, object], value_sets: Dict[str, _ValueSets]):
+        self.id = spec["id"]
+        self.kind = spec["kind"]
+        self.message = spec["message"]
+        if self.kind == "count":
+            self.match = compile_constraint(spec.get("match", {}), value_sets)
+            self.min = spec.get("min")
+            self.max = spec.get("max")
+        elif self.kind == "pattern":
+            self.steps = [compile_constraint(c, value_sets) for c in spec["pattern"]]
+            if not self.steps:
+                raise ValueError(f"Rule {self.id}: empty pattern")
+        elif self.kind == "target":
+            self.require = spec["require"]
+            if self.require not in ("present", "attached"):
+                raise ValueError(f"Rule {self.id}: unknown requirement '{self.require}'")
+        else:
+            raise ValueError(f"Rule {self.id}: unknown kind '{self.kind}'")
+
+    def check(self, s: SentenceArrays, matches: Dict[str, numpy.ndarray], target: Optional[str],
+              target_mask: numpy.ndarray) -> List[Violation]:
+        if self.kind == "count":
+            matched = numpy.flatnonzero(self.match(s, matches))
+            count = len(matched)
+            if (self.min is not None and count < self.min) or (self.max is not None and count > self.max):
+                return [Violation(self.id, self.message.format(count=count, target=target), matched.tolist())]
+            return []
+
+        if self.kind == "pattern":
+            width = len(self.steps)
+            starts = len(s) - width + 1
+            if starts <= 0:
+                return []
+            hits = numpy.ones(starts, dtype=bool)
+            for offset, step in enumerate(self.steps):
+                hits &= step(s, matches)[offset:offset + starts]
+            violations = []
+            for start in numpy.flatnonzero(hits).tolist():
+                words = s.words[start:start + width]
+                violations.append(Violation(self.id, self.message.format(*words, target=target),
+                                            list(range(start, start + width))))
+            return violations
+
+        # target rules only apply when a target word was given
+        if target is None:
+            return []
+        found = numpy.flatnonzero(target_mask)
+        if self.require == "present":
+            ok = len(found) > 0
+        else:
+            # Judged on the first occurrence; absence is the "present" rule's job
+            first = found[:1]
+            ok = not len(first) or bool((s.dep[first] != 0)[0] or s.has_dependents()[first][0])
+        return [] if ok else [Violation(self.id, self.message.format(target=target), found[:1].tolist())]
+
+
+class GrammarChecker:
+    def __init__(self, rules: List[Dict[str, object]]):
+        self.value_sets = {attr: _ValueSets() for attr in _VALUE_ATTRS}
+        self.rules = [_Rule(spec, self.value_sets) for spec in rules]
+        for value_sets in self.value_sets.values():
+            value_sets.freeze()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_RULES_PATH) -> "GrammarChecker":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["rules"] if isinstance(data, dict) else data)
+
+    def check(self, sentence: SentenceArrays, target: Optional[str] = None) -> List[Violation]:
+        """Every violation, in rule order (the first is the most important)."""
+        # Every value test of every rule, answered in one pass per attribute
+        matches = {attr: value_sets.match(getattr(sentence, attr)) for attr, value_sets in self.value_sets.items()}
+        target_mask = numpy.zeros(len(sentence), dtype=bool)
+        if target is not None:
+            wanted = _string_id(target.strip().lower())
+            target_mask = (sentence.lower == wanted) | (sentence.lemma == wanted)
+        violations: List[Violation] = []
+        for rule in self.rules:
+            violations.extend(rule.check(sentence, matches, target, target_mask))
+        return violations
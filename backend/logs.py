@@ -0,0 +1,220 @@
+"""Queue-based, structured logging for the API server.
+
+Request threads only build a LogRecord and drop it on a bounded queue; a
+background QueueListener formats it (one JSON object per line by default)
+and writes it to stdout. Per-token debug output goes through sampled
+loggers so it costs nothing on requests that are not sampled.
+
+    NLP_LOG_LEVEL               root level (default INFO)
+    NLP_LOG_FORMAT              "json" (default) or "text"
+    NLP_LOG_SAMPLE_RATE         fraction of sampled-logger records kept (default 0.01)
+    NLP_LOG_QUEUE_SIZE          records buffered before new ones are dropped (default 10000)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from backend.tracing import Span, tracer
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; extra={...} fields become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, object] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """TEXT_FORMAT lines with extra={...} fields appended as key=value pairs."""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(f"{key}={value}" for key, value in record.__dict__.items()
+                          if key not in _RECORD_ATTRS and not key.startswith("_"))
+        if not fields:
+            return line
+        # Keep any traceback below the fields
+        head, sep, rest = line.partition("\n")
+        return f"{head} [{fields}]{sep}{rest}"
+
+
+class SampleFilter(logging.Filter):
+    """Keep roughly `rate` of the records passing through."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+class _RequestContext(logging.Filter):
+    """Stamp records with the active trace id so log lines join up with spans."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = tracer.current_span()
+        if isinstance(span, Span):
+            record.trace_id = span.trace.trace_id
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks or raises on a full queue, and leaves
+    formatting to the listener thread.
+
+    The listener is (re)started lazily per process, so forked gunicorn
+    workers get their own writer thread."""
+
+    def __init__(self, log_queue: "queue.Queue", target: logging.Handler):
+        super().__init__(log_queue)
+        self.target = target
+        self.dropped = 0
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._listener_pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve %-args now (they may reference objects the request mutates or
+        # frees) but leave the JSON/text formatting to the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self._listener_pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._listener_pid == os.getpid():
+                return
+            if self._listener_pid is not None:
+                # Forked child: the parent's queue lock may have been held mid-fork
+                self.queue = queue.Queue(self.queue.maxsize)
+            self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+
+    def stop(self) -> None:
+        """Flush what is queued and stop the listener (called at exit)."""
+        with self._start_lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._listener_pid = None
+
+
+_handler: Optional[AsyncQueueHandler] = None
+_sample_rate = 0.01
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> AsyncQueueHandler:
+    """Route the root logger through one queue and a stdout listener thread."""
+    global _handler, _sample_rate
+    if _handler is not None:
+        return _handler
+    level = (level or os.environ.get("NLP_LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.environ.get("NLP_LOG_FORMAT", "json")
+    _sample_rate = float(os.environ.get("NLP_LOG_SAMPLE_RATE", "0.01"))
+
+    stream = logging.StreamHandler(sys.stdout)
+    if fmt == "text":
+        formatter = TextFormatter()
+    else:
+        formatter = JsonFormatter()
+    formatter.converter = time.gmtime
+    stream.setFormatter(formatter)
+
+    handler = AsyncQueueHandler(queue.Queue(int(os.environ.get("NLP_LOG_QUEUE_SIZE", "10000"))), stream)
+    handler.addFilter(_RequestContext())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    handler.start()
+    atexit.register(handler.stop)
+    _handler = handler
+    return handler
+
+
+def configure_cli_logging(level: int = logging.INFO) -> None:
+    """Plain synchronous text logging to stderr for the python -m commands."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(TextFormatter())
+    logging.basicConfig(level=level, handlers=[handler])
+
+
+def sampled_logger(name: str, rate: Optional[float] = None) -> logging.Logger:
+    """A DEBUG-level logger whose records are kept at NLP_LOG_SAMPLE_RATE.
+
+    Pass values as %-args (or lazy objects with __str__) rather than
+    f-strings, so unsampled calls never build the message."""
+    log = logging.getLogger(name)
+    log.setLevel(logging.DEBUG)
+    if not any(isinstance(f, SampleFilter) for f in log.filters):
+        log.addFilter(SampleFilter(_sample_rate if rate is None else rate))
+    return log
+
+
+class lazy:
+    """Defer an expensive log argument until the record is actually emitted."""
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn: Callable[[], object]):
+        self.fn = fn
+
+    def __str__(self) -> str:
+        return str(self.fn())
+
+
+def stats() -> Dict[str, object]:
+    if _handler is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "sample_rate": _sample_rate,
+    }
@@ -0,0 +1,301 @@
+"""Process memory tools.
+
+- smaps_rollup / memory_report: shared vs private memory per worker, used to
+  confirm that preloaded gunicorn workers share the model pages:
+
+      python -m backend.memory <gunicorn-master-pid>
+
+- AllocationSampler: tracemalloc peaks and top allocation sites plus
+  per-thread CPU time for a sampled fraction of requests.
+- MemoryWatchdog: tracks RSS growth and asks the worker to restart
+  gracefully once a limit is exceeded.
+"""
+
+import collections
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_KB_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def smaps_rollup(pid: int) -> Optional[Dict[str, float]]:
+    """Return memory totals for pid in MB, or None when /proc is unavailable."""
+    values: Dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in _KB_FIELDS:
+                    values[key] = int(rest.split()[0]) / 1024.0
+    except (OSError, ValueError, IndexError):
+        return None
+    return {
+        "rss_mb": round(values.get("Rss", 0.0), 2),
+        "pss_mb": round(values.get("Pss", 0.0), 2),
+        "shared_mb": round(values.get("Shared_Clean", 0.0) + values.get("Shared_Dirty", 0.0), 2),
+        "private_mb": round(values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0), 2),
+        "swap_mb": round(values.get("Swap", 0.0), 2),
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of pid (gunicorn workers when pid is the master)."""
+    children: List[int] = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # Field 4 is the ppid; the command name (field 2) may contain spaces
+                fields = f.read().rsplit(")", 1)[1].split()
+            if int(fields[1]) == pid:
+                children.append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    return sorted(children)
+
+
+def memory_report(master_pid: int) -> Dict[str, object]:
+    """Per-worker shared/private memory plus totals for a gunicorn master."""
+    workers = []
+    for pid in child_pids(master_pid):
+        usage = smaps_rollup(pid)
+        if usage is not None:
+            workers.append({"pid": pid, **usage})
+    total_rss = sum(w["rss_mb"] for w in workers)
+    total_pss = sum(w["pss_mb"] for w in workers)
+    return {
+        "master": {"pid": master_pid, **(smaps_rollup(master_pid) or {})},
+        "workers": workers,
+        # Sum of RSS double counts shared pages; PSS splits them fairly
+        "total_rss_mb": round(total_rss, 2),
+        "total_pss_mb": round(total_pss, 2),
+        "total_private_mb": round(sum(w["private_mb"] for w in workers), 2),
+    }
+
+
+def current_rss_mb() -> Optional[float]:
+    """Current (not peak) resident set size of this process."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil  # type: ignore
+        return psutil.Process(os.getpid()).memory_info().rss / (1024.0 * 1024.0)
+    except Exception:
+        return None
+
+
+class AllocationSampler:
+    """Trace allocations for a sampled fraction of requests.
+
+    tracemalloc is process-wide, so only one request is traced at a time and
+    allocations made by other threads during that window are included; the
+    top sites make that visible. Tracing is switched off between samples so
+    unsampled requests pay nothing.
+    """
+
+    def __init__(self, rate: float = 0.0, top: int = 10, nframes: int = 5, history: int = 100):
+        self.rate = rate
+        self.top = top
+        self.nframes = nframes
+        self.samples: Deque[Dict[str, object]] = collections.deque(maxlen=history)
+        self._active = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AllocationSampler":
+        return cls(
+            rate=float(os.environ.get("NLP_ALLOC_SAMPLE_RATE", "0")),
+            top=int(os.environ.get("NLP_ALLOC_TOP", "10")),
+            nframes=int(os.environ.get("NLP_ALLOC_FRAMES", "5")),
+        )
+
+    def begin(self) -> Optional[Dict[str, object]]:
+        """Start sampling the current request; returns a token for end() or None."""
+        if self.rate <= 0 or random.random() >= self.rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(self.nframes)
+        tracemalloc.reset_peak()
+        return {
+            "started_here": started_here,
+            "baseline": tracemalloc.take_snapshot(),
+            "current": tracemalloc.get_traced_memory()[0],
+            "cpu": time.thread_time(),
+            "wall": time.perf_counter(),
+        }
+
+    def end(self, token: Optional[Dict[str, object]], label: str) -> None:
+        if token is None:
+            return
+        try:
+            cpu_ms = (time.thread_time() - token["cpu"]) * 1000.0
+            wall_ms = (time.perf_counter() - token["wall"]) * 1000.0
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            sites = snapshot.compare_to(token["baseline"], "lineno")[:self.top]
+            self.samples.append({
+                "endpoint": label,
+                "timestamp": int(time.time()),
+                "thread": threading.current_thread().name,
+                "wall_ms": round(wall_ms, 2),
+                "cpu_ms": round(cpu_ms, 2),
+                "peak_kb": round((peak - token["current"]) / 1024.0, 1),
+                "net_kb": round((current - token["current"]) / 1024.0, 1),
+                "top_sites": [
+                    {
+                        "site": str(stat.traceback[0]) if stat.traceback else "?",
+                        "size_diff_kb": round(stat.size_diff / 1024.0, 1),
+                        "count_diff": stat.count_diff,
+                    }
+                    for stat in sites
+                ],
+            })
+        except Exception as e:
+            logger.warning("Allocation sample failed: %s", e)
+        finally:
+            if token["started_here"]:
+                tracemalloc.stop()
+            self._active.release()
+
+    def report(self) -> Dict[str, object]:
+        return {"rate": self.rate, "samples": list(self.samples)}
+
+
+class MemoryWatchdog:
+    """Background RSS monitor that recycles a worker before the OOM killer does.
+
+    The baseline is taken after a warm-up period. When RSS grows more than
+    max_growth_mb above it, or exceeds max_rss_mb, on_limit runs once. By
+    default it sends SIGTERM to this process, which gunicorn treats as a
+    graceful shutdown: the worker stops accepting, drains in-flight requests
+    (graceful_timeout) and the master starts a fresh one.
+    """
+
+    def __init__(
+        self,
+        max_growth_mb: float = 0.0,
+        max_rss_mb: float = 0.0,
+        interval: float = 30.0,
+        warmup: float = 120.0,
+        history: int = 240,
+    ):
+        self.max_growth_mb = max_growth_mb
+        self.max_rss_mb = max_rss_mb
+        self.interval = interval
+        self.warmup = warmup
+        self.history: Deque[Tuple[int, float]] = collections.deque(maxlen=history)
+        self.baseline_mb: Optional[float] = None
+        self.triggered = False
+        self.restart = False
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.on_limit: Callable[[str], None] = self._request_restart
+
+    @classmethod
+    def from_env(cls) -> "MemoryWatchdog":
+        return cls(
+            max_growth_mb=float(os.environ.get("NLP_MAX_RSS_GROWTH_MB", "0")),
+            max_rss_mb=float(os.environ.get("NLP_MAX_RSS_MB", "0")),
+            interval=float(os.environ.get("NLP_WATCHDOG_INTERVAL", "30")),
+            warmup=float(os.environ.get("NLP_WATCHDOG_WARMUP", "120")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_growth_mb > 0 or self.max_rss_mb > 0
+
+    def start(self, restart: bool = False) -> None:
+        """Start monitoring; restart=True only under a supervisor (gunicorn)."""
+        self.restart = restart
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        started = time.monotonic()
+        while not self._stop.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is None:
+                continue
+            self.history.append((int(time.time()), round(rss, 1)))
+            if self.baseline_mb is None:
+                if time.monotonic() - started >= self.warmup:
+                    self.baseline_mb = rss
+                continue
+            self.check(rss)
+
+    def check(self, rss: float) -> None:
+        if self.triggered:
+            return
+        reason = None
+        if self.max_rss_mb > 0 and rss > self.max_rss_mb:
+            reason = f"RSS {rss:.0f}MB above limit {self.max_rss_mb:.0f}MB"
+        elif (self.max_growth_mb > 0 and self.baseline_mb is not None
+              and rss - self.baseline_mb > self.max_growth_mb):
+            reason = (f"RSS grew {rss - self.baseline_mb:.0f}MB since warm-up "
+                      f"(limit {self.max_growth_mb:.0f}MB)")
+        if reason:
+            self.triggered = True
+            self.on_limit(reason)
+
+    def _request_restart(self, reason: str) -> None:
+        if not self.restart:
+            logger.warning("Memory watchdog: %s (restart disabled outside gunicorn)", reason)
+            return
+        logger.warning("Memory watchdog: %s; requesting graceful worker restart", reason)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "restart": self.restart,
+            "max_growth_mb": self.max_growth_mb,
+            "max_rss_mb": self.max_rss_mb,
+            "baseline_mb": round(self.baseline_mb, 1) if self.baseline_mb is not None else None,
+            "current_mb": round(current_rss_mb() or 0.0, 1),
+            "triggered": self.triggered,
+            "history": list(self.history),
+        }
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) != 2 or not argv[1].isdigit():
+        print("usage: python -m backend.memory <gunicorn-master-pid>", file=sys.stderr)
+        return 2
+    report = memory_report(int(argv[1]))
+    master = report["master"]
+    print(f"master {master['pid']}: rss={master.get('rss_mb')}MB pss={master.get('pss_mb')}MB")
+    print(f"{'pid':>8} {'rss_mb':>10} {'pss_mb':>10} {'shared_mb':>10} {'private_mb':>10}")
+    for w in report["workers"]:
+        print(f"{w['pid']:>8} {w['rss_mb']:>10} {w['pss_mb']:>10} {w['shared_mb']:>10} {w['private_mb']:>10}")
+    print(f"workers={len(report['workers'])} total_rss={report['total_rss_mb']}MB "
+          f"total_pss={report['total_pss_mb']}MB total_private={report['total_private_mb']}MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
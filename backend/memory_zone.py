@@ -0,0 +1,268 @@
+"""Keep vocab and StringStore growth from user text bounded.
+
+Every new word a pipeline sees gets a Lexeme and StringStore entries, and
+outside a memory zone they stay for the life of the process, so a server fed
+arbitrary sentences grows without limit. Inside Language.memory_zone() they
+are transient and freed when the zone closes.
+
+A zone is per vocab, not per thread: the StringStore has one transient map and
+closing the zone empties all of it, including strings another thread's request
+is still using. So requests share one zone per pipeline. The first request in
+opens it, the last one out closes it, and after NLP_MEMORY_ZONE_MAX_DOCS parses
+or NLP_MEMORY_ZONE_MAX_SECONDS new requests wait (at most
+NLP_MEMORY_ZONE_DRAIN_TIMEOUT) for the ones inside to finish so it can close
+even under constant load. A pipeline added by a promotion or a new cascade
+starts a drain the same way; if that times out, the new pipeline joins the
+open zone instead. Anything a request keeps after it ends must be copied to
+plain Python data first; Docs, Tokens and Spans are invalid once their zone
+closes.
+
+    NLP_MEMORY_ZONE                 "0" turns zones off (default on)
+    NLP_MEMORY_ZONE_MAX_DOCS        parses before a zone is drained (default 5000)
+    NLP_MEMORY_ZONE_MAX_SECONDS     seconds before a zone is drained (default 60)
+    NLP_MEMORY_ZONE_DRAIN_TIMEOUT   longest a request waits for a drain (default 2)
+
+Check that RSS stays flat under random text:
+
+    python -m backend.memory_zone soak [--sentences 1000000] [--model ./tl_tocylog_trf]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class ZoneGate:
+    """One shared memory zone per pipeline, refcounted by the requests inside it."""
+
+    def __init__(self, pipelines: Callable[[], List[object]], max_docs: int = 5000,
+                 max_seconds: float = 60.0, drain_timeout: float = 2.0, enabled: bool = True):
+        self.pipelines = pipelines
+        self.max_docs = max_docs
+        self.max_seconds = max_seconds
+        self.drain_timeout = drain_timeout
+        self.enabled = enabled
+        self._cond = threading.Condition()
+        self._stack: Optional[ExitStack] = None
+        self._zoned: Set[int] = set()
+        self._inside = 0
+        self._docs = 0
+        self._opened_at = 0.0
+        self._draining = False
+        self.counts = {"opened": 0, "closed": 0, "drains": 0, "drain_timeouts": 0}
+
+    @classmethod
+    def from_env(cls, pipelines: Callable[[], List[object]]) -> "ZoneGate":
+        return cls(
+            pipelines,
+            max_docs=int(os.environ.get("NLP_MEMORY_ZONE_MAX_DOCS", "5000")),
+            max_seconds=float(os.environ.get("NLP_MEMORY_ZONE_MAX_SECONDS", "60")),
+            drain_timeout=float(os.environ.get("NLP_MEMORY_ZONE_DRAIN_TIMEOUT", "2")),
+            enabled=os.environ.get("NLP_MEMORY_ZONE", "1").lower() not in ("0", "false", "off"),
+        )
+
+    def enter(self) -> bool:
+        """Join the current zone, opening one if none is open. Returns False
+        when zones are off (the caller then has nothing to leave)."""
+        if not self.enabled:
+            return False
+        with self._cond:
+            if self._inside and not self._draining and not self._pipeline_ids() <= self._zoned:
+                # A model was promoted or a cascade added since the zone opened
+                self._draining = True
+            if self._draining and self._inside:
+                self.counts["drains"] += 1
+                deadline = time.monotonic() + self.drain_timeout
+                while self._draining and self._inside:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # A long stream holds the zone; keep it open for another round
+                        self.counts["drain_timeouts"] += 1
+                        self._draining = False
+                        self._docs = 0
+                        self._opened_at = time.monotonic()
+                        # Pipelines added since it opened join it now, so
+                        # later requests neither drain again nor parse unzoned
+                        self._enter_new()
+                        break
+                    self._cond.wait(remaining)
+            if not self._inside:
+                self._open()
+            self._inside += 1
+        return True
+
+    def leave(self) -> None:
+        with self._cond:
+            self._inside -= 1
+            if not self._inside:
+                self._close()
+                self._cond.notify_all()
+
+    @contextmanager
+    def zone(self) -> Iterator[None]:
+        joined = self.enter()
+        try:
+            yield
+        finally:
+            if joined:
+                self.leave()
+
+    def count(self, docs: int = 1) -> None:
+        """Record parses made in the zone; past the limits it starts draining."""
+        if not self.enabled:
+            return
+        with self._cond:
+            self._docs += docs
+            if self._inside and (self._docs >= self.max_docs
+                                 or time.monotonic() - self._opened_at >= self.max_seconds):
+                self._draining = True
+
+    def _pipeline_ids(self) -> Set[int]:
+        return {id(nlp) for nlp in self.pipelines() if hasattr(nlp, "memory_zone")}
+
+    def _enter_zones(self, stack: ExitStack, seen: Set[int]) -> bool:
+        """Enter a zone on every pipeline not in seen; False (and zones off) on failure."""
+        try:
+            for nlp in self.pipelines():
+                # Zones must not nest, so a pipeline listed twice is entered once
+                if id(nlp) in seen or not hasattr(nlp, "memory_zone"):
+                    continue
+                seen.add(id(nlp))
+                stack.enter_context(nlp.memory_zone())
+        except Exception as e:
+            self.enabled = False
+            logger.error(f"Memory zones disabled; cannot open one: {e}")
+            return False
+        return True
+
+    def _enter_new(self) -> None:
+        if self._stack is not None:
+            self._enter_zones(self._stack, self._zoned)
+
+    def _open(self) -> None:
+        stack = ExitStack()
+        seen: Set[int] = set()
+        if not self._enter_zones(stack, seen):
+            stack.close()
+            return
+        self._stack = stack
+        self._zoned = seen
+        self._docs = 0
+        self._opened_at = time.monotonic()
+        self._draining = False
+        self.counts["opened"] += 1
+
+    def _close(self) -> None:
+        stack, self._stack = self._stack, None
+        self._draining = False
+        if stack is None:
+            return
+        try:
+            stack.close()
+        except Exception as e:
+            logger.error(f"Closing memory zone failed: {e}", exc_info=True)
+        self.counts["closed"] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "inside": self._inside,
+                "docs_in_zone": self._docs,
+                "max_docs": self.max_docs,
+                "max_seconds": self.max_seconds,
+                **self.counts,
+            }
+
+
+# --- Soak test ---
+
+_SYLLABLES = ["ba", "ka", "da", "ga", "ha", "la", "ma", "na", "nga", "pa", "ra", "sa", "ta", "wa", "ya",
+              "bi", "ki", "di", "li", "mi", "ni", "pi", "si", "ti", "bu", "ku", "lu", "mu", "nu", "pu", "tu"]
+_FUNCTION_WORDS = ["ang", "ng", "sa", "ay", "si", "mga", "na", "at"]
+
+
+def random_sentence(rng: random.Random) -> str:
+    """A Tagalog-looking sentence of made-up words, so nearly every token is new."""
+    words = []
+    for _ in range(rng.randint(4, 12)):
+        if rng.random() < 0.3:
+            words.append(rng.choice(_FUNCTION_WORDS))
+        else:
+            words.append("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return words[0].capitalize() + " " + " ".join(words[1:]) + rng.choice([".", "!", "?"])
+
+
+def soak(registry, sentences: int, per_request: int = 1, sample_every: int = 50000,
+         seed: int = 0) -> Dict[str, object]:
+    """Parse random sentences the way requests do (through the registry, in a
+    zone per request, results copied out) and sample RSS and vocab size."""
+    from backend.features import DocFeatures
+    from backend.memory import smaps_rollup
+
+    nlp, gate = registry.active, registry.zones
+    rng = random.Random(seed)
+    samples = []
+    started = time.monotonic()
+    done = 0
+    while done < sentences:
+        batch = [random_sentence(rng) for _ in range(min(per_request, sentences - done))]
+        with gate.zone() if gate is not None else ExitStack():
+            for text in batch:
+                DocFeatures(registry.parse(text)).tokens()
+        before = done
+        done += len(batch)
+        if done // sample_every != before // sample_every or done == sentences:
+            usage = smaps_rollup(os.getpid()) or {}
+            samples.append({"sentences": done, "rss_mb": usage.get("rss_mb"),
+                            "strings": len(nlp.vocab.strings), "lexemes": sum(1 for _ in nlp.vocab),
+                            "seconds": round(time.monotonic() - started, 1)})
+            logger.info("Soak progress", extra=samples[-1])
+    return {"sentences": done, "zones": gate is not None, "samples": samples,
+            "gate": gate.stats() if gate is not None else None}
+
+
+def main(argv: List[str]) -> int:
+    from backend.logs import configure_cli_logging
+    from backend.model import DEFAULT_MODEL_PATH, ModelRegistry
+
+    parser = argparse.ArgumentParser(prog="python -m backend.memory_zone")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("soak", help="parse random sentences and check that RSS stays flat")
+    run.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    run.add_argument("--sentences", type=int, default=1_000_000)
+    run.add_argument("--per-request", type=int, default=1, help="sentences parsed per zone entry")
+    run.add_argument("--sample-every", type=int, default=50000)
+    run.add_argument("--warmup", type=float, default=0.1, help="share of the run before the baseline sample")
+    run.add_argument("--max-growth-mb", type=float, default=20.0, help="RSS growth after warmup that fails the run")
+    run.add_argument("--no-zone", action="store_true", help="parse outside memory zones, for comparison")
+    args = parser.parse_args(argv[1:])
+
+    configure_cli_logging()
+    registry = ModelRegistry()
+    if registry.load(args.model) is None:
+        return 1
+    if not args.no_zone:
+        registry.zones = ZoneGate.from_env(registry.zoned_pipelines)
+    report = soak(registry, args.sentences, per_request=args.per_request, sample_every=args.sample_every)
+
+    samples = [s for s in report["samples"] if s["rss_mb"] is not None]
+    baseline = next((s for s in samples if s["sentences"] >= args.sentences * args.warmup), None)
+    growth = samples[-1]["rss_mb"] - baseline["rss_mb"] if baseline else None
+    report["rss_growth_mb"] = round(growth, 2) if growth is not None else None
+    report["max_growth_mb"] = args.max_growth_mb
+    print(json.dumps(report, indent=2))
+    return 1 if growth is not None and growth > args.max_growth_mb else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
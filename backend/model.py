@@ -0,0 +1,388 @@
+"""The process-wide ToCylog pipeline, with shadow evaluation and hot-swap.
+
+app.py and the conversation package share one loaded pipeline through
+`models`. An operator can load a candidate build next to it (/admin/model/*):
+a sampled share of live inputs is then re-parsed by the candidate on a
+background thread, off the request path, and latency and tag/dep/NER
+disagreement are recorded. Promotion is a single reference swap; the old
+pipeline is freed once the requests still holding it have finished.
+
+State is per process: with several gunicorn workers, each worker has its own
+active model and shadow run. An optional small pipeline (backend/cascade.py)
+answers confident short sentences before the active one is used. Parses of
+user text happen inside a shared memory zone (backend/memory_zone.py) so the
+vocab does not grow with every new word.
+
+    NLP_MODEL_PATH          model directory (default ./tl_tocylog_trf)
+    NLP_SHADOW_QUEUE        shadow inputs buffered before new ones are dropped (default 256)
+    NLP_SNAPSHOT_DIR        prebuilt pipeline snapshots for faster loads (backend/snapshot.py)
+"""
+
+import contextlib
+import gc
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy
+from spacy.attrs import DEP, HEAD, ORTH, POS, TAG
+
+from backend.memory_zone import ZoneGate
+from backend.parse_cache import ParseCache, cache_key, model_version, normalize_text
+from backend.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL_PATH = os.environ.get("NLP_MODEL_PATH", os.path.join(REPO_DIR, "tl_tocylog_trf"))
+
+_COMPARE_ATTRS = [ORTH, POS, TAG, DEP, HEAD]
+_LATENCY_SAMPLES = 1000
+
+
+def load_pipeline(path: str):
+    """spacy.load(path), from a prebuilt snapshot when one is configured
+    (backend/snapshot.py)."""
+    import conversation  # noqa: F401  (registers the custom pipeline components)
+    from backend import snapshot
+
+    return snapshot.load(path)
+
+
+def describe_pipeline(nlp) -> str:
+    meta = getattr(nlp, "meta", {}) or {}
+    return f"{meta.get('lang', '')}_{meta.get('name', '')}-{meta.get('version', '')}"
+
+
+def _annotations(doc) -> Tuple[numpy.ndarray, frozenset]:
+    """Plain-data copy of what shadow runs compare: token attrs and entities."""
+    return doc.to_array(_COMPARE_ATTRS), frozenset((e.start, e.end, e.label_) for e in doc.ents)
+
+
+def _percentiles(values) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None}
+    p50, p95 = numpy.percentile(numpy.fromiter(values, dtype=numpy.float64), [50, 95])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2)}
+
+
+class ShadowRun:
+    """A candidate pipeline fed sampled live inputs on its own thread."""
+
+    def __init__(self, path: str, sample_rate: float, queue_size: int = 256):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.state = "loading"
+        self.error: Optional[str] = None
+        self.nlp = None
+        self.name = ""
+        self.started = time.time()
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self.active_ms: deque = deque(maxlen=_LATENCY_SAMPLES)
+        self.shadow_ms: deque = deque(maxlen=_LATENCY_SAMPLES)
+        self.counts = {
+            "compared": 0, "dropped": 0, "failed": 0,
+            "tokenization_mismatch": 0, "tokens": 0,
+            "pos_diff": 0, "tag_diff": 0, "dep_diff": 0, "ner_diff_docs": 0,
+        }
+        self._thread = threading.Thread(target=self._run, name="model-shadow", daemon=True)
+        self._thread.start()
+
+    def offer(self, text: str, doc, active_ms: float) -> None:
+        """Maybe queue one live input; never blocks the caller."""
+        if self.state != "ready" or random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((text, _annotations(doc), active_ms))
+        except queue.Full:
+            with self._lock:
+                self.counts["dropped"] += 1
+
+    def stop(self, wait: float = 0.0) -> None:
+        """Stop taking inputs; with wait, also give the thread that long to
+        finish the parse it is in."""
+        self.state = "stopped"
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if wait:
+            self._thread.join(wait)
+
+    def _run(self) -> None:
+        try:
+            self.nlp = load_pipeline(self.path)
+            self.name = describe_pipeline(self.nlp)
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.error(f"Failed to load candidate model {self.path}: {e}")
+            return
+        if self.state == "stopped":
+            return
+        self.state = "ready"
+        logger.info("Candidate model ready for shadow traffic", extra={"model": self.name, "path": self.path})
+        while True:
+            item = self._queue.get()
+            if item is None or self.state == "stopped":
+                return
+            text, (active_attrs, active_ents), active_ms = item
+            try:
+                # Only this thread uses the candidate, so it gets a zone per input
+                with self.nlp.memory_zone():
+                    start = time.perf_counter()
+                    doc = self.nlp(text)
+                    shadow_ms = (time.perf_counter() - start) * 1000.0
+                    attrs, ents = _annotations(doc)
+            except Exception as e:
+                logger.warning(f"Shadow parse failed: {e}")
+                with self._lock:
+                    self.counts["failed"] += 1
+                continue
+            self._record(active_attrs, active_ents, active_ms, attrs, ents, shadow_ms)
+
+    def _record(self, active_attrs, active_ents, active_ms, attrs, ents, shadow_ms) -> None:
+        with self._lock:
+            self.counts["compared"] += 1
+            self.active_ms.append(active_ms)
+            self.shadow_ms.append(shadow_ms)
+            self.counts["ner_diff_docs"] += active_ents != ents
+            if active_attrs.shape != attrs.shape or (active_attrs[:, 0] != attrs[:, 0]).any():
+                self.counts["tokenization_mismatch"] += 1
+                return
+            diff = active_attrs != attrs
+            self.counts["tokens"] += len(attrs)
+            self.counts["pos_diff"] += int(diff[:, 1].sum())
+            self.counts["tag_diff"] += int(diff[:, 2].sum())
+            # A dependency differs when either the label or the head does
+            self.counts["dep_diff"] += int((diff[:, 3] | diff[:, 4]).sum())
+
+    def report(self) -> Dict[str, object]:
+        with self._lock:
+            counts = dict(self.counts)
+            active = _percentiles(self.active_ms)
+            shadow = _percentiles(self.shadow_ms)
+        tokens = counts["tokens"]
+        compared = counts["compared"]
+        return {
+            "path": self.path,
+            "model": self.name,
+            "state": self.state,
+            "error": self.error,
+            "sample_rate": self.sample_rate,
+            "queued": self._queue.qsize(),
+            **counts,
+            "latency_ms": {"active": active, "candidate": shadow},
+            "disagreement": {
+                "pos": round(counts["pos_diff"] / tokens, 4) if tokens else None,
+                "tag": round(counts["tag_diff"] / tokens, 4) if tokens else None,
+                "dep": round(counts["dep_diff"] / tokens, 4) if tokens else None,
+                "ner_docs": round(counts["ner_diff_docs"] / compared, 4) if compared else None,
+                "tokenization_docs": round(counts["tokenization_mismatch"] / compared, 4) if compared else None,
+            },
+        }
+
+
+class ModelRegistry:
+    def __init__(self):
+        self.active = None
+        self.path: Optional[str] = None
+        self.name = ""
+        self.status = "unloaded"
+        self.shadow: Optional[ShadowRun] = None
+        # Persistent parse cache (backend/parse_cache.py), set up by the server
+        self.cache: Optional[ParseCache] = None
+        self.flights = SingleFlight()
+        # Small-model cascade (backend/cascade.py), set up by the server
+        self.cascade = None
+        # Shared memory zone for user text (backend/memory_zone.py), set up by the server
+        self.zones: Optional[ZoneGate] = None
+        self._lock = threading.Lock()
+        self._listeners: List[Callable] = []
+        self._retired: List[Tuple[str, "weakref.ref"]] = []
+
+    def load(self, path: str = DEFAULT_MODEL_PATH):
+        """Load the active pipeline once per process; None if unavailable."""
+        with self._lock:
+            if self.status != "unloaded":
+                return self.active
+            try:
+                if not os.path.isdir(path):
+                    raise FileNotFoundError(f"{path} model folder not found")
+                self.active = load_pipeline(path)
+                self.path = path
+                self.name = describe_pipeline(self.active)
+                self.status = "loaded"
+            except Exception as e:
+                logger.error(f"Error loading model from {path}: {e}")
+                self.status = "unavailable"
+            return self.active
+
+    def parse(self, text: str):
+        """Parse normalized text with the active pipeline.
+
+        Reads through the parse cache when one is configured, and identical
+        texts already being parsed by another thread wait for that parse
+        instead of starting their own (single flight)."""
+        text = normalize_text(text)
+        nlp, cache = self.active, self.cache
+        if self.zones is not None:
+            self.zones.count()
+        key = cache_key(self._version(nlp), text)
+        if cache is not None:
+            doc = cache.get(key, nlp.vocab)
+            if doc is not None:
+                return doc
+        doc, shared = self.flights.do(key, lambda: self._run(nlp, text, key))
+        # Coalesced callers get their own copy of the leader's Doc
+        return doc.copy() if shared else doc
+
+    def _version(self, nlp) -> str:
+        version = model_version(nlp)
+        cascade = self.cascade
+        return f"{version}|{cascade.version}" if cascade is not None else version
+
+    def _run(self, nlp, text: str, key: str):
+        """One real model call; also offered to a shadow run and cached."""
+        cascade = self.cascade
+        start = time.perf_counter()
+        doc = cascade.try_small(text) if cascade is not None else None
+        if doc is None:
+            doc = nlp(text)
+        # The candidate is compared with the answer actually served, whichever
+        # pipeline gave it
+        shadow = self.shadow
+        if shadow is not None:
+            shadow.offer(text, doc, (time.perf_counter() - start) * 1000.0)
+        if self.cache is not None:
+            self.cache.put(key, doc)
+        return doc
+
+    def parse_many(self, texts: List[str], batch_size: int = 16) -> List[object]:
+        """Parse several texts, sending only the cache misses through nlp.pipe."""
+        texts = [normalize_text(t) for t in texts]
+        nlp, cache = self.active, self.cache
+        if self.zones is not None:
+            self.zones.count(len(texts))
+        docs: List[object] = [None] * len(texts)
+        keys: List[Optional[str]] = [None] * len(texts)
+        if cache is not None:
+            version = self._version(nlp)
+            for i, text in enumerate(texts):
+                keys[i] = cache_key(version, text)
+                docs[i] = cache.get(keys[i], nlp.vocab)
+        cascade = self.cascade
+        if cascade is not None:
+            for i, text in enumerate(texts):
+                if docs[i] is None:
+                    docs[i] = cascade.try_small(text)
+                    if docs[i] is not None and keys[i] is not None:
+                        cache.put(keys[i], docs[i])
+        missing = [i for i, doc in enumerate(docs) if doc is None]
+        for i, doc in zip(missing, nlp.pipe([texts[i] for i in missing], batch_size=batch_size)):
+            docs[i] = doc
+            if keys[i] is not None:
+                cache.put(keys[i], doc)
+        return docs
+
+    def pipelines(self) -> List[object]:
+        """Every loaded pipeline: the active one, a shadow candidate and the
+        cascade's small model."""
+        loaded = [self.active]
+        if self.cascade is not None:
+            loaded.append(self.cascade.small)
+        if self.shadow is not None and self.shadow.nlp is not None:
+            loaded.append(self.shadow.nlp)
+        return [p for p in loaded if p is not None]
+
+    def zone(self):
+        """Context for request work outside Flask's request hooks (a WebSocket
+        turn): parses inside it share the memory zone."""
+        return self.zones.zone() if self.zones is not None else contextlib.nullcontext()
+
+    def zoned_pipelines(self) -> List[object]:
+        """Pipelines that parse on request threads and share the memory zone
+        (the shadow candidate has its own, on its own thread)."""
+        loaded = [self.active, self.cascade.small if self.cascade is not None else None]
+        return [p for p in loaded if p is not None]
+
+    def on_promote(self, callback: Callable) -> None:
+        """callback(new_nlp) runs after every promotion."""
+        self._listeners.append(callback)
+
+    # --- Shadow / promotion ---
+
+    def start_shadow(self, path: str, sample_rate: float) -> ShadowRun:
+        with self._lock:
+            if self.shadow is not None:
+                self.shadow.stop()
+            queue_size = int(os.environ.get("NLP_SHADOW_QUEUE", "256"))
+            self.shadow = ShadowRun(path, sample_rate, queue_size)
+            return self.shadow
+
+    def stop_shadow(self) -> Optional[Dict[str, object]]:
+        with self._lock:
+            shadow, self.shadow = self.shadow, None
+        if shadow is None:
+            return None
+        shadow.stop()
+        return shadow.report()
+
+    def promote(self) -> Dict[str, object]:
+        """Make the shadow candidate the active pipeline.
+
+        Requests that already hold the old pipeline finish on it; it is
+        collected once the last of them lets go."""
+        with self._lock:
+            shadow = self.shadow
+            if shadow is None or shadow.state != "ready":
+                raise RuntimeError("No candidate model is ready to promote")
+            report = shadow.report()
+            # Its last shadow parse must leave its memory zone before request
+            # threads open theirs on the same pipeline
+            shadow.stop(wait=30.0)
+            old, old_name = self.active, self.name
+            self.active, self.path, self.name, self.status = shadow.nlp, shadow.path, shadow.name, "loaded"
+            self.shadow = None
+            shadow.nlp = None
+        for callback in self._listeners:
+            callback(self.active)
+        logger.info("Promoted candidate model", extra={"model": self.name, "previous": old_name})
+        if old is not None:
+            self._retire(old_name, old)
+        return {"active": self.name, "previous": old_name, "shadow": report}
+
+    def _retire(self, name: str, old) -> None:
+        ref = weakref.ref(old)
+        self._retired.append((name, ref))
+        del old
+        # One collection for reference cycles. A model loaded in a preloading
+        # gunicorn master stays in gc.freeze()'s permanent generation: its
+        # pages are shared with the master, and unfreezing to reach it would
+        # make every worker write to (and copy) the whole shared heap.
+        gc.collect()
+        if ref() is not None:
+            logger.info("Retired model is still referenced; requests in flight on it free it when they finish",
+                        extra={"model": name})
+
+    def status_report(self) -> Dict[str, object]:
+        return {
+            "status": self.status,
+            "model": self.name,
+            "path": self.path,
+            "shadow": self.shadow.report() if self.shadow is not None else None,
+            "cascade": self.cascade.stats() if self.cascade is not None else None,
+            "memory_zone": self.zones.stats() if self.zones is not None else None,
+            "retired": [{"model": name, "freed": ref() is None} for name, ref in self._retired],
+        }
+
+
+# Shared by app.py and conversation/chatbot.py
+models = ModelRegistry()
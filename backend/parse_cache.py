@@ -0,0 +1,279 @@
+"""Persistent parse-result cache shared by every worker on a host.
+
+Parses are stored in SQLite (WAL mode, so several gunicorn workers can read
+and write the same file) keyed by the model version and a hash of the
+normalized text. A value is a compact, zlib-compressed JSON record of the
+annotations (words, spaces, tags, POS, morph, lemmas, heads, deps, entities);
+a hit rebuilds an equivalent Doc without running the model.
+
+Reads happen on the request thread. Writes and recency updates are queued
+and applied in batches by one background thread, which also evicts the
+least recently used rows when the file grows past its size limit.
+
+    NLP_PARSE_CACHE_PATH    SQLite file ("off" disables; default in the temp dir)
+    NLP_PARSE_CACHE_MB      size limit before eviction (default 256)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+import weakref
+import zlib
+from typing import Dict, Optional
+
+from spacy.tokens import Doc
+
+from conversation.token_override_component import pipeline_rules_fingerprint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "tagalog-nlp-parse-cache.sqlite")
+# Bump when the stored record layout changes
+FORMAT_VERSION = 1
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """NFC, trimmed, single-spaced: the form that is parsed and cached."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+_base_versions: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def model_version(nlp) -> str:
+    """Cache namespace for a pipeline: name, config/meta hash and override rules."""
+    base = _base_versions.get(nlp)
+    if base is None:
+        meta = getattr(nlp, "meta", {}) or {}
+        digest = hashlib.sha1(nlp.config.to_str().encode("utf-8"))
+        digest.update(json.dumps(meta, sort_keys=True, default=str).encode("utf-8"))
+        base = f"{meta.get('lang', '')}_{meta.get('name', '')}-{meta.get('version', '')}:{digest.hexdigest()[:12]}"
+        _base_versions[nlp] = base
+    return f"v{FORMAT_VERSION}:{base}:{pipeline_rules_fingerprint(nlp)}"
+
+
+def cache_key(version: str, text: str) -> str:
+    return hashlib.sha1(f"{version}\0{text}".encode("utf-8")).hexdigest()
+
+
+# --- Compact records ---
+
+def encode_doc(doc: Doc) -> bytes:
+    record: Dict[str, object] = {
+        "w": [t.text for t in doc],
+        "s": [bool(t.whitespace_) for t in doc],
+    }
+    if doc.has_annotation("TAG"):
+        record["t"] = [t.tag_ for t in doc]
+    if doc.has_annotation("POS"):
+        record["p"] = [t.pos_ for t in doc]
+    if doc.has_annotation("MORPH"):
+        record["m"] = [str(t.morph) for t in doc]
+    if doc.has_annotation("LEMMA"):
+        record["l"] = [t.lemma_ for t in doc]
+    if doc.has_annotation("DEP"):
+        record["h"] = [t.head.i for t in doc]
+        record["d"] = [t.dep_ for t in doc]
+    elif doc.has_annotation("SENT_START"):
+        record["ss"] = [1 if t.is_sent_start else -1 if t.is_sent_start is False else 0 for t in doc]
+    if doc.has_annotation("ENT_IOB"):
+        record["e"] = [[e.start, e.end, e.label_] for e in doc.ents]
+    return zlib.compress(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_doc(vocab, blob: bytes) -> Doc:
+    record = json.loads(zlib.decompress(blob))
+    ents = None
+    if "e" in record:
+        ents = ["O"] * len(record["w"])
+        for start, end, label in record["e"]:
+            ents[start] = f"B-{label}"
+            for i in range(start + 1, end):
+                ents[i] = f"I-{label}"
+    return Doc(
+        vocab,
+        words=record["w"],
+        spaces=record["s"],
+        tags=record.get("t"),
+        pos=record.get("p"),
+        morphs=record.get("m"),
+        lemmas=record.get("l"),
+        heads=record.get("h"),
+        deps=record.get("d"),
+        sent_starts=record.get("ss"),
+        ents=ents,
+    )
+
+
+class ParseCache:
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, queue_size: int = 10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self.errors = 0
+        self.dropped = 0
+        self._local = threading.local()
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS parses ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS parses_used ON parses (used)")
+        finally:
+            conn.close()
+
+    @classmethod
+    def from_env(cls) -> Optional["ParseCache"]:
+        path = os.environ.get("NLP_PARSE_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if not path or path.lower() == "off":
+            return None
+        try:
+            return cls(path, max_bytes=int(os.environ.get("NLP_PARSE_CACHE_MB", "256")) * 1024 * 1024)
+        except Exception as e:
+            logger.warning(f"Parse cache disabled; cannot open {path}: {e}")
+            return None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        # One connection per thread and process; forked workers open their own
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    # --- Read / write ---
+
+    def get(self, key: str, vocab) -> Optional[Doc]:
+        try:
+            row = self._reader().execute("SELECT value FROM parses WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Parse cache read failed: {e}")
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._enqueue(("touch", key, None))
+        return decode_doc(vocab, row[0])
+
+    def put(self, key: str, doc: Doc) -> None:
+        # Encode now: the caller may mutate or release the Doc afterwards
+        self._enqueue(("put", key, encode_doc(doc)))
+
+    def _enqueue(self, item: tuple) -> None:
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer_pid == os.getpid() and self._writer.is_alive():
+            return
+        with self._start_lock:
+            if self._writer is not None and self._writer_pid == os.getpid() and self._writer.is_alive():
+                return
+            if self._writer_pid is not None and self._writer_pid != os.getpid():
+                # Forked child: start from a fresh queue
+                self._queue = queue.Queue(self._queue.maxsize)
+            self._writer_pid = os.getpid()
+            self._writer = threading.Thread(target=self._write_loop, name="parse-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        # Running size estimate; the exact total is only summed when it passes the limit
+        stored = self._stored_bytes(conn)
+        while True:
+            batch = [self._queue.get()]
+            # Gather whatever else arrives within a short window
+            deadline = time.monotonic() + 0.2
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            now = time.time()
+            puts = [(key, blob, len(blob), now) for op, key, blob in batch if op == "put"]
+            touches = [(now, key) for op, key, _ in batch if op == "touch"]
+            try:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT OR REPLACE INTO parses (key, value, size, used) VALUES (?, ?, ?, ?)", puts)
+                conn.executemany("UPDATE parses SET used = ? WHERE key = ?", touches)
+                conn.execute("COMMIT")
+                self.writes += len(puts)
+                stored += sum(p[2] for p in puts)
+                if stored > self.max_bytes:
+                    stored = self._evict(conn)
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning(f"Parse cache write failed: {e}")
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+
+    @staticmethod
+    def _stored_bytes(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM parses").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        """Drop least recently used rows down to 90% of the limit; returns the new size."""
+        stored = self._stored_bytes(conn)
+        target = int(self.max_bytes * 0.9)
+        while stored > target:
+            rows = conn.execute("SELECT key, size FROM parses ORDER BY used LIMIT 500").fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                if stored <= target:
+                    break
+                victims.append((key,))
+                stored -= size
+            conn.executemany("DELETE FROM parses WHERE key = ?", victims)
+            self.evicted += len(victims)
+        return stored
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+            "evicted": self.evicted,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+            "max_mb": self.max_bytes // (1024 * 1024),
+        }
@@ -0,0 +1,83 @@
+"""POS keys shown to learners and how a model token maps onto them."""
+
+from itertools import combinations
+
+# Predefined POS options and their Filipino translations
+POS_OPTIONS = {
+    # Core POS tags
+    "PRON": "Panghalip (Pronoun)",
+    "VERB": "Pandiwa (Verb)",
+    "ADV": "Pang-Abay (Adverb)",
+    "ADJ": "Pang-Uri (Adjective)",
+    "NOUN": "Pangngalan (Noun)",
+    "ADP": "Pang-ukol (Preposition)",
+    "DET": "Pantukoy (Determiner)",
+    "PART": "Panghikayat (Particle)",
+    # Extended POS tags from ToCylog model
+    "PROPN": "Pangngalang Pantangi (Proper Noun)",
+    "NUM": "Numero (Number)",
+    "CCONJ": "Pangatnig na Nagtutugma (Coordinating Conjunction)",
+    "SCONJ": "Pangatnig na Nagpapailalim (Subordinating Conjunction)",
+    "INTJ": "Pandamdam (Interjection)",
+    "PUNCT": "Bantas (Punctuation)",
+    "SYM": "Simbolo (Symbol)",
+}
+
+# Every possible set of 3 wrong options per correct label, built once so a
+# question draws its distractors with a single random.choice
+DISTRACTOR_COUNT = 3
+DISTRACTOR_SETS = {
+    label: list(combinations([o for o in POS_OPTIONS.values() if o != label], DISTRACTOR_COUNT))
+    for label in POS_OPTIONS.values()
+}
+
+# Prefer model tag over coarse POS when available
+def resolve_pos(token):
+    """Return a stable POS key for a spaCy token based on model outputs.
+    Uses fine-grained tag (token.tag_) if it exists in POS_OPTIONS; otherwise
+    falls back to coarse tag (token.pos_)."""
+    try:
+        if hasattr(token, 'tag_') and token.tag_ in POS_OPTIONS:
+            return token.tag_
+        if token.pos_ in POS_OPTIONS:
+            return token.pos_
+        # Some models store POS in token.tag_ only
+        if hasattr(token, 'tag_') and token.tag_:
+            return token.tag_
+    except Exception:
+        pass
+    return token.pos_ or "X"
+
+
+# Learner-facing glosses for the morph features and dependency roles the
+# model predicts (used in question and answer explanations)
+MORPH_GLOSSES = {
+    ("Case", "Nom"): "nasa pangunahing anyo",
+    ("Case", "Gen"): "nagpapakita ng pagmamay-ari",
+    ("Case", "Loc"): "nagpapakita ng lokasyon",
+    ("Case", "Dat"): "nagpapakita ng tagatanggap ng kilos",
+    ("Aspect", "Imp"): "di-ganap na aspekto",
+    ("Aspect", "Perf"): "ganap na aspekto",
+    ("Voice", "Act"): "aktibong tinig",
+    ("Voice", "Pass"): "pasibong tinig",
+}
+
+DEP_GLOSSES = {
+    "ROOT": "Ito ang pangunahing salita sa pangungusap.",
+    "nsubj": "Ito ang paksa ng pangungusap.",
+    "obj": "Ito ang layon ng pangungusap.",
+    "iobj": "Ito ang di-tuwirang layon.",
+    "obl": "Ito ay nagbibigay ng karagdagang impormasyon.",
+}
+
+
+def explain_token(text, label, morph, dep):
+    """Explanation for a token: its POS label, then any morph features and
+    syntactic role the model found."""
+    explanation = f"Ang '{text}' ay isang {label.lower()}."
+    glosses = [MORPH_GLOSSES[item] for item in morph.items() if item in MORPH_GLOSSES]
+    if glosses:
+        explanation += f" Ito ay {', '.join(glosses)}."
+    if dep in DEP_GLOSSES:
+        explanation += " " + DEP_GLOSSES[dep]
+    return explanation
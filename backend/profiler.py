@@ -0,0 +1,170 @@
+"""On-demand sampling profiler for live workers (/debug/profile).
+
+A background thread reads every thread's Python stack with
+sys._current_frames() at NLP_PROFILE_HZ for the requested window. The answer
+is in the collapsed-stack format ("root;caller;leaf count" per line) that
+flamegraph.pl, speedscope and inferno read. Nothing is installed in the
+interpreter (no settrace), so unprofiled time costs nothing. While profiling,
+the cost is one stack walk per thread per tick, which holds the GIL for
+microseconds. The sampler's own CPU time is reported with each profile.
+
+Samples are wall-clock: a thread waiting for the GIL shows up where it
+released it. Under load a wide bar ending in a C call that drops the GIL
+(numpy, I/O, lock acquire) is time spent waiting there, not computing.
+
+Frames are "function (file:first line)" so each function is one box however
+many lines it runs; the root frame is the thread's name with its pool index
+dropped, so the gthread workers fold together. ?threads=requests keeps only
+threads inside a Flask request (a wsgi_app frame on the stack).
+
+    NLP_PROFILE_HZ            samples per second (default 100)
+    NLP_PROFILE_MAX_SECONDS   longest window one call may ask for (default 60)
+
+    curl -H "X-Admin-Token: $ADMIN_TOKEN" 'http://localhost:5000/debug/profile?seconds=30' > worker.folded
+    flamegraph.pl worker.folded > worker.svg
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Set, Tuple
+
+_POOL_INDEX = re.compile(r"[-_]\d+(?=$| \()")
+_REQUEST_FRAME = "wsgi_app"
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profile is already running in this process."""
+
+
+def _thread_label(name: str) -> str:
+    # "ThreadPoolExecutor-0_7" -> "ThreadPoolExecutor-0", "Thread-12 (run)" -> "Thread (run)"
+    return _POOL_INDEX.sub("", name) or name
+
+
+class Profile:
+    """Stack sample counts from one window, plus how it was taken."""
+
+    def __init__(self, stacks: Counter, seconds: float, hz: float, samples: int,
+                 sampler_cpu_ms: float, threads: str):
+        self.stacks = stacks
+        self.seconds = seconds
+        self.hz = hz
+        self.samples = samples
+        self.sampler_cpu_ms = sampler_cpu_ms
+        self.threads = threads
+
+    def collapsed(self) -> str:
+        """One "frame;frame;frame count" line per distinct stack, busiest first."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "seconds": round(self.seconds, 3),
+            "hz": self.hz,
+            "ticks": self.samples,
+            "stacks": len(self.stacks),
+            "thread_samples": sum(self.stacks.values()),
+            "threads": self.threads,
+            "sampler_cpu_ms": round(self.sampler_cpu_ms, 1),
+            # Share of one core the sampler used; request threads wait on the GIL about as long
+            "overhead_pct": round(self.sampler_cpu_ms / (self.seconds * 10.0), 3) if self.seconds else 0.0,
+        }
+
+
+class StackProfiler:
+    def __init__(self, hz: float = 100.0, max_seconds: float = 60.0, max_depth: int = 128):
+        self.hz = hz
+        self.max_seconds = max_seconds
+        self.max_depth = max_depth
+        self._busy = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "StackProfiler":
+        return cls(
+            hz=float(os.environ.get("NLP_PROFILE_HZ", "100")),
+            max_seconds=float(os.environ.get("NLP_PROFILE_MAX_SECONDS", "60")),
+        )
+
+    def profile(self, seconds: float, hz: Optional[float] = None, requests_only: bool = False) -> Profile:
+        """Sample for `seconds` on a background thread and wait for the result.
+
+        The calling thread is left out of the samples (it is only waiting)."""
+        if not self._busy.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            result: Dict[str, Profile] = {}
+            exclude = {threading.get_ident()}
+
+            def run() -> None:
+                result["profile"] = self._sample(seconds, hz or self.hz, exclude, requests_only)
+
+            sampler = threading.Thread(target=run, name="stack-profiler", daemon=True)
+            sampler.start()
+            sampler.join()
+            return result["profile"]
+        finally:
+            self._busy.release()
+
+    def _sample(self, seconds: float, hz: float, exclude: Set[int], requests_only: bool) -> Profile:
+        exclude = exclude | {threading.get_ident()}
+        interval = 1.0 / hz
+        labels: Dict[object, str] = {}
+        names: Dict[int, str] = {}
+        stacks: Counter = Counter()
+        ticks = 0
+        cpu_start = time.thread_time()
+        started = time.monotonic()
+        deadline = started + seconds
+        next_tick = started
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            frames = sys._current_frames()
+            if not names.keys() >= frames.keys():
+                names = {t.ident: _thread_label(t.name) for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident in exclude:
+                    continue
+                stack, in_request = self._walk(frame, labels)
+                if requests_only and not in_request:
+                    continue
+                stack.append(names.get(ident, "thread"))
+                stack.reverse()
+                stacks[tuple(stack)] += 1
+            # Do not keep other threads' frames alive while sleeping
+            frames = frame = None
+            ticks += 1
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind (a long GIL hold elsewhere); do not burst to catch up
+                next_tick = time.monotonic()
+        return Profile(stacks, time.monotonic() - started, hz, ticks,
+                       (time.thread_time() - cpu_start) * 1000.0,
+                       "requests" if requests_only else "all")
+
+    def _walk(self, frame, labels: Dict[object, str]) -> Tuple[list, bool]:
+        """Leaf-first frame labels, and whether the thread is serving a request."""
+        stack = []
+        in_request = False
+        depth = 0
+        while frame is not None:
+            if depth == self.max_depth:
+                stack.append("(truncated)")
+                break
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            in_request = in_request or code.co_name == _REQUEST_FRAME
+            stack.append(label)
+            frame = frame.f_back
+            depth += 1
+        return stack, in_request
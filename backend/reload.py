@@ -0,0 +1,122 @@
+"""Hot reload of content files (override rules, word pools) without a restart.
+
+Each watch is a set of files plus a callback that rebuilds only what those
+files feed and swaps it in with a single assignment, so requests in flight
+keep using the old version. A polling thread checks file stats every
+NLP_RELOAD_INTERVAL seconds (0 disables it); /admin/reload forces a check in
+the worker that serves it.
+"""
+
+import logging
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# size and mtime; a missing file is (-1, -1) so creating it counts as a change
+_Stat = Tuple[int, int]
+
+
+def _stat(path: str) -> _Stat:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (-1, -1)
+    return (st.st_size, st.st_mtime_ns)
+
+
+class _Watch:
+    def __init__(self, name: str, paths: Callable[[], Iterable[str]], callback: Callable[[List[str]], Dict]):
+        self.name = name
+        self.paths = paths
+        self.callback = callback
+        self.snapshot: Dict[str, _Stat] = {}
+        self.reloads = 0
+        self.last_result: Optional[Dict] = None
+
+
+class ContentReloader:
+    def __init__(self, interval: float = 10.0):
+        self.interval = interval
+        self._watches: List[_Watch] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> "ContentReloader":
+        return cls(interval=float(os.environ.get("NLP_RELOAD_INTERVAL", "10")))
+
+    def watch(self, name: str, paths: Callable[[], Iterable[str]], callback: Callable[[List[str]], Dict]) -> None:
+        """Call callback(changed_paths) whenever any of paths() changes on disk.
+
+        The current state is the baseline: nothing fires for files as they
+        are at registration time."""
+        watch = _Watch(name, paths, callback)
+        watch.snapshot = {str(p): _stat(str(p)) for p in paths()}
+        self._watches.append(watch)
+
+    def check(self, force: bool = False) -> Dict[str, Dict]:
+        """Reload whatever changed (everything when force is set)."""
+        results: Dict[str, Dict] = {}
+        # One reload at a time: the poller and /admin/reload may race
+        with self._lock:
+            for watch in self._watches:
+                current = {str(p): _stat(str(p)) for p in watch.paths()}
+                changed = [p for p, st in current.items() if force or watch.snapshot.get(p) != st]
+                if not changed:
+                    continue
+                try:
+                    result = watch.callback(changed)
+                except Exception as e:
+                    # Keep the old snapshot so the next check retries
+                    logger.error(f"Reloading {watch.name} failed: {e}", exc_info=True)
+                    results[watch.name] = {"error": str(e), "changed": changed}
+                    continue
+                watch.snapshot = current
+                watch.reloads += 1
+                watch.last_result = result
+                results[watch.name] = result
+                logger.info("Reloaded content", extra={"watch": watch.name, "files": len(changed)})
+        return results
+
+    # --- Polling thread ---
+
+    def start(self) -> None:
+        """Start the poller in this process (again after a fork)."""
+        if self.interval <= 0:
+            return
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        self._thread_pid = os.getpid()
+        # A fresh event per thread; one inherited over a fork may be mid-use
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name="content-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop this process's poller; start() runs it again."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and self._thread_pid == os.getpid() and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+
+    def _run(self, stop: threading.Event) -> None:
+        while not stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Content reload check failed: {e}")
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "interval": self.interval,
+            "polling": self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive(),
+            "watches": {
+                w.name: {"files": len(w.snapshot), "reloads": w.reloads, "last": w.last_result}
+                for w in self._watches
+            },
+        }
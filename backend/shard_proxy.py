@@ -0,0 +1,333 @@
+"""Consistent-hash front proxy for several NLP backends.
+
+Each backend keeps its own parse cache, so the same sentence should always
+reach the same backend. The proxy hashes the normalized sentence (the parse
+cache's key text) onto a ring with virtual nodes and forwards the request to
+the first healthy backend clockwise from it. Adding a backend moves only its
+share of sentences; a backend that fails its health checks (including one
+serving fallback tags without its model) or refuses a connection is skipped
+until it recovers, and its sentences go to their next backend on the ring
+meanwhile.
+
+Routing keys:
+    JSON body with "sentence" or "text"   the normalized text
+    /api/conversation/*                   one fixed key (chat state lives in one process)
+    anything else                         any healthy backend
+
+The conversation WebSocket is not proxied; clients connect to a backend directly.
+
+    NLP_BACKENDS                 comma-separated backend base URLs (required)
+    NLP_PROXY_VNODES             virtual nodes per backend (default 160)
+    NLP_PROXY_TIMEOUT            seconds to wait on a backend (default 30)
+    NLP_PROXY_HEALTH_INTERVAL    seconds between /health probes (default 5)
+    NLP_PROXY_MAX_FAILS          consecutive failures before a backend is skipped (default 2)
+
+    NLP_BACKENDS=http://127.0.0.1:5001,http://127.0.0.1:5002 \\
+        gunicorn -k gthread --threads 32 -b 0.0.0.0:5000 backend.shard_proxy:app
+"""
+
+import bisect
+import hashlib
+import http.client
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from flask import Flask, Response, jsonify, request
+
+from backend.parse_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Not forwarded in either direction (RFC 7230 section 6.1, plus ones we recompute)
+_HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te",
+    "trailer", "transfer-encoding", "upgrade", "host", "content-length",
+}
+# Backend answers that mean "try another one"
+_RETRY_STATUSES = {502, 503, 504}
+CONVERSATION_KEY = "conversation"
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Backends placed on a 64-bit ring at `vnodes` points each."""
+
+    def __init__(self, nodes: List[str], vnodes: int = 160):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._nodes = [n for _, n in points]
+        self.nodes = list(nodes)
+
+    def preference(self, key: str) -> List[str]:
+        """Every backend, in the order the key tries them."""
+        if not self._hashes:
+            return []
+        start = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        order: List[str] = []
+        for i in range(len(self._nodes)):
+            node = self._nodes[(start + i) % len(self._nodes)]
+            if node not in order:
+                order.append(node)
+                if len(order) == len(self.nodes):
+                    break
+        return order
+
+
+class Backend:
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.url = url.rstrip("/")
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if self.https else 80)
+        self.healthy = True
+        self.fails = 0
+        self.requests = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def connect(self, timeout: float) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=timeout)
+
+
+class ShardRouter:
+    def __init__(self, urls: List[str], vnodes: int = 160, timeout: float = 30.0,
+                 health_interval: float = 5.0, max_fails: int = 2):
+        if not urls:
+            raise ValueError("No NLP backends configured (NLP_BACKENDS)")
+        self.backends: Dict[str, Backend] = {url.rstrip("/"): Backend(url) for url in urls}
+        self.vnodes = vnodes
+        self.ring = HashRing(list(self.backends), vnodes)
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.max_fails = max_fails
+        self.failovers = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._checker: Optional[threading.Thread] = None
+        self._checker_pid: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "ShardRouter":
+        urls = [u.strip() for u in os.environ.get("NLP_BACKENDS", "").split(",") if u.strip()]
+        return cls(
+            urls,
+            vnodes=int(os.environ.get("NLP_PROXY_VNODES", "160")),
+            timeout=float(os.environ.get("NLP_PROXY_TIMEOUT", "30")),
+            health_interval=float(os.environ.get("NLP_PROXY_HEALTH_INTERVAL", "5")),
+            max_fails=int(os.environ.get("NLP_PROXY_MAX_FAILS", "2")),
+        )
+
+    # --- Choosing a backend ---
+
+    def candidates(self, key: Optional[str]) -> List[Backend]:
+        """Healthy backends in the order to try them (down ones last, as a
+        last resort when everything looks down)."""
+        if key is None:
+            order = list(self.backends)
+            random.shuffle(order)
+        else:
+            order = self.ring.preference(key)
+        backends = [self.backends[url] for url in order]
+        return [b for b in backends if b.healthy] + [b for b in backends if not b.healthy]
+
+    def _record(self, backend: Backend, ok: bool, error: Optional[str] = None) -> None:
+        with self._lock:
+            if ok:
+                backend.fails = 0
+                if not backend.healthy:
+                    logger.info("Backend is back", extra={"backend": backend.url})
+                backend.healthy = True
+                return
+            backend.errors += 1
+            backend.fails += 1
+            backend.last_error = error
+            if backend.healthy and backend.fails >= self.max_fails:
+                backend.healthy = False
+                logger.warning(f"Backend {backend.url} marked down: {error}")
+
+    # --- Forwarding ---
+
+    def _connection(self, backend: Backend, fresh: bool = False) -> http.client.HTTPConnection:
+        # Keep-alive connection per thread and backend
+        pool = getattr(self._local, "pool", None)
+        if pool is None or self._local.pid != os.getpid():
+            pool = self._local.pool = {}
+            self._local.pid = os.getpid()
+        conn = pool.get(backend.url)
+        if conn is None or fresh:
+            if conn is not None:
+                conn.close()
+            conn = pool[backend.url] = backend.connect(self.timeout)
+        return conn
+
+    def _send(self, backend: Backend, method: str, path: str, body: bytes,
+              headers: Dict[str, str]) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        for attempt in (0, 1):
+            conn = self._connection(backend, fresh=attempt > 0)
+            try:
+                conn.request(method, path, body=body or None, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # A reused keep-alive connection the backend already closed
+                if attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    def forward(self, key: Optional[str], method: str, path: str, body: bytes,
+                headers: Dict[str, str]) -> Tuple[Backend, http.client.HTTPConnection, http.client.HTTPResponse]:
+        """Send the request to the first backend that answers; returns the
+        backend, its connection and the (unread) response."""
+        self.ensure_health_checker()
+        last_error: Optional[Exception] = None
+        for attempt, backend in enumerate(self.candidates(key)):
+            try:
+                conn, response = self._send(backend, method, path, body, headers)
+            except (OSError, http.client.HTTPException) as e:
+                self._connection(backend, fresh=True)
+                self._record(backend, False, str(e))
+                last_error = e
+                continue
+            if response.status in _RETRY_STATUSES:
+                response.read()
+                self._record(backend, False, f"HTTP {response.status}")
+                last_error = RuntimeError(f"{backend.url} answered {response.status}")
+                continue
+            self._record(backend, True)
+            with self._lock:
+                backend.requests += 1
+                if attempt:
+                    self.failovers += 1
+            return backend, conn, response
+        raise ConnectionError(f"No NLP backend answered: {last_error}")
+
+    # --- Health checks ---
+
+    def ensure_health_checker(self) -> None:
+        if self._checker is not None and self._checker_pid == os.getpid() and self._checker.is_alive():
+            return
+        with self._lock:
+            if self._checker is not None and self._checker_pid == os.getpid() and self._checker.is_alive():
+                return
+            self._checker_pid = os.getpid()
+            self._checker = threading.Thread(target=self._health_loop, name="shard-health", daemon=True)
+            self._checker.start()
+
+    def check_health(self) -> None:
+        for backend in self.backends.values():
+            conn = backend.connect(min(self.timeout, 2.0))
+            try:
+                conn.request("GET", "/health")
+                response = conn.getresponse()
+                body = response.read()
+                if response.status != 200:
+                    self._record(backend, False, f"health HTTP {response.status}")
+                    continue
+                # A backend without the model answers 200 with rule-based
+                # fallback tags; keep sentences away from it
+                try:
+                    model_status = json.loads(body).get("model_status")
+                except (ValueError, AttributeError):
+                    model_status = None
+                ok = model_status == "loaded"
+                self._record(backend, ok, None if ok else f"health: model_status {model_status!r}")
+            except (OSError, http.client.HTTPException) as e:
+                self._record(backend, False, f"health: {e}")
+            finally:
+                conn.close()
+
+    def _health_loop(self) -> None:
+        while True:
+            time.sleep(self.health_interval)
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.error(f"Backend health check failed: {e}", exc_info=True)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "vnodes": self.vnodes,
+                "failovers": self.failovers,
+                "backends": [
+                    {"url": b.url, "healthy": b.healthy, "requests": b.requests,
+                     "errors": b.errors, "last_error": b.last_error}
+                    for b in self.backends.values()
+                ],
+            }
+
+
+def routing_key(path: str, body: bytes, content_type: str) -> Optional[str]:
+    """The text a request is sharded by (see the module docstring)."""
+    if path.startswith("/api/conversation"):
+        return CONVERSATION_KEY
+    if body and "json" in content_type:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(data, dict):
+            text = data.get("sentence") or data.get("text")
+            if isinstance(text, str) and text.strip():
+                return normalize_text(text)
+    return None
+
+
+# --- The proxy app ---
+
+app = Flask(__name__)
+router = ShardRouter.from_env() if os.environ.get("NLP_BACKENDS") else None
+
+
+@app.route('/proxy/status', methods=['GET'])
+def proxy_status():
+    if router is None:
+        return jsonify({"error": "NLP_BACKENDS is not set"}), 503
+    return jsonify(router.stats())
+
+
+@app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+@app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+def proxy(path):
+    if router is None:
+        return jsonify({"error": "NLP_BACKENDS is not set"}), 503
+    body = request.get_data()
+    target = request.full_path if request.query_string else request.path
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in _HOP_BY_HOP}
+    headers["X-Forwarded-For"] = request.remote_addr or ""
+    key = routing_key(request.path, body, request.content_type or "")
+    try:
+        backend, conn, upstream = router.forward(key, request.method, target, body, headers)
+    except ConnectionError as e:
+        logger.error(f"Proxy failed: {e}")
+        return jsonify({"error": "No NLP backend is available"}), 503
+
+    def stream() -> Iterator[bytes]:
+        # Relay chunk by chunk so NDJSON streams stay incremental
+        done = False
+        try:
+            while True:
+                chunk = upstream.read1(65536)
+                if not chunk:
+                    done = True
+                    break
+                yield chunk
+        finally:
+            if not done:
+                # Client went away or the backend broke off: the connection
+                # still has unread data and cannot be reused
+                conn.close()
+
+    response_headers = [(k, v) for k, v in upstream.getheaders() if k.lower() not in _HOP_BY_HOP]
+    response_headers.append(("X-NLP-Backend", backend.url))
+    return Response(stream(), status=upstream.status, headers=response_headers)
@@ -0,0 +1,73 @@
+"""Single-flight coalescing of identical concurrent calls.
+
+When many requests ask for the same thing at once (a class submitting the
+sentence on the board), the first caller runs the work and the rest wait for
+its result instead of repeating it.
+"""
+
+import threading
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], object]) -> Tuple[object, bool]:
+        """Run fn once per key among concurrent callers.
+
+        Returns (result, shared); shared is True for callers that received
+        another caller's result and should copy it before mutating. If the
+        leader raises, every waiter gets the same exception."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+                leader = True
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            in_flight = len(self._flights)
+        calls = self.leaders + self.coalesced
+        return {
+            "calls": calls,
+            "executed": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / calls, 4) if calls else 0.0,
+            "in_flight": in_flight,
+        }
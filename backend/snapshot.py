@@ -0,0 +1,207 @@
+"""Prebuilt pipeline snapshots for faster cold starts.
+
+spacy.load() reads a model directory component by component: config
+parsing, auto-fill and validation, then one from_disk per component, each
+opening its own files. A snapshot is the same pipeline written once with
+nlp.to_bytes() as a single file, plus the resolved config and meta. Loading
+it builds the components from the already-filled config without
+validation, then restores every component from a memory-mapped read of that
+file. The pages come straight from the page cache with no extra heap copy of
+the whole file.
+
+Snapshots live under NLP_SNAPSHOT_DIR, one directory per model hash. The
+hash covers every file's path, size and mtime plus the spaCy version, so an
+edited or replaced model never loads a stale snapshot. A missing or
+unreadable snapshot falls back to spacy.load(). Build one at image build
+time, next to the model:
+
+    python -m backend.snapshot build [--model ./tl_tocylog_trf] [--dir ./.model_snapshots]
+    python -m backend.snapshot bench [--model ./tl_tocylog_trf]    # spacy.load vs snapshot, fresh processes
+
+    NLP_SNAPSHOT_DIR     snapshot root (unset: snapshots off)
+    NLP_SNAPSHOT_WRITE   "1" writes a snapshot after a slow load when none exists (default 0)
+
+Token override rules are not part of a snapshot: the component is rebuilt
+from its factory and reads the rule files as usual.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bump when the snapshot layout changes
+SNAPSHOT_FORMAT = 1
+_PIPELINE_FILE = "pipeline.bin"
+
+
+def model_hash(path: str) -> str:
+    """Identity of a model directory: every file's relative path, size and
+    mtime, the spaCy version and the snapshot format."""
+    import spacy
+
+    digest = hashlib.sha1(f"{SNAPSHOT_FORMAT}\0{spacy.__version__}".encode("utf-8"))
+    root = Path(path)
+    for file in sorted(p for p in root.rglob("*") if p.is_file()):
+        stat = file.stat()
+        digest.update(f"\0{file.relative_to(root).as_posix()}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def snapshot_path(path: str, snapshot_dir: str) -> Path:
+    return Path(snapshot_dir) / f"{Path(path).resolve().name}-{model_hash(path)}"
+
+
+def write_snapshot(nlp, path: str, snapshot_dir: str) -> Path:
+    """Write nlp (loaded from path) as a snapshot; atomic per directory."""
+    target = snapshot_path(path, snapshot_dir)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{target.name}.", dir=target.parent))
+    try:
+        (staging / "config.cfg").write_text(nlp.config.to_str(), encoding="utf-8")
+        (staging / "meta.json").write_text(json.dumps(nlp.meta, default=str), encoding="utf-8")
+        with open(staging / _PIPELINE_FILE, "wb") as f:
+            f.write(nlp.to_bytes())
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another worker or build step wrote the same snapshot first
+            if not target.is_dir():
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+def load_snapshot(path: str, snapshot_dir: str):
+    """The pipeline from path's snapshot, or None when there is none."""
+    from spacy import util
+
+    import conversation  # noqa: F401  (registers the custom pipeline components)
+    from conversation.token_override_component import override_components
+
+    target = snapshot_path(path, snapshot_dir)
+    if not (target / _PIPELINE_FILE).is_file():
+        return None
+    # spaCy's reader keeps section order, so model_version (and the parse
+    # cache namespace) matches a spacy.load of the same model
+    config = util.load_config_from_str((target / "config.cfg").read_text(encoding="utf-8"))
+    meta = json.loads((target / "meta.json").read_text(encoding="utf-8"))
+    nlp = util.load_model_from_config(config, meta=meta, auto_fill=False, validate=False)
+    with open(target / _PIPELINE_FILE, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        nlp.from_bytes(data)
+    # Built from a config, the pipeline does not know its model directory,
+    # which holds legacy override rules
+    for component in override_components(nlp):
+        if component.model_rules_path is None:
+            component.set_model_path(path)
+    return nlp
+
+
+def load(path: str):
+    """spacy.load(path), through a snapshot when NLP_SNAPSHOT_DIR is set."""
+    import spacy
+
+    snapshot_dir = os.environ.get("NLP_SNAPSHOT_DIR")
+    if snapshot_dir and os.path.isdir(path):
+        start = time.perf_counter()
+        try:
+            nlp = load_snapshot(path, snapshot_dir)
+        except Exception as e:
+            logger.error(f"Ignoring unreadable model snapshot in {snapshot_dir}: {e}")
+            nlp = None
+        if nlp is not None:
+            logger.info("Loaded model snapshot", extra={"path": path, "seconds": round(time.perf_counter() - start, 3)})
+            return nlp
+    start = time.perf_counter()
+    nlp = spacy.load(path)
+    logger.info("Loaded model", extra={"path": path, "seconds": round(time.perf_counter() - start, 3)})
+    if snapshot_dir and os.environ.get("NLP_SNAPSHOT_WRITE", "0") == "1":
+        try:
+            logger.info("Wrote model snapshot", extra={"snapshot": str(write_snapshot(nlp, path, snapshot_dir))})
+        except OSError as e:
+            logger.warning(f"Could not write model snapshot to {snapshot_dir}: {e}")
+    return nlp
+
+
+# --- CLI ---
+
+_BENCH_CHILD = """
+import time
+start = time.perf_counter()
+import spacy, conversation
+from backend.snapshot import load_snapshot
+imported = time.perf_counter()
+nlp = {load}
+nlp("Kumain siya ng mansanas.")
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def _bench_once(load_code: str) -> Tuple[float, float]:
+    """(import seconds, load-to-first-parse seconds) in a fresh interpreter."""
+    out = subprocess.run([sys.executable, "-c", _BENCH_CHILD.format(load=load_code)],
+                         capture_output=True, text=True, check=True)
+    imported, loaded = out.stdout.strip().splitlines()[-1].split()
+    return float(imported), float(loaded)
+
+
+def main(argv: List[str]) -> int:
+    from backend.logs import configure_cli_logging
+    from backend.model import DEFAULT_MODEL_PATH
+
+    parser = argparse.ArgumentParser(prog="python -m backend.snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, text in (("build", "write a snapshot of a model directory"),
+                       ("bench", "time spacy.load against the snapshot in fresh processes")):
+        cmd = sub.add_parser(name, help=text)
+        cmd.add_argument("--model", default=DEFAULT_MODEL_PATH)
+        cmd.add_argument("--dir", default=os.environ.get("NLP_SNAPSHOT_DIR", ".model_snapshots"))
+        if name == "bench":
+            cmd.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv[1:])
+
+    configure_cli_logging()
+    if args.command == "build":
+        from backend.model import load_pipeline
+
+        os.environ.pop("NLP_SNAPSHOT_DIR", None)
+        target = write_snapshot(load_pipeline(args.model), args.model, args.dir)
+        size = (target / _PIPELINE_FILE).stat().st_size
+        print(json.dumps({"snapshot": str(target), "bytes": size}))
+        return 0
+
+    if not snapshot_path(args.model, args.dir).is_dir():
+        logger.error("No snapshot for %s in %s; run the build command first", args.model, args.dir)
+        return 1
+    model, directory = json.dumps(args.model), json.dumps(args.dir)
+    loaders = {"spacy_load": f"spacy.load({model})", "snapshot": f"load_snapshot({model}, {directory})"}
+    timings: Dict[str, List[Tuple[float, float]]] = {name: [] for name in loaders}
+    for _ in range(args.runs):
+        for name, code in loaders.items():
+            timings[name].append(_bench_once(code))
+
+    def median(values: List[float]) -> float:
+        return round(sorted(values)[len(values) // 2], 3)
+
+    # Imports are the same either way; load_s is what the snapshot changes
+    report = {name: {"imports_s": median([i for i, _ in runs]), "load_s": median([l for _, l in runs]),
+                     "cold_start_s": median([i + l for i, l in runs])}
+              for name, runs in timings.items()}
+    print(json.dumps({"model": args.model, "runs": args.runs, **report}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
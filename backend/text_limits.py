@@ -0,0 +1,108 @@
+"""Input size limits and sentence splitting for user-supplied text.
+
+Transformer cost grows quickly with input length, so single-sentence
+endpoints reject oversized input (HTTP 413) and long passages go through the
+paragraph endpoint, which splits them and parses one sentence at a time.
+
+    NLP_MAX_SENTENCE_CHARS      characters per sentence (default 500)
+    NLP_MAX_SENTENCE_TOKENS     tokenizer tokens per sentence (default 100)
+    NLP_MAX_PARAGRAPH_CHARS     characters per paragraph request (default 10000)
+    NLP_MAX_PARAGRAPH_SENTENCES sentences per paragraph request (default 100)
+"""
+
+import os
+import re
+from typing import List
+
+# Candidate boundary: ., ! or ? (plus closing quotes/brackets) then whitespace
+_BOUNDARY = re.compile(r"[.!?][\"'”’)\]]*\s+")
+_OPENERS = "\"'“‘(["
+# Titles that end in a period but do not end the sentence
+ABBREVIATIONS = {"dr.", "g.", "gng.", "bb.", "sr.", "jr.", "st.", "sta.", "sto.", "gob.", "sen.", "pres."}
+
+
+class TextTooLong(ValueError):
+    """Input exceeds a configured limit; maps to HTTP 413."""
+
+    def __init__(self, what: str, size: int, limit: int):
+        super().__init__(f"Text is too long: {size} {what} (limit {limit})")
+        self.what = what
+        self.size = size
+        self.limit = limit
+
+    def to_dict(self) -> dict:
+        return {"error": str(self), "limit": self.limit, "size": self.size, "unit": self.what}
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split a passage into sentences without running the model.
+
+    Line breaks always end a sentence. Within a line, a boundary needs the
+    next sentence to start with a capital, digit or opening quote, and the
+    word before it must not be a title abbreviation (Dr., Gng., ...)."""
+    sentences: List[str] = []
+    for line in (text or "").splitlines():
+        start = 0
+        for match in _BOUNDARY.finditer(line):
+            rest = line[match.end():].lstrip(_OPENERS)
+            if not rest or not (rest[0].isupper() or rest[0].isdigit()):
+                continue
+            words = line[start:match.end()].split()
+            if words and words[-1].lower() in ABBREVIATIONS:
+                continue
+            sentences.append(line[start:match.end()].strip())
+            start = match.end()
+        if line[start:].strip():
+            sentences.append(line[start:].strip())
+    return sentences
+
+
+class TextLimits:
+    def __init__(
+        self,
+        sentence_chars: int = 500,
+        sentence_tokens: int = 100,
+        paragraph_chars: int = 10000,
+        paragraph_sentences: int = 100,
+    ):
+        self.sentence_chars = sentence_chars
+        self.sentence_tokens = sentence_tokens
+        self.paragraph_chars = paragraph_chars
+        self.paragraph_sentences = paragraph_sentences
+
+    @classmethod
+    def from_env(cls) -> "TextLimits":
+        return cls(
+            sentence_chars=int(os.environ.get("NLP_MAX_SENTENCE_CHARS", "500")),
+            sentence_tokens=int(os.environ.get("NLP_MAX_SENTENCE_TOKENS", "100")),
+            paragraph_chars=int(os.environ.get("NLP_MAX_PARAGRAPH_CHARS", "10000")),
+            paragraph_sentences=int(os.environ.get("NLP_MAX_PARAGRAPH_SENTENCES", "100")),
+        )
+
+    def check_sentence(self, text: str, tokenizer=None) -> None:
+        """Raise TextTooLong if one sentence is over the char or token limit.
+
+        The token count uses the pipeline's tokenizer only (no model pass)."""
+        if len(text) > self.sentence_chars:
+            raise TextTooLong("characters", len(text), self.sentence_chars)
+        if tokenizer is not None:
+            n_tokens = len(tokenizer(text))
+            if n_tokens > self.sentence_tokens:
+                raise TextTooLong("tokens", n_tokens, self.sentence_tokens)
+
+    def split_paragraph(self, text: str) -> List[str]:
+        """Split a paragraph after checking the paragraph-level limits."""
+        if len(text) > self.paragraph_chars:
+            raise TextTooLong("characters", len(text), self.paragraph_chars)
+        sentences = split_sentences(text)
+        if len(sentences) > self.paragraph_sentences:
+            raise TextTooLong("sentences", len(sentences), self.paragraph_sentences)
+        return sentences
+
+    def describe(self) -> dict:
+        return {
+            "sentence_chars": self.sentence_chars,
+            "sentence_tokens": self.sentence_tokens,
+            "paragraph_chars": self.paragraph_chars,
+            "paragraph_sentences": self.paragraph_sentences,
+        }
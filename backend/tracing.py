@@ -0,0 +1,316 @@
+"""Lightweight request tracing with a local JSONL exporter.
+
+Spans are collected in memory for the whole request, then either dropped or
+handed to a background thread that appends them to a rotating JSONL file.
+Each line is one span in the OpenTelemetry (OTLP/JSON) span shape, so the
+file can be replayed into any OTel collector.
+
+A request is exported when it was head-sampled (NLP_TRACE_SAMPLE_RATE) or
+when it ran longer than NLP_TRACE_SLOW_MS, whichever comes first. Tracing is
+off unless NLP_TRACE_PATH is set; spans are then no-ops. Every gunicorn worker
+appends to the same file; appends and rotation happen under an flock on
+NLP_TRACE_PATH.lock so two workers never rotate at once.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl  # type: ignore
+    _HAVE_FCNTL = True
+except Exception:
+    _HAVE_FCNTL = False
+
+logger = logging.getLogger(__name__)
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def _attr_value(value) -> Dict[str, object]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def queue_time_ms(header: Optional[str]) -> Optional[float]:
+    """Milliseconds since a proxy's X-Request-Start stamp ("t=<epoch>" in s, ms or us)."""
+    if not header:
+        return None
+    try:
+        stamp = float(header.strip().replace("t=", ""))
+    except ValueError:
+        return None
+    now = time.time()
+    # Scale the stamp to seconds by magnitude
+    while stamp > now * 100:
+        stamp /= 1000.0
+    return round(max(0.0, (now - stamp) * 1000.0), 2)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status", "message")
+
+    def __init__(self, trace: "_Trace", name: str, parent_id: Optional[str], attributes: Dict[str, object]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = dict(attributes)
+        self.status = STATUS_UNSET
+        self.message = ""
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.status = STATUS_ERROR
+        self.message = message
+
+    def to_otlp(self, service: str) -> Dict[str, object]:
+        span = {
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 2 if self.parent_id is None else 1,  # SERVER for roots, INTERNAL otherwise
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _attr_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.message} if self.message else {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Trace:
+    __slots__ = ("trace_id", "sampled", "spans")
+
+    def __init__(self, sampled: bool):
+        self.trace_id = os.urandom(16).hex()
+        self.sampled = sampled
+        self.spans: List[Span] = []
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("nlp_trace_span", default=None)
+
+
+class Tracer:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        service: str = "tagalog-nlp-api",
+        sample_rate: float = 0.01,
+        slow_ms: float = 1000.0,
+        max_bytes: int = 50 * 1024 * 1024,
+        backups: int = 3,
+        queue_size: int = 10000,
+    ):
+        self.path = path
+        self.service = service
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self.exported = 0
+        self._queue: "queue.Queue[List[Span]]" = queue.Queue(maxsize=queue_size)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(
+            path=os.environ.get("NLP_TRACE_PATH") or None,
+            service=os.environ.get("NLP_TRACE_SERVICE", "tagalog-nlp-api"),
+            sample_rate=float(os.environ.get("NLP_TRACE_SAMPLE_RATE", "0.01")),
+            slow_ms=float(os.environ.get("NLP_TRACE_SLOW_MS", "1000")),
+            max_bytes=int(os.environ.get("NLP_TRACE_MAX_MB", "50")) * 1024 * 1024,
+            backups=int(os.environ.get("NLP_TRACE_BACKUPS", "3")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    # --- Span API ---
+
+    def start_span(self, name: str, **attributes) -> Optional[Span]:
+        """Open a span as a child of the current one (or as a new trace root)."""
+        if not self.enabled:
+            return None
+        parent = _current_span.get()
+        if parent is None:
+            trace = _Trace(sampled=random.random() < self.sample_rate)
+            span = Span(trace, name, None, attributes)
+        else:
+            span = Span(parent.trace, name, parent.span_id, attributes)
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[object]:
+        span = self.start_span(name, **attributes)
+        if span is None:
+            yield NOOP_SPAN
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span)
+
+    def current_span(self):
+        return _current_span.get() or NOOP_SPAN
+
+    # Request lifecycle hooks (Flask before_request / teardown_request)
+
+    def begin_request(self, name: str, **attributes):
+        span = self.start_span(name, **attributes)
+        if span is None:
+            return None
+        return span, _current_span.set(span)
+
+    def end_request(self, handle, error: Optional[BaseException] = None) -> None:
+        if handle is None:
+            return
+        span, token = handle
+        if error is not None:
+            span.set_error(f"{type(error).__name__}: {error}")
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            _current_span.set(None)
+        self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        trace = span.trace
+        trace.spans.append(span)
+        if span.parent_id is not None:
+            return
+        duration_ms = (span.end_ns - span.start_ns) / 1e6
+        if trace.sampled or duration_ms >= self.slow_ms:
+            if not trace.sampled:
+                span.set_attribute("trace.slow", True)
+            self._enqueue(trace.spans)
+
+    # --- Export ---
+
+    def _enqueue(self, spans: List[Span]) -> None:
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += len(spans)
+
+    def _ensure_worker(self) -> None:
+        # Started lazily so each forked gunicorn worker gets its own thread
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+            self._worker.start()
+
+    def _export_loop(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 256:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                lines = [
+                    json.dumps(span.to_otlp(self.service), ensure_ascii=False)
+                    for spans in batch for span in spans
+                ]
+                with self._file_lock():
+                    self._rotate_if_needed()
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write("\n".join(lines) + "\n")
+                self.exported += len(lines)
+            except Exception as e:
+                logger.warning("Trace export failed: %s", e)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        # Held across the size check, rotation and append, so a worker never
+        # rotates a file another worker has just rotated or is writing to
+        if not _HAVE_FCNTL:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _rotate_if_needed(self) -> None:
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms,
+            "exported_spans": self.exported,
+            "dropped_spans": self.dropped,
+            "queued_traces": self._queue.qsize(),
+        }
+
+
+# Process-wide tracer shared by app.py and the conversation package
+tracer = Tracer.from_env()
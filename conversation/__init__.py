@@ -1,22 +1,4 @@
 """Conversation package for chatbot components."""
 
 # Import custom components to register them with spaCy
-from . import custom_components
-from . import lemma_override_component
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+from . import token_override_component
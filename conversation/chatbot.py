@@ -1,10 +1,24 @@
 import spacy
 import random
-import os
-
-# Load ToCylog model from the project root
-model_path = os.path.join(os.path.dirname(__file__), '..', 'tl_tocylog_trf')
-tocylog_nlp = spacy.load(model_path)
+from .router import MessageRouter
+from backend.model import models
+from backend.tracing import tracer
+
+# The ToCylog pipeline is loaded once per process and shared with app.py;
+# use models.active at call time so a promoted model is picked up.
+# Greetings and gazetteer-only messages are answered without a model pass
+# (only the tokenizer is needed, so a blank pipeline serves without the model)
+message_router = MessageRouter(models.load() or spacy.blank("tl"))
+
+def _rebuild_router(new_nlp):
+    """Match against the promoted pipeline's vocab: the old router would keep
+    the retired model alive and grow its vocab outside any memory zone."""
+    global message_router
+    router = MessageRouter(new_nlp)
+    router.counts = message_router.route_counts()
+    message_router = router
+
+models.on_promote(_rebuild_router)
 
 # Gamification state
 user_points = 0
@@ -55,40 +69,56 @@ def get_progress_feedback():
     # Gamification handled client-side; back-end returns no points/level text
     return ""
 
+def _entity_response(text, label):
+    if label in ["PER", "PERSON"]:
+        return random.choice(PERSON_TEMPLATES).format(ent=text, label=label)
+    if label in ["LOC", "GPE"]:
+        return random.choice(LOCATION_TEMPLATES).format(ent=text, label=label)
+    if label == "ORG":
+        return random.choice(ORG_TEMPLATES).format(ent=text, label=label)
+    return f"Nabanggit mo ang '{text}' ({label}). Pwede mo bang dagdagan ang detalye?"
+
+def _iter_responses(user_input):
+    """Yield (part, entity) pairs as each reply part is built.
+
+    entity is the (text, label) tuple the part responds to, or None for
+    greetings and fallbacks."""
+    route, entities_detected = message_router.route(user_input)
+
+    # Greeting detection (token-boundary match, no model pass)
+    if route == "greeting":
+        yield random.choice(greetings), None
+        return
+
+    # Entity-based responses; only unknown entities need the transformer
+    if route == "model" and models.active is not None:
+        with tracer.span("nlp", **{"nlp.chars": len(user_input), "nlp.route": route}) as span:
+            doc = models.parse(user_input)
+            span.set_attribute("nlp.tokens", len(doc))
+        # Plain strings: the Doc is freed when the request's memory zone closes,
+        # and these end up in conversation_log
+        entities_detected = [(ent.text, ent.label_) for ent in doc.ents]
+
+    if not entities_detected:
+        yield random.choice(fallbacks), None
+        return
+
+    for text, label in entities_detected:
+        yield _entity_response(text, label), (text, label)
+
 def _generate_responses(user_input):
-    doc = tocylog_nlp(user_input)
     responses = []
     entities_detected = []
-
-    # Greeting detection
-    if any(greet in user_input.lower() for greet in 
-           ["kamusta", "kumusta", "musta", "magandang araw",
-            "magandang umaga", "magandang hapon", "magandang gabi",
-            "hello", "hi"]):
-        return [random.choice(greetings)], []
-
-    # Entity-based responses
-    for ent in doc.ents:
-        label = ent.label_
-        entities_detected.append((ent.text, label))
-
-        if label in ["PER", "PERSON"]:
-            template = random.choice(PERSON_TEMPLATES)
-            responses.append(template.format(ent=ent.text, label=label))
-        elif label in ["LOC", "GPE"]:
-            template = random.choice(LOCATION_TEMPLATES)
-            responses.append(template.format(ent=ent.text, label=label))
-        elif label == "ORG":
-            template = random.choice(ORG_TEMPLATES)
-            responses.append(template.format(ent=ent.text, label=label))
-        else:
-            responses.append(f"Nabanggit mo ang '{ent.text}' ({label}). Pwede mo bang dagdagan ang detalye?")
-
-    if not responses:
-        responses = [random.choice(fallbacks)]
-
+    for part, entity in _iter_responses(user_input):
+        responses.append(part)
+        if entity:
+            entities_detected.append(entity)
     return responses, entities_detected
 
+def get_router_stats():
+    """Counts of messages answered on the fast path versus by the model."""
+    return message_router.stats()
+
 # Main chatbot (kept for backward compatibility: returns a single string)
 def get_bot_response(user_input):
     global conversation_log
@@ -103,15 +133,29 @@ def get_bot_response(user_input):
 
 # New helper that returns split parts for the UI
 def get_bot_response_parts(user_input):
-    responses, entities_detected = _generate_responses(user_input)
-    bot_reply = " ".join(responses)
-    # Do not append to log twice; reuse same behavior as get_bot_response
+    parts = []
+    entities_detected = []
+    for part, entity in iter_bot_response_parts(user_input):
+        parts.append(part)
+        if entity:
+            entities_detected.append(entity)
+    return {"reply": " ".join(parts), "parts": parts, "entities": entities_detected}
+
+# Streaming variant: yields (part, entity) as soon as each part is ready
+def iter_bot_response_parts(user_input):
+    responses = []
+    entities_detected = []
+    for part, entity in _iter_responses(user_input):
+        responses.append(part)
+        if entity:
+            entities_detected.append(entity)
+        yield part, entity
+    # Log once the turn is complete; same entry shape as get_bot_response
     conversation_log.append({
         "user": user_input,
-        "bot": bot_reply,
+        "bot": " ".join(responses),
         "entities": entities_detected,
     })
-    return {"reply": bot_reply, "parts": responses}
 
 # Summary
 def get_summary():
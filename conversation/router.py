@@ -0,0 +1,114 @@
+"""Pre-model router for chatbot messages.
+
+Greetings and messages whose entities are all in the gazetteer are answered
+from the tokenizer alone; everything else falls through to the transformer.
+"""
+
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import json
+import threading
+from spacy.language import Language
+from spacy.matcher import PhraseMatcher
+from spacy.util import filter_spans
+
+GAZETTEER_PATH = Path(__file__).parent / "gazetteer.json"
+
+GREETING_PHRASES = [
+    "kamusta", "kumusta", "musta", "magandang araw",
+    "magandang umaga", "magandang hapon", "magandang gabi",
+    "hello", "hi",
+]
+
+ENTITY_LABELS = ("PER", "LOC", "ORG")
+_SENTENCE_END = {".", "!", "?"}
+
+
+class MessageRouter:
+    """Token-boundary greeting matcher plus entity gazetteer.
+
+    Both matchers are compiled once; routing a message costs one tokenizer
+    pass, so "hi" no longer fires inside ordinary words."""
+
+    def __init__(self, nlp: Language, gazetteer_path: Path = GAZETTEER_PATH):
+        # Keep only the tokenizer and vocab, so a swapped-out model can be freed
+        self.vocab = nlp.vocab
+        self.tokenizer = nlp.tokenizer
+        # Match labels are read back from the StringStore; keep them out of
+        # any memory zone open while the router is built (after a promotion)
+        for label in ("GREETING",) + ENTITY_LABELS:
+            self.vocab.strings.add(label, allow_transient=False)
+        self.greetings = PhraseMatcher(nlp.vocab, attr="LOWER")
+        self.greetings.add("GREETING", [self.tokenizer(p) for p in GREETING_PHRASES])
+
+        with open(gazetteer_path, "r", encoding="utf-8") as f:
+            gazetteer = json.load(f)
+        # Acronyms (DLSU, UP) must match case-sensitively so "up" stays a word
+        self.entities_lower = PhraseMatcher(nlp.vocab, attr="LOWER")
+        self.entities_orth = PhraseMatcher(nlp.vocab, attr="ORTH")
+        for label in ENTITY_LABELS:
+            names = gazetteer.get(label, [])
+            acronyms = [n for n in names if n.isupper()]
+            others = [n for n in names if not n.isupper()]
+            if others:
+                self.entities_lower.add(label, [self.tokenizer(n) for n in others])
+            if acronyms:
+                self.entities_orth.add(label, [self.tokenizer(n) for n in acronyms])
+        self.common_starters = {w.lower() for w in gazetteer.get("common_starters", [])}
+
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {"greeting": 0, "gazetteer": 0, "model": 0}
+
+    def _count(self, route: str) -> None:
+        with self._lock:
+            self.counts[route] += 1
+
+    def route_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+    def stats(self) -> Dict[str, object]:
+        counts = self.route_counts()
+        total = sum(counts.values())
+        fast = counts["greeting"] + counts["gazetteer"]
+        return {
+            **counts,
+            "total": total,
+            "fast_path": fast,
+            "fast_path_rate": round(fast / total, 4) if total else 0.0,
+        }
+
+    def _known_entities(self, doc) -> Optional[List[Tuple[str, str]]]:
+        matches = list(self.entities_lower(doc)) + list(self.entities_orth(doc))
+        if not matches:
+            return None
+        labels = {(start, end): self.vocab.strings[match_id]
+                  for match_id, start, end in matches}
+        spans = filter_spans([doc[start:end] for start, end in labels])
+        covered = set()
+        for span in spans:
+            covered.update(range(span.start, span.end))
+
+        # Any capitalised word we cannot account for may be an unknown name
+        for token in doc:
+            if token.i in covered or not token.is_alpha or not token.text[0].isupper():
+                continue
+            starts_sentence = token.i == 0 or doc[token.i - 1].text in _SENTENCE_END
+            if starts_sentence and token.lower_ in self.common_starters:
+                continue
+            return None
+        return [(span.text, labels[(span.start, span.end)]) for span in spans]
+
+    def route(self, text: str) -> Tuple[str, List[Tuple[str, str]]]:
+        """Return (route, entities) where route is "greeting", "gazetteer" or
+        "model". Only the "model" route needs a full pipeline pass."""
+        doc = self.tokenizer(text)
+        if self.greetings(doc):
+            self._count("greeting")
+            return "greeting", []
+        entities = self._known_entities(doc)
+        if entities:
+            self._count("gazetteer")
+            return "gazetteer", entities
+        self._count("model")
+        return "model", []
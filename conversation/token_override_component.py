@@ -0,0 +1,262 @@
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import numpy
+from spacy.attrs import LEMMA, LOWER, ORTH, POS, TAG
+from spacy.language import Language
+from spacy.parts_of_speech import IDS as UNIV_POS_IDS
+from spacy.tokens import Doc
+from spacy.vocab import Vocab
+
+# Bundled correction rules; teachers add entries here instead of new factories.
+DEFAULT_RULES_PATH = Path(__file__).parent / "token_override_rules.json"
+
+# Column order of the override table; also the attrs written back to the Doc
+OVERRIDE_ATTRS = [POS, TAG, LEMMA]
+_FIELDS = ("pos", "tag", "lemma")
+
+
+class _KeyTable:
+    """Sorted hash ids -> override row, queried with one searchsorted per doc."""
+
+    def __init__(self, rows: Dict[int, List[int]]):
+        keys = sorted(rows)
+        self.keys = numpy.asarray(keys, dtype=numpy.uint64)
+        self.values = numpy.asarray(
+            [rows[k] for k in keys], dtype=numpy.uint64
+        ).reshape((len(keys), len(OVERRIDE_ATTRS)))
+
+    def lookup(self, ids: numpy.ndarray) -> numpy.ndarray:
+        out = numpy.zeros((len(ids), len(OVERRIDE_ATTRS)), dtype=numpy.uint64)
+        if not len(self.keys):
+            return out
+        idx = numpy.searchsorted(self.keys, ids)
+        idx[idx == len(self.keys)] = 0
+        hit = self.keys[idx] == ids
+        out[hit] = self.values[idx[hit]]
+        return out
+
+
+class OverrideTables:
+    """Compiled ORTH and LOWER tables. Immutable so a swap is one assignment."""
+
+    def __init__(self, orth: _KeyTable, lower: _KeyTable, n_rules: int, fingerprint: str = ""):
+        self.orth = orth
+        self.lower = lower
+        self.n_rules = n_rules
+        self.fingerprint = fingerprint
+
+    def lookup(self, keys: numpy.ndarray) -> numpy.ndarray:
+        """Return an (n, 3) POS/TAG/LEMMA array; 0 means "leave as is".
+
+        ORTH (exact) rules win over LOWER rules, per attribute."""
+        out = self.lower.lookup(keys[:, 1])
+        exact = self.orth.lookup(keys[:, 0])
+        numpy.copyto(out, exact, where=exact != 0)
+        return out
+
+
+def load_rule_file(path: Path) -> List[dict]:
+    """Read rules from JSON.
+
+    Accepts ``{"rules": [...]}`` / a plain list of rule objects, or the legacy
+    ``lemma_override.json`` shape ``{"text": "lemma"}``."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "rules" in data:
+        data = data["rules"]
+    if isinstance(data, dict):
+        return lemma_map_to_rules(data)
+    if not isinstance(data, list):
+        raise ValueError(f"Unsupported override rules format in {path}")
+    return data
+
+
+def lemma_map_to_rules(lemma_map: Dict[str, str]) -> List[dict]:
+    """Translate an old text -> lemma map keeping its lookup semantics: the key
+    matches the exact text, and lowercase keys also match any casing."""
+    rules: List[dict] = []
+    for text, lemma in lemma_map.items():
+        key = "lower" if text == text.lower() else "orth"
+        rules.append({key: text, "lemma": lemma})
+    return rules
+
+
+def rules_fingerprint(rules: List[dict]) -> str:
+    """Stable hash of a rule list; changes whenever any rule does."""
+    encoded = json.dumps(rules, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def compile_rules(vocab: Vocab, rules: List[dict], fields: Tuple[str, ...] = _FIELDS) -> OverrideTables:
+    """Resolve every rule to vocab hash ids once; later rules win on conflicts.
+
+    Only the attributes named in fields are compiled; rules setting none of
+    them are skipped. Rule strings are added as permanent: a reload can run
+    while a request thread holds a memory zone, and transient strings vanish
+    when it closes."""
+    orth_rows: Dict[int, List[int]] = {}
+    lower_rows: Dict[int, List[int]] = {}
+    compiled = 0
+    for rule in rules:
+        rule = {k: v for k, v in rule.items() if k not in _FIELDS or k in fields}
+        if not any(rule.get(field) for field in _FIELDS):
+            continue
+        compiled += 1
+        if "orth" in rule:
+            rows, text = orth_rows, rule["orth"]
+        elif "lower" in rule:
+            rows, text = lower_rows, rule["lower"].lower()
+        else:
+            raise ValueError(f"Override rule needs 'orth' or 'lower': {rule}")
+        row = rows.setdefault(vocab.strings.add(text, allow_transient=False), [0, 0, 0])
+        pos = rule.get("pos")
+        if pos:
+            if pos not in UNIV_POS_IDS:
+                raise ValueError(f"Unknown POS '{pos}' in override rule: {rule}")
+            row[0] = UNIV_POS_IDS[pos]
+        if rule.get("tag"):
+            row[1] = vocab.strings.add(rule["tag"], allow_transient=False)
+        if rule.get("lemma"):
+            row[2] = vocab.strings.add(rule["lemma"], allow_transient=False)
+    return OverrideTables(_KeyTable(orth_rows), _KeyTable(lower_rows), compiled, rules_fingerprint(rules))
+
+
+class TokenOverride:
+    """Rule-driven POS/TAG/LEMMA corrections applied as one array write per doc."""
+
+    def __init__(
+        self,
+        nlp: Language,
+        name: str,
+        rules_path: Optional[str] = None,
+        rules: Optional[List[dict]] = None,
+        lemma_map: Optional[Dict[str, str]] = None,
+        fields: Tuple[str, ...] = _FIELDS,
+    ):
+        self.name = name
+        # The attributes this pipe writes; the legacy pipes own one each
+        self.fields = tuple(fields)
+        self.vocab = nlp.vocab
+        self.rules_path = Path(rules_path) if rules_path else DEFAULT_RULES_PATH
+        # Legacy lemma_override.json shipped inside the model directory
+        base = getattr(nlp, "path", None)
+        self.model_rules_path = (
+            Path(base) / "lemma_override" / "lemma_override.json" if base else None
+        )
+        self.inline_rules = list(rules or []) + lemma_map_to_rules(lemma_map or {})
+        self.tables = compile_rules(self.vocab, self.collect_rules(), self.fields)
+
+    def set_model_path(self, base) -> None:
+        """Read the legacy rules of the model directory at base; for pipelines
+        built from a config (snapshots), which have no path at creation."""
+        self.model_rules_path = Path(base) / "lemma_override" / "lemma_override.json"
+        self.tables = compile_rules(self.vocab, self.collect_rules(), self.fields)
+
+    def watched_paths(self) -> List[Path]:
+        """Every rule file location, including ones that do not exist yet."""
+        return [p for p in (self.rules_path, self.model_rules_path) if p]
+
+    def rule_sources(self) -> List[Path]:
+        return [p for p in self.watched_paths() if p.exists()]
+
+    def collect_rules(self) -> List[dict]:
+        collected: List[dict] = []
+        for path in self.rule_sources():
+            collected.extend(load_rule_file(path))
+        return collected + self.inline_rules
+
+    @property
+    def fingerprint(self) -> str:
+        return self.tables.fingerprint
+
+    def reload(self) -> bool:
+        """Recompile the rule files and swap the new tables in.
+
+        Docs being processed keep the tables they started with; returns True
+        if the rules actually changed."""
+        rules = self.collect_rules()
+        if rules_fingerprint(rules) == self.tables.fingerprint:
+            return False
+        self.tables = compile_rules(self.vocab, rules, self.fields)
+        return True
+
+    def covers(self, doc: Doc) -> numpy.ndarray:
+        """Boolean mask of the tokens whose POS or TAG a rule decides."""
+        tables = self.tables
+        if not len(doc) or not tables.n_rules:
+            return numpy.zeros(len(doc), dtype=bool)
+        overrides = tables.lookup(doc.to_array([ORTH, LOWER]))
+        return (overrides[:, :2] != 0).any(axis=1)
+
+    def __call__(self, doc: Doc) -> Doc:
+        tables = self.tables
+        if not len(doc) or not tables.n_rules:
+            return doc
+        overrides = tables.lookup(doc.to_array([ORTH, LOWER]))
+        mask = overrides != 0
+        if not mask.any():
+            return doc
+        values = doc.to_array(OVERRIDE_ATTRS)
+        numpy.copyto(values, overrides, where=mask)
+        doc.from_array(OVERRIDE_ATTRS, values)
+        return doc
+
+
+@Language.factory(
+    "token_override",
+    default_config={
+        "rules_path": None,   # JSON rules file; defaults to token_override_rules.json
+        "rules": [],          # extra inline rules from config.cfg
+    },
+)
+def create_token_override(
+    nlp: Language,
+    name: str,
+    rules_path: Optional[str],
+    rules: List[dict],
+) -> TokenOverride:
+    return TokenOverride(nlp, name, rules_path=rules_path, rules=rules)
+
+
+# --- Legacy factory names kept so existing model configs still load ---
+
+@Language.factory("force_masarap_adj")
+def create_force_masarap_adj_component(nlp: Language, name: str) -> TokenOverride:
+    """Superseded by token_override; applies only the POS/TAG rules (the
+    'masarap' ADJ rule lives in the rules file), so a config that also has
+    lemma_override does not apply any rule twice."""
+    return TokenOverride(nlp, name, fields=("pos", "tag"))
+
+
+@Language.factory(
+    "lemma_override",
+    default_config={
+        "lemma_map": {},
+        "json_path": None,
+    },
+)
+def create_lemma_override(
+    nlp: Language,
+    name: str,
+    lemma_map: Dict[str, str],
+    json_path: Optional[str],
+) -> TokenOverride:
+    """Superseded by token_override; applies only the lemma rules. An
+    explicit json_path is still honoured."""
+    component = TokenOverride(nlp, name, lemma_map=lemma_map, fields=("lemma",))
+    if json_path:
+        component.model_rules_path = Path(json_path)
+        component.tables = compile_rules(component.vocab, component.collect_rules(), component.fields)
+    return component
+
+
+def override_components(nlp: Language) -> List[TokenOverride]:
+    """The TokenOverride components in a pipeline (any factory name)."""
+    return [pipe for _, pipe in nlp.pipeline if isinstance(pipe, TokenOverride)]
+
+
+def pipeline_rules_fingerprint(nlp: Language) -> str:
+    """Combined rule fingerprint of a pipeline; "" when it has no overrides."""
+    return "+".join(c.fingerprint for c in override_components(nlp))
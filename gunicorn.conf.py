@@ -0,0 +1,74 @@
+"""Gunicorn settings for the NLP API.
+
+Preload mode (default): app.py is imported once in the master, so the ToCylog
+model and the word pools are loaded before forking and shared copy-on-write
+by every worker. gc.freeze() before each fork keeps the collector from
+touching (and therefore copying) those shared pages.
+
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+# An open conversation WebSocket holds one of these threads until it closes or
+# idles out (NLP_WS_IDLE_TIMEOUT); app.py caps sockets per worker at
+# NLP_WS_MAX_SOCKETS (default threads // 2). Size this as expected concurrent
+# chat pages per worker plus the threads wanted for plain HTTP.
+threads = int(os.environ.get("NLP_THREADS", "4"))
+timeout = int(os.environ.get("NLP_TIMEOUT", "300"))
+preload_app = os.environ.get("NLP_PRELOAD", "1") != "0"
+
+
+# No collections while the model is being built; objects stay compact.
+# This file is read before gunicorn preloads the app (on_starting runs after).
+if preload_app:
+    gc.disable()
+
+
+def when_ready(server):
+    # The app is loaded: the master collects as usual again
+    if preload_app:
+        gc.enable()
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far into the permanent generation
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+    _set_torch_threads(worker)
+    _start_worker_threads()
+
+
+def _start_worker_threads():
+    """Threads do not survive fork, so each worker starts its own memory
+    watchdog and content reloader."""
+    import app as nlp_app  # already imported in the master when preloading
+
+    nlp_app.memory_watchdog.start(restart=True)
+    nlp_app.content_reloader.start()
+
+
+def _set_torch_threads(worker):
+    """Split the available cores between workers (NLP_TORCH_THREADS overrides)."""
+    try:
+        import torch  # type: ignore
+    except Exception:
+        return
+    override = os.environ.get("NLP_TORCH_THREADS")
+    if override:
+        n = int(override)
+    else:
+        try:
+            cores = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cores = os.cpu_count() or 1
+        n = max(1, cores // max(1, workers))
+    torch.set_num_threads(n)
+    worker.log.info("Worker %s using %s torch threads", worker.pid, n)
@@ -6,6 +6,7 @@ import Button from '@/components/ui/Button';
 import { useRouter } from 'next/navigation';
 import { useAuth } from '@/context/AuthContext';
 import { useGameProgress } from '@/hooks/useGameProgress';
+import { sendChatMessage, closeChatSocket } from '@/services/conversation';
 
 type Message = { role: 'user' | 'bot'; text: string };
 
@@ -54,6 +55,7 @@ export default function ConversationPlayPage() {
     setSessionPoints(0);
     setSessionStreak(0);
     return () => {
+      closeChatSocket();
       try {
         sessionStorage.setItem(pointsKey, '0');
         sessionStorage.setItem(streakKey, '0');
@@ -78,12 +80,31 @@ export default function ConversationPlayPage() {
     setMessages((m) => [...m, { role: 'user', text }]);
     setLoading(true);
     try {
-      const resp = await fetch('/api/challenges/conversation', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: text })
-      });
-      const data = await resp.json();
+      // Prefer the streaming socket: each reply part is shown as soon as it arrives
+      let streamed = false;
+      let data: any = null;
+      try {
+        data = await sendChatMessage(text, (part) => {
+          streamed = true;
+          setMessages((m) => [...m, { role: 'bot', text: part }]);
+        });
+      } catch {
+        data = null;
+      }
+      if (!data && streamed) {
+        // The socket dropped mid-reply. The backend has already handled this turn,
+        // so resending it would count it twice: say so and leave score and streak as they are.
+        setMessages((m) => [...m, { role: 'bot', text: 'Naputol ang sagot ko. Pakisulat muli ang mensahe mo.' }]);
+        return;
+      }
+      if (!data) {
+        const resp = await fetch('/api/challenges/conversation', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ message: text })
+        });
+        data = await resp.json();
+      }
       const reply = data?.reply ?? '...';
       const replyParts: string[] | undefined = Array.isArray(data?.replyParts) ? data.replyParts : undefined;
       const delta = Number(data?.scoreDelta || 0);
@@ -129,7 +150,9 @@ export default function ConversationPlayPage() {
         feedback =  `🔥 Ang galing mo gumawa ng pangungusap!`;
       }
       // If we received split parts, render each as its own bubble
-      if (replyParts && replyParts.length > 0) {
+      if (streamed) {
+        if (feedback) setMessages((m) => [...m, { role: 'bot', text: feedback.trim() }]);
+      } else if (replyParts && replyParts.length > 0) {
         setMessages((m) => [
           ...m,
           ...replyParts.map((p) => ({ role: 'bot' as const, text: p })),
@@ -139,15 +162,21 @@ export default function ConversationPlayPage() {
         setMessages((m) => [...m, { role: 'bot', text: (reply + feedback).trim() }]);
       }
 
-      // Parse and accumulate entities mentioned in this response
+      // Accumulate entities mentioned in this response (structured list when available)
       try {
-        const source = replyParts && replyParts.length > 0 ? replyParts.join(' ') : String(reply);
-        const matches = Array.from(source.matchAll(/'([^']+)'\s*\(([A-Z]{2,})\)/g));
-        if (matches.length > 0) {
-          setSessionEntities((prev) => [
-            ...prev,
-            ...matches.map((m) => [m[1], m[2]] as [string, string])
-          ]);
+        if (Array.isArray(data?.entities)) {
+          if (data.entities.length > 0) {
+            setSessionEntities((prev) => [...prev, ...(data.entities as [string, string][])]);
+          }
+        } else {
+          const source = replyParts && replyParts.length > 0 ? replyParts.join(' ') : String(reply);
+          const matches = Array.from(source.matchAll(/'([^']+)'\s*\(([A-Z]{2,})\)/g));
+          if (matches.length > 0) {
+            setSessionEntities((prev) => [
+              ...prev,
+              ...matches.map((m) => [m[1], m[2]] as [string, string])
+            ]);
+          }
         }
       } catch {}
     } catch (e) {
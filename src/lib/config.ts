@@ -82,6 +82,7 @@ export const API_ENDPOINTS = {
     MAKE_SENTENCE_WORDS_ENDPOINT: `${getApiBaseUrl()}/api/make-sentence/words`,
     MAKE_SENTENCE_VERIFY_ENDPOINT: `${getApiBaseUrl()}/api/make-sentence/verify`,
     CONVERSATION_ENDPOINT: `${getApiBaseUrl()}/api/conversation/chat`,
+    CONVERSATION_WS_ENDPOINT: `${getApiBaseUrl().replace(/^http/, 'ws')}/api/conversation/ws`,
     
     // Internal Next.js API routes that proxy to the Flask backend
     POS_GAME_PROXY: '/api/challenges/pos-game',
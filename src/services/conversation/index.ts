@@ -0,0 +1,113 @@
+// src/services/conversation/index.ts
+/*
+ * WebSocket transport for the conversation challenge.
+ * Keeps one socket open per page and streams reply parts as the backend builds them.
+ */
+import { API_ENDPOINTS } from '@/lib/config';
+
+export type ChatTurnResult = {
+  reply: string;
+  replyParts: string[];
+  entities: [string, string][];
+  scoreDelta: number;
+};
+
+type PendingTurn = {
+  onPart: (text: string, index: number) => void;
+  resolve: (result: ChatTurnResult) => void;
+  reject: (error: Error) => void;
+};
+
+const CONNECT_TIMEOUT = 5000; // fall back to HTTP if the socket cannot open quickly
+
+let socket: WebSocket | null = null;
+let connecting: Promise<WebSocket> | null = null;
+let pending: PendingTurn | null = null;
+
+function failPending(error: Error) {
+  const turn = pending;
+  pending = null;
+  turn?.reject(error);
+}
+
+function handleFrame(event: MessageEvent) {
+  let frame: any;
+  try {
+    frame = JSON.parse(String(event.data));
+  } catch {
+    return;
+  }
+  if (!pending) return;
+  if (frame?.type === 'part') {
+    pending.onPart(String(frame.text ?? ''), Number(frame.index ?? 0));
+  } else if (frame?.type === 'done') {
+    const turn = pending;
+    pending = null;
+    turn.resolve({
+      reply: String(frame.reply ?? ''),
+      replyParts: Array.isArray(frame.replyParts) ? frame.replyParts : [],
+      entities: Array.isArray(frame.entities) ? frame.entities : [],
+      scoreDelta: Number(frame.scoreDelta || 0)
+    });
+  } else if (frame?.type === 'error') {
+    failPending(new Error(frame.error || 'Conversation socket error'));
+  }
+}
+
+function connect(): Promise<WebSocket> {
+  if (socket && socket.readyState === WebSocket.OPEN) return Promise.resolve(socket);
+  if (connecting) return connecting;
+
+  connecting = new Promise<WebSocket>((resolve, reject) => {
+    const ws = new WebSocket(API_ENDPOINTS.CONVERSATION_WS_ENDPOINT);
+    const timeoutId = setTimeout(() => {
+      ws.close();
+      reject(new Error('Conversation socket connect timed out'));
+    }, CONNECT_TIMEOUT);
+    ws.onopen = () => {
+      clearTimeout(timeoutId);
+      socket = ws;
+      resolve(ws);
+    };
+    ws.onmessage = handleFrame;
+    ws.onerror = () => {
+      clearTimeout(timeoutId);
+      reject(new Error('Conversation socket error'));
+    };
+    ws.onclose = () => {
+      clearTimeout(timeoutId);
+      if (socket === ws) socket = null;
+      failPending(new Error('Conversation socket closed'));
+    };
+  }).finally(() => {
+    connecting = null;
+  });
+  return connecting;
+}
+
+/**
+ * Sends one chat turn over the socket.
+ * @param message User message
+ * @param onPart Called with each reply part as soon as it arrives
+ * @returns Promise with the full turn once the backend sends its 'done' frame
+ */
+export async function sendChatMessage(
+  message: string,
+  onPart: (text: string, index: number) => void
+): Promise<ChatTurnResult> {
+  if (typeof window === 'undefined' || typeof WebSocket === 'undefined') {
+    throw new Error('WebSocket not available');
+  }
+  const ws = await connect();
+  if (pending) throw new Error('A conversation turn is already in progress');
+  return new Promise<ChatTurnResult>((resolve, reject) => {
+    pending = { onPart, resolve, reject };
+    ws.send(JSON.stringify({ message }));
+  });
+}
+
+export function closeChatSocket() {
+  failPending(new Error('Conversation socket closed'));
+  socket?.close();
+  socket = null;
+}
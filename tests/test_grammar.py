@@ -0,0 +1,141 @@
+"""The grammar rules in backend/grammar_rules.json, checked on hand-written
+sentences (no model is loaded)."""
+
+import pytest
+import spacy
+from spacy.tokens import Doc
+
+from backend.grammar import GrammarChecker, SentenceArrays
+
+
+@pytest.fixture(scope="module")
+def checker():
+    return GrammarChecker.load()
+
+
+def rule_ids(violations):
+    return [v.rule for v in violations]
+
+
+# "Kumain ang mga bata ng mansanas." with a well-formed parse
+GOOD = dict(
+    words=["Kumain", "ang", "mga", "bata", "ng", "mansanas", "."],
+    pos=["VERB", "DET", "DET", "NOUN", "ADP", "NOUN", "PUNCT"],
+    deps=["ROOT", "det", "det", "nsubj", "case", "obj", "punct"],
+    heads=[0, 3, 3, 0, 5, 0, 0],
+    lemmas=["kain", "ang", "mga", "bata", "ng", "mansanas", "."],
+)
+
+
+def sentence(**changes):
+    return SentenceArrays(**{**GOOD, **changes})
+
+
+def test_good_sentence_passes(checker):
+    assert checker.check(sentence(), target="bata") == []
+
+
+def test_word_count(checker):
+    short = SentenceArrays(["Kumain", "siya", "."], pos=["VERB", "PRON", "PUNCT"],
+                           deps=["ROOT", "nsubj", "punct"], heads=[0, 0, 0])
+    violations = checker.check(short)
+    assert rule_ids(violations)[0] == "word-count"
+    assert "may 2" in violations[0].message
+
+    words = ["Kumain"] + ["bata"] * 25 + ["."]
+    long = SentenceArrays(words, pos=["VERB"] + ["NOUN"] * 25 + ["PUNCT"],
+                          deps=["ROOT"] + ["nsubj"] * 25 + ["punct"], heads=[0] * len(words))
+    assert "word-count" in rule_ids(checker.check(long))
+
+
+def test_target_used(checker):
+    assert rule_ids(checker.check(sentence(), target="isda")) == ["target-used"]
+    # The lemma counts as using the word
+    assert checker.check(sentence(), target="kain") == []
+    assert checker.check(sentence(), target="KUMAIN") == []
+
+
+def test_has_subject(checker):
+    deps = list(GOOD["deps"])
+    deps[3] = "obj"
+    assert rule_ids(checker.check(sentence(deps=deps))) == ["has-subject"]
+
+
+def test_root_count(checker):
+    no_root = list(GOOD["deps"])
+    no_root[0] = "advcl"
+    assert rule_ids(checker.check(sentence(deps=no_root))) == ["has-root"]
+
+    two_roots = list(GOOD["deps"])
+    two_roots[5] = "ROOT"
+    assert rule_ids(checker.check(sentence(deps=two_roots))) == ["single-root"]
+
+
+def test_mga_must_precede_a_noun(checker):
+    ok = SentenceArrays(["Ang", "mga", "Santos", "ay", "kumain", "."],
+                        pos=["DET", "DET", "PROPN", "AUX", "VERB", "PUNCT"],
+                        deps=["det", "det", "nsubj", "aux", "ROOT", "punct"], heads=[2, 2, 4, 4, 4, 4])
+    assert checker.check(ok) == []
+
+    pos = list(GOOD["pos"])
+    pos[3] = "VERB"
+    violations = checker.check(sentence(pos=pos))
+    assert rule_ids(violations) == ["mga-before-noun"]
+    assert violations[0].tokens == [2, 3]
+    assert "'bata'" in violations[0].message
+
+
+def test_ay_position(checker):
+    middle = SentenceArrays(["Ang", "bata", "ay", "kumain", "."],
+                            pos=["DET", "NOUN", "AUX", "VERB", "PUNCT"],
+                            deps=["det", "nsubj", "aux", "ROOT", "punct"], heads=[1, 3, 3, 3, 3])
+    assert checker.check(middle) == []
+
+    first = SentenceArrays(["Ay", "kumain", "ang", "bata", "."],
+                           pos=["AUX", "VERB", "DET", "NOUN", "PUNCT"],
+                           deps=["aux", "ROOT", "det", "nsubj", "punct"], heads=[1, 1, 3, 1, 1])
+    violations = checker.check(first)
+    assert rule_ids(violations) == ["ay-position"]
+    assert violations[0].tokens == [0]
+
+    # Last word, even with the final punctuation after it
+    last = SentenceArrays(["Kumain", "ang", "bata", "ay", "."],
+                          pos=["VERB", "DET", "NOUN", "AUX", "PUNCT"],
+                          deps=["ROOT", "det", "nsubj", "aux", "punct"], heads=[0, 2, 0, 0, 0])
+    violations = checker.check(last)
+    assert rule_ids(violations) == ["ay-position"]
+    assert violations[0].tokens == [3]
+
+
+def test_target_attached(checker):
+    deps = list(GOOD["deps"])
+    deps[5] = ""
+    heads = list(GOOD["heads"])
+    heads[4] = 4
+    heads[5] = 5
+    assert rule_ids(checker.check(sentence(deps=deps, heads=heads), target="mansanas")) == ["target-attached"]
+    # Unlabelled but with a dependent is still attached
+    assert checker.check(sentence(deps=deps), target="mansanas") == []
+
+
+def test_doc_columns_match_plain_lists(checker):
+    # A blank pipeline's vocab fills LOWER like the model's does
+    vocab = spacy.blank("tl").vocab
+    doc = Doc(vocab, words=GOOD["words"], pos=GOOD["pos"], deps=GOOD["deps"],
+              heads=GOOD["heads"], lemmas=GOOD["lemmas"])
+    from_doc = SentenceArrays.from_doc(doc)
+    from_lists = sentence()
+    for attr in ("lower", "pos", "dep", "lemma", "head", "is_punct"):
+        assert getattr(from_doc, attr).tolist() == getattr(from_lists, attr).tolist(), attr
+
+    deps = list(GOOD["deps"])
+    deps[3] = "obj"
+    bad = Doc(vocab, words=GOOD["words"], pos=GOOD["pos"], deps=deps, heads=GOOD["heads"])
+    assert rule_ids(checker.check(SentenceArrays.from_doc(bad))) == ["has-subject"]
+
+
+def test_rules_are_validated():
+    with pytest.raises(ValueError):
+        GrammarChecker([{"id": "x", "kind": "pattern", "message": "", "pattern": [{"pos": "NOUNS"}]}])
+    with pytest.raises(ValueError):
+        GrammarChecker([{"id": "x", "kind": "count", "message": "", "match": {"position": "middle"}}])